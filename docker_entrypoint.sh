@@ -5,9 +5,26 @@
 #     pip install --no-cache-dir "git+https://github.com/abetlen/llama-cpp-python.git@0b89fe48ad26ffcff76451bd87642d916a1a3385"
 # fi
 
-echo "🕐 Waiting for Milvus to be ready..."
-python scripts/ingest_pdfs.py || echo "⚠️ PDF ingestion failed or was already done."
-python scripts/ingest_sql.py || echo "⚠️ SQL ingestion failed or was already done."
+# Ingest 不再擋住啟動: 預設在背景執行 (增量 ingest，API 端快取依 collection 版本自動失效)
+# INGEST_ON_START=blocking 恢復舊行為 (先 ingest 再啟動)，=skip 完全不執行 (改用排程或手動)
+run_ingest() {
+    python scripts/ingest_pdfs.py || echo "⚠️ PDF ingestion failed or was already done."
+    python scripts/ingest_sql.py || echo "⚠️ SQL ingestion failed or was already done."
+}
+
+case "${INGEST_ON_START:-background}" in
+    blocking)
+        echo "🕐 Running ingestion before startup..."
+        run_ingest
+        ;;
+    skip)
+        echo "⏭️ Skipping ingestion (INGEST_ON_START=skip)."
+        ;;
+    *)
+        echo "📥 Running ingestion in the background..."
+        run_ingest &
+        ;;
+esac
 echo "🚀 Starting uvicorn..."
 
 exec "$@"
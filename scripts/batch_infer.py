@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+# 以 /v1/batch 執行 JSONL 問題集，結果逐行追加到輸出檔；中斷後重跑只送出尚未完成的 id
+def load_done_ids(output_path: str) -> set:
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 上次中斷時寫了一半的行
+            if "answer" in result:
+                done.add(result["id"])
+    return done
+
+def load_pending(input_path: str, done: set) -> list:
+    pending = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            # 沒有 id 時以行號為 id，與伺服器端相同
+            item.setdefault("id", lineno)
+            item["id"] = str(item["id"])
+            if item["id"] not in done:
+                pending.append(item)
+    return pending
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a JSONL question set through /v1/batch (resumable).")
+    parser.add_argument("input", help="JSONL with {\"id\", \"prompt\"} or {\"id\", \"messages\"} per line")
+    parser.add_argument("output", help="JSONL results, appended as they complete")
+    parser.add_argument("--url", default=os.getenv("RAG_API_URL", "http://localhost:8081"))
+    parser.add_argument("--timeout", type=float, default=None, help="read timeout between results (seconds)")
+    args = parser.parse_args()
+
+    done = load_done_ids(args.output)
+    pending = load_pending(args.input, done)
+    print(f"✅ 已完成 {len(done)} 筆，待處理 {len(pending)} 筆。")
+    if not pending:
+        sys.exit(0)
+
+    body = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in pending)
+    started = time.perf_counter()
+    finished = errors = 0
+    with requests.post(f"{args.url}/v1/batch", data=body.encode("utf-8"), stream=True,
+                       headers={"Content-Type": "application/x-ndjson"}, timeout=(10, args.timeout)) as res:
+        res.raise_for_status()
+        res.encoding = "utf-8"  # application/x-ndjson 沒有 charset，iter_lines 才會解碼
+        with open(args.output, "a", encoding="utf-8") as out:
+            for line in res.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                out.write(line + "\n")
+                out.flush()
+                finished += 1
+                if "error" in json.loads(line):
+                    errors += 1
+                if finished % 10 == 0 or finished == len(pending):
+                    rate = finished / (time.perf_counter() - started)
+                    print(f"  {finished}/{len(pending)} 完成 ({errors} 失敗), {rate:.2f} 題/秒")
+
+    print(f"[結束] {finished} 筆完成，{errors} 筆失敗 (重跑即可重試失敗與未完成的題目)。")
+    sys.exit(1 if errors or finished < len(pending) else 0)
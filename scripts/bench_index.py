@@ -0,0 +1,147 @@
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from src.config import MILVUS_HOST, MILVUS_PORT, MILVUS_METRIC_TYPE, PDF_COLLECTION_NAME
+from src.chains.milvus_index import index_params, search_params
+
+# 以同一份向量建立不同索引，對照 FLAT (精確搜尋) 的 recall@k 與單次查詢延遲 p50 / p99
+# 每個設定: {"index_type", "metric_type"(選填), "params"(建索引, 選填), "search": [查詢參數, ...]}
+DEFAULT_CONFIGS = [
+    {"index_type": "IVF_FLAT", "params": {"nlist": 256}, "search": [{"nprobe": 4}, {"nprobe": 16}, {"nprobe": 64}]},
+    {"index_type": "IVF_SQ8", "params": {"nlist": 256}, "search": [{"nprobe": 16}, {"nprobe": 64}]},
+    {"index_type": "IVF_PQ", "params": {"nlist": 256, "m": 16, "nbits": 8}, "search": [{"nprobe": 16}, {"nprobe": 64}]},
+    {"index_type": "HNSW", "params": {"M": 16, "efConstruction": 200}, "search": [{"ef": 16}, {"ef": 64}, {"ef": 256}]},
+]
+
+def _as_floats(value):
+    # MILVUS_VECTOR_DTYPE=float16 的 collection 回傳 float16 的原始位元組
+    if isinstance(value, list) and value and isinstance(value[0], bytes):
+        value = value[0]
+    return np.frombuffer(value, dtype=np.float16) if isinstance(value, bytes) else value
+
+def load_vectors(collection_name: str, limit: int) -> np.ndarray:
+    col = Collection(collection_name)
+    col.load()
+    vector_field = next(f.name for f in col.schema.fields if f.dtype in (DataType.FLOAT_VECTOR, DataType.FLOAT16_VECTOR))
+    it = col.query_iterator(batch_size=1000, output_fields=[vector_field], limit=limit)
+    rows = []
+    while True:
+        batch = it.next()
+        if not batch:
+            break
+        rows.extend(_as_floats(r[vector_field]) for r in batch)
+    it.close()
+    return np.asarray(rows, dtype=np.float32)
+
+def make_queries(data: np.ndarray, n: int, seed: int) -> np.ndarray:
+    # 從資料中抽樣再加雜訊，近似「與某些 chunk 相近但不相同」的問題
+    rng = np.random.default_rng(seed)
+    picked = data[rng.choice(len(data), size=min(n, len(data)), replace=False)]
+    noise = rng.normal(scale=float(np.std(data)) * 0.3, size=picked.shape).astype(np.float32)
+    return picked + noise
+
+def build_collection(name: str, data: np.ndarray, params: dict) -> Collection:
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema("pk", DataType.INT64, is_primary=True),
+        FieldSchema("vector", DataType.FLOAT_VECTOR, dim=data.shape[1]),
+    ])
+    col = Collection(name, schema)
+    for start in range(0, len(data), 5000):
+        part = data[start:start + 5000]
+        col.insert([list(range(start, start + len(part))), part.tolist()])
+    col.flush()
+    started = time.perf_counter()
+    col.create_index("vector", index_params=params)
+    utility.wait_for_index_building_complete(name)
+    print(f"  {params['index_type']} 建索引 {time.perf_counter() - started:.1f}s")
+    col.load()
+    return col
+
+def run_queries(col: Collection, queries: np.ndarray, param: dict, k: int):
+    ids, latencies = [], []
+    for q in queries:
+        started = time.perf_counter()
+        res = col.search([q.tolist()], "vector", param=param, limit=k)
+        latencies.append(time.perf_counter() - started)
+        ids.append([hit.id for hit in res[0]])
+    return ids, latencies
+
+def recall_at_k(truth: List[List[int]], found: List[List[int]], k: int) -> float:
+    hits = sum(len(set(t[:k]) & set(f[:k])) for t, f in zip(truth, found))
+    return hits / max(1, sum(min(k, len(t)) for t in truth))
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ms = np.asarray(latencies) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k vs FLAT and p50/p99 latency per Milvus index configuration.")
+    parser.add_argument("--collection", default=PDF_COLLECTION_NAME, help="copy vectors from this collection")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of a collection")
+    parser.add_argument("--dim", type=int, default=768, help="dimension for --synthetic")
+    parser.add_argument("--limit", type=int, default=200000, help="max vectors copied from the collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default=MILVUS_METRIC_TYPE)
+    parser.add_argument("--configs", help="JSON file with a list of configurations (default: built-in set)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the bench_* collections")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
+    if args.synthetic:
+        data = np.random.default_rng(args.seed).normal(size=(args.synthetic, args.dim)).astype(np.float32)
+    else:
+        data = load_vectors(args.collection, args.limit)
+    if len(data) == 0:
+        print("❌ 沒有可用的向量。")
+        sys.exit(1)
+    queries = make_queries(data, args.queries, args.seed)
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+    print(f"✅ {len(data)} 個向量 (dim={data.shape[1]}), {len(queries)} 個查詢, k={args.k}, metric={args.metric}")
+
+    created = []
+    results = []
+    try:
+        flat = build_collection("bench_flat", data, index_params("FLAT", args.metric))
+        created.append("bench_flat")
+        truth, latencies = run_queries(flat, queries, search_params("FLAT", args.metric), args.k)
+        results.append({"index_type": "FLAT", "params": {}, "search": {}, "recall": 1.0, **latency_summary(latencies)})
+        flat.release()
+
+        for i, cfg in enumerate(configs):
+            metric = cfg.get("metric_type", args.metric)
+            build = index_params(cfg["index_type"], metric, cfg.get("params"))
+            name = f"bench_{cfg['index_type'].lower()}_{i}"
+            col = build_collection(name, data, build)
+            created.append(name)
+            for sp in cfg.get("search") or [{}]:
+                found, latencies = run_queries(col, queries, search_params(cfg["index_type"], metric, sp), args.k)
+                results.append({"index_type": cfg["index_type"], "params": build["params"], "search": sp,
+                                "recall": round(recall_at_k(truth, found, args.k), 4), **latency_summary(latencies)})
+            col.release()
+    finally:
+        if not args.keep:
+            for name in created:
+                utility.drop_collection(name)
+
+    print(f"\n{'index':<10} {'build params':<36} {'search':<18} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['index_type']:<10} {json.dumps(r['params']):<36} {json.dumps(r['search']):<18} "
+              f"{r['recall']:>9.4f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(data), "dim": int(data.shape[1]), "k": args.k, "results": results}, f, indent=2)
+        print(f"\n結果已寫入 {args.output}")
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from src.config import EMBED_DIM, OLLAMA_MODEL
+from src.bench.fake_ollama import FakeOllama
+from src.bench.fixtures import PRODUCT_WORDS, make_pdf_corpus, make_products_db
+from src.bench.report import compare_runs, format_comparison, latency_summary, stage_delta, stage_totals
+
+# 以假的 Ollama (固定延遲、逐 token 串流、確定性 embedding) 與 local 向量後端取代 Ollama / Milvus，
+# 依序量測兩個 ingest 腳本與各聊天端點在不同並行數下的吞吐量、延遲百分位數、首個 token 時間與各階段耗時
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    # name: (path, body extras, streamed)
+    "openai_stream": ("/v1/chat/completions", {"stream": True}, True),
+    "openai": ("/v1/chat/completions", {"stream": False}, False),
+    "legacy": ("/api/chat", {}, False),
+    "raw_stream": ("/v1/chat/completions?raw=true", {"stream": True}, True),
+}
+
+QUESTION_TEMPLATES = (
+    "what does the lab paper say about {topic} (case {n})?",
+    "what is the unit price of {product} {n}?",
+    "compare the {topic} results across our papers and compute the average gain for case {n}",
+    "explain {topic} in simple terms, example {n}",
+)
+_TOPICS = ("dense retrieval", "image segmentation", "speech transcription", "graph neural networks", "robot grasping")
+
+# 在子程序中執行 ingest 腳本: pyodbc 改連到 SQLite 副本，並記錄 run_pipeline 的各階段統計
+_INGEST_BOOTSTRAP = """
+import json, runpy, sqlite3, sys, types
+script, stats_path, sqlite_path = sys.argv[1:4]
+sys.argv = [script]
+sys.modules["pyodbc"] = types.SimpleNamespace(connect=lambda *a, **k: sqlite3.connect(sqlite_path))
+from src.ingest import pipeline
+captured = []
+_run_pipeline = pipeline.run_pipeline
+def run_pipeline(*args, **kwargs):
+    stats = _run_pipeline(*args, **kwargs)
+    captured.extend(stats)
+    return stats
+pipeline.run_pipeline = run_pipeline
+try:
+    runpy.run_path(script, run_name="__main__")
+finally:
+    with open(stats_path, "w", encoding="utf-8") as f:
+        json.dump([{"stage": s.name, "items": s.items, "batches": s.batches, "busy_s": round(s.busy, 3),
+                    "wait_in_s": round(s.wait_in, 3), "wait_out_s": round(s.wait_out, 3)} for s in captured], f)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_env(workdir: str, ollama_url: str, answer_cache: bool) -> Dict[str, str]:
+    # 明確設定每個路徑，避免 .env 的值指向正式環境的資料
+    ingest_dir = os.path.join(workdir, "ingest")
+    return {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "OLLAMA_BASE_URL": ollama_url,
+        "EMBED_PROVIDER": "ollama",
+        "VECTOR_BACKEND": "local",
+        "VECTOR_LOCAL_DIR": os.path.join(workdir, "vectors"),
+        "INGEST_STATE_DIR": ingest_dir,
+        "PDF_MANIFEST_PATH": os.path.join(ingest_dir, "pdf_manifest.json"),
+        "SQL_INGEST_STATE_PATH": os.path.join(ingest_dir, "sql_state.json"),
+        "PDF_DIRECTORY_PATH": os.path.join(workdir, "pdf"),
+        "SQL_INGEST_TABLES_FILE": "",
+        "SQL_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'northwind.sqlite')}",
+        "WARMUP_ON_START": "true",
+        "AGENT_VERBOSE": "false",
+        "ANSWER_CACHE_ENABLED": "true" if answer_cache else "false",
+    }
+
+
+def run_ingest(script: str, env: Dict[str, str], workdir: str) -> dict:
+    name = os.path.splitext(os.path.basename(script))[0]
+    stats_path = os.path.join(workdir, f"{name}.stats.json")
+    sqlite_path = os.path.join(workdir, "northwind.sqlite")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _INGEST_BOOTSTRAP, os.path.join(REPO_ROOT, script), stats_path, sqlite_path],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    stages = []
+    if os.path.exists(stats_path):
+        with open(stats_path, "r", encoding="utf-8") as f:
+            stages = json.load(f)
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:] + proc.stderr[-2000:])
+    result = {"exit_code": proc.returncode, "wall_s": round(wall, 3), "stages": stages}
+    items = stages[0]["items"] if stages else 0
+    print(f"  {name}: exit={proc.returncode} wall={wall:.2f}s items={items}")
+    for s in stages:
+        print(f"    {s['stage']:<7} items={s['items']:<6} busy={s['busy_s']:.2f}s "
+              f"wait_in={s['wait_in_s']:.2f}s wait_out={s['wait_out_s']:.2f}s")
+    return result
+
+
+def start_app(env: Dict[str, str], port: int, ready_timeout: float) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API 啟動失敗 (exit={proc.returncode})")
+        try:
+            if requests.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"API 在 {ready_timeout:.0f}s 內未就緒")
+
+
+def question(n: int, run: str) -> str:
+    template = QUESTION_TEMPLATES[n % len(QUESTION_TEMPLATES)]
+    return template.format(topic=_TOPICS[n % len(_TOPICS)], product=PRODUCT_WORDS[n % len(PRODUCT_WORDS)],
+                           n=f"{run}-{n}")
+
+
+_local = threading.local()
+
+
+def one_request(url: str, endpoint: str, prompt: str, timeout: float) -> Tuple[int, float, Optional[float]]:
+    """(HTTP status, seconds until the full answer, seconds until the first answer token or None)."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        # 每個 client 執行緒一個 keep-alive 連線，像一般的前端使用者
+        session = _local.session = requests.Session()
+    path, extra, streamed = ENDPOINTS[endpoint]
+    body = {"model": OLLAMA_MODEL, "messages": [{"role": "user", "content": prompt}], **extra}
+    started = time.perf_counter()
+    ttft = None
+    try:
+        with session.post(url + path, json=body, stream=streamed, timeout=timeout) as res:
+            if not streamed or res.status_code != 200:
+                res.content
+                return res.status_code, time.perf_counter() - started, None
+            res.encoding = "utf-8"
+            for line in res.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                chunk = json.loads(line[6:])
+                if "error" in chunk:
+                    return 599, time.perf_counter() - started, ttft
+                delta = (chunk.get("choices") or [{}])[0].get("delta", {})
+                if ttft is None and delta.get("content"):
+                    ttft = time.perf_counter() - started
+            return 200, time.perf_counter() - started, ttft
+    except requests.RequestException:
+        return 0, time.perf_counter() - started, ttft
+
+
+def run_level(url: str, endpoint: str, concurrency: int, total: int, timeout: float, run: str) -> dict:
+    before = stage_totals(requests.get(f"{url}/metrics", timeout=10).text)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(one_request, url, endpoint,
+                               question(i, f"{run}-{endpoint}-{concurrency}"), timeout) for i in range(total)]
+        outcomes = [f.result() for f in futures]
+    wall = time.perf_counter() - started
+    after = stage_totals(requests.get(f"{url}/metrics", timeout=10).text)
+
+    ok = [o for o in outcomes if o[0] == 200]
+    statuses: Dict[str, int] = {}
+    for status, _, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ttfts = [o[2] for o in ok if o[2] is not None]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": total - len(ok),
+        "statuses": statuses,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall > 0 else 0.0,
+        "latency": latency_summary([o[1] for o in ok]),
+        "ttft": latency_summary(ttfts) if ENDPOINTS[endpoint][2] else None,
+        "stages": stage_delta(before, after),
+    }
+
+
+def print_level(r: dict) -> None:
+    lat = r["latency"] or {}
+    ttft = f" ttft p50={r['ttft']['p50_ms']:.0f}ms p95={r['ttft']['p95_ms']:.0f}ms" if r["ttft"] else ""
+    print(f"  {r['endpoint']:<14} c={r['concurrency']:<3} {r['throughput_rps']:7.2f} req/s "
+          f"p50={lat.get('p50_ms', 0):.0f}ms p95={lat.get('p95_ms', 0):.0f}ms p99={lat.get('p99_ms', 0):.0f}ms"
+          f"{ttft} errors={r['errors']}")
+    for stage, s in r["stages"].items():
+        print(f"      {stage:<20} n={s['count']:<5} mean={s['mean_ms']:9.2f}ms total={s['total_s']:8.2f}s")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load / regression benchmark of the ingest scripts and chat endpoints against a fake Ollama "
+                    "and the local vector backend.")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per endpoint and concurrency level")
+    parser.add_argument("--endpoints", default="openai_stream,openai,legacy",
+                        help=f"comma-separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--pdfs", type=int, default=20, help="synthetic PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=5, help="pages per PDF")
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the synthetic Products table")
+    parser.add_argument("--prompt-ms", type=float, default=200, help="fake Ollama delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="fake Ollama delay between tokens")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per fake answer")
+    parser.add_argument("--embed-ms", type=float, default=10, help="fake Ollama delay per embedding request")
+    parser.add_argument("--ollama-parallel", type=int, default=4, help="generations the fake Ollama runs at once")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache enabled")
+    parser.add_argument("--skip-ingest", action="store_true", help="only benchmark the chat endpoints")
+    parser.add_argument("--url", help="benchmark an already running API instead of starting one (no fakes)")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout (seconds)")
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--workdir", help="keep the corpus, vectors and state here (default: temporary)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown for --compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {sorted(unknown)}")
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir")}
+    results = {"created": datetime.now(timezone.utc).isoformat(), "commit": git_commit(), "settings": settings,
+               "ingest": {}, "chat": []}
+    tmp = None if args.workdir else tempfile.TemporaryDirectory(prefix="bench_load_")
+    workdir = os.path.abspath(args.workdir or tmp.name)
+    fake = None
+    app = None
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            fake = FakeOllama(dim=EMBED_DIM, prompt_ms=args.prompt_ms, token_ms=args.token_ms, tokens=args.tokens,
+                              embed_ms=args.embed_ms, parallel=args.ollama_parallel).start()
+            env = bench_env(workdir, fake.url, args.answer_cache)
+            print(f"✅ 假的 Ollama: {fake.url}，工作目錄: {workdir}")
+            if not args.skip_ingest:
+                make_pdf_corpus(os.path.join(workdir, "pdf"), args.pdfs, args.pages, args.seed)
+                make_products_db(os.path.join(workdir, "northwind.sqlite"), args.rows, args.seed)
+                print(f"[Ingest] {args.pdfs} 個 PDF x {args.pages} 頁, {args.rows} 筆資料列")
+                for script in ("scripts/ingest_pdfs.py", "scripts/ingest_sql.py"):
+                    results["ingest"][os.path.basename(script)] = run_ingest(script, env, workdir)
+            port = free_port()
+            started = time.perf_counter()
+            app = start_app(env, port, args.ready_timeout)
+            url = f"http://127.0.0.1:{port}"
+            results["startup_s"] = round(time.perf_counter() - started, 3)
+            print(f"✅ API 就緒 ({results['startup_s']:.1f}s): {url}")
+
+        print("[Chat]")
+        run_id = f"{args.seed}-{int(time.time())}"
+        for endpoint in endpoints:
+            for level in levels:
+                result = run_level(url, endpoint, level, args.requests, args.timeout, run_id)
+                results["chat"].append(result)
+                print_level(result)
+        if fake is not None:
+            results["fake_ollama"] = dict(fake.counts)
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait(timeout=30)
+        if fake is not None:
+            fake.close()
+        if tmp is not None:
+            tmp.cleanup()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n結果已寫入 {args.output}")
+
+    failed = any(r["exit_code"] != 0 for r in results["ingest"].values())
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_runs(baseline, results, args.tolerance)
+        changed = [k for k in ("prompt_ms", "token_ms", "tokens", "embed_ms", "ollama_parallel", "requests")
+                   if baseline.get("settings", {}).get(k) != settings.get(k)]
+        if changed:
+            print(f"⚠️ 與基準的設定不同 ({', '.join(changed)})，比較結果僅供參考")
+        print(f"\n[比較] 基準: {args.compare} (commit {baseline.get('commit')}), 容許 {args.tolerance:.0%}")
+        print(format_comparison(rows))
+        regressions = [r for r in rows if r["regression"]]
+        if regressions:
+            print(f"❌ {len(regressions)} 項指標退步超過 {args.tolerance:.0%}")
+            failed = True
+        else:
+            print("✅ 沒有超過容許範圍的退步")
+    sys.exit(1 if failed else 0)
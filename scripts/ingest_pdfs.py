@@ -1,110 +1,108 @@
 import os
-import re
 import glob
-import concurrent.futures
-from typing import List
-
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Milvus
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain.schema.document import Document
+import time
+from typing import List, Tuple
 
 from src.config import (
-    OLLAMA_BASE_URL, PDF_DIRECTORY_PATH, MILVUS_HOST,
-    MILVUS_PORT, PDF_COLLECTION_NAME, OLLAMA_EMBED_MODEL,
+    PDF_DIRECTORY_PATH, PDF_COLLECTION_NAME, PDF_MANIFEST_PATH, INGEST_PARSE_WORKERS,
+    INGEST_EMBED_BATCH, INGEST_INSERT_BATCH, INGEST_QUEUE_SIZE,
 )
-
-# --- 1. 輔助函式 ---
-
-def sanitize_metadata_keys(doc: Document) -> Document:
-    if not doc.metadata:
-        return doc
-    new_meta = {}
-    for k, v in doc.metadata.items():
-        new_key = re.sub(r'[^a-zA-Z0-9_]', '_', k)
-        new_meta[new_key] = v
-    return Document(page_content=doc.page_content, metadata=new_meta)
-
-def unify_metadata_keys(docs: List[Document]) -> List[Document]:
-    all_keys = set()
-    for doc in docs:
-        if doc.metadata:
-            all_keys.update(doc.metadata.keys())
-    unified_docs = []
-    for doc in docs:
-        new_meta = {key: doc.metadata.get(key, "") for key in all_keys} if doc.metadata else {k: "" for k in all_keys}
-        unified_docs.append(Document(page_content=doc.page_content, metadata=new_meta))
-    return unified_docs
-
-# --- 2. 平行處理 PDF 檔案切割 ---
-def process_pdf(pdf_file: str) -> List[Document]:
-    print(f" -> 正在處理檔案: {pdf_file}")
-    try:
-        loader = PyPDFLoader(pdf_file)
-        documents = loader.load()
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        split_docs = text_splitter.split_documents(documents)
-        print(f"    -> 已切割成 {len(split_docs)} 個文件區塊。")
-        return split_docs
-    except Exception as e:
-        print(f"    ❌ [錯誤] 處理檔案 {pdf_file} 時失敗: {e}")
-        return []
-
-def load_and_split_pdfs_parallel(directory_path: str) -> List[Document]:
-    print(f"[偵錯] 正在搜尋路徑: {os.path.abspath(directory_path)}")
-    pdf_files = glob.glob(os.path.join(directory_path, "*.pdf"))
-    
-    if not pdf_files:
-        print(f"❌ [嚴重] 在 '{directory_path}' 中沒有找到任何 PDF 檔案。請檢查路徑和檔案權限。")
-        return []
-
-    print(f"✅ [成功] 找到 {len(pdf_files)} 個 PDF 檔案。開始平行處理...")
-
-    all_docs = []
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        results = executor.map(process_pdf, pdf_files)
-    for split_docs in results:
-        all_docs.extend(split_docs)
-    return all_docs
-
-# --- 3. 主要執行流程 ---
+from src.chains.cache import bump_collection_version
+from src.chains.milvus_index import INDEX_PARAMS, ensure_index
+from src.ingest.embedder import build_embedder
+from src.ingest.manifest import Manifest
+from src.ingest.milvus_sink import (
+    open_store, collection_exists, has_string_ids, layout_matches, upsert_embedded, delete_ids,
+)
+from src.ingest.pdf import iter_pdf_items
+from src.ingest.pipeline import PipelineError, run_pipeline, format_report
+
+# --- 1. 比對 manifest ---
+def plan_changes(manifest: Manifest, pdf_files: List[str]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Return ([(new or changed file, sha256)], [files removed from disk])."""
+    changed = []
+    for pdf_file in pdf_files:
+        sha = manifest.changed_sha256(pdf_file)
+        if sha is not None:
+            changed.append((pdf_file, sha))
+    present = set(pdf_files)
+    deleted = [path for path in manifest.files if path not in present]
+    return changed, deleted
+
+def open_pdf_store(manifest: Manifest):
+    store = open_store(PDF_COLLECTION_NAME)
+    if not collection_exists(store):
+        manifest.files.clear()
+    elif not has_string_ids(store) or not manifest.files:
+        # 舊版 (auto_id) collection 或遺失 manifest: 無法得知已寫入的內容，只重建這一次
+        print("⚠️ 現有 collection 無對應 manifest，將重建一次。")
+        manifest.files.clear()
+        store = open_store(PDF_COLLECTION_NAME, drop_old=True)
+    elif not layout_matches(store):
+        print("⚠️ 現有 collection 的欄位配置與 MILVUS_PAYLOAD / MILVUS_VECTOR_DTYPE 不同 (或 docstore 遺失)，將重建一次。")
+        manifest.files.clear()
+        store = open_store(PDF_COLLECTION_NAME, drop_old=True)
+    if ensure_index(store):
+        print(f"🔧 已依設定重建索引: {INDEX_PARAMS}")
+    return store
+
+# --- 2. 主要執行流程 ---
 if __name__ == "__main__":
-    docs_from_all_pdfs = load_and_split_pdfs_parallel(PDF_DIRECTORY_PATH)
-
-    if not docs_from_all_pdfs:
-        print("\n[結束] 因為沒有讀取到任何文件區塊，程式已終止。")
-        exit(1)
-    else:
-        print(f"\n✅ [成功] 所有 PDF 已成功切割成 {len(docs_from_all_pdfs)} 個文件區塊。")
-
-    docs_sanitized = [sanitize_metadata_keys(doc) for doc in docs_from_all_pdfs]
-    docs_unified = unify_metadata_keys(docs_sanitized)
-
-    print("\n[偵錯] 準備寫入 Milvus 的第一個文件預覽：")
-    print("  - Page Content (前100字):", docs_unified[0].page_content[:100] + "...")
-    print("  - Metadata:", docs_unified[0].metadata)
-
-    embeddings = OllamaEmbeddings(model=OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL)
-    print(f"\n✅ [成功] 已連接到 Ollama Embedding 模型: {OLLAMA_EMBED_MODEL}")
-
-    BATCH_SIZE = 500
-    print(f"\n[開始] 準備將 {len(docs_unified)} 個文件以批次寫入 Milvus collection: {PDF_COLLECTION_NAME} ...")
+    started = time.perf_counter()
+    print(f"[偵錯] 正在搜尋路徑: {os.path.abspath(PDF_DIRECTORY_PATH)}")
+    pdf_files = sorted(glob.glob(os.path.join(PDF_DIRECTORY_PATH, "*.pdf")))
+    manifest = Manifest.load(PDF_MANIFEST_PATH, PDF_COLLECTION_NAME)
+    store = open_pdf_store(manifest)
+
+    changed, deleted = plan_changes(manifest, pdf_files)
+    print(f"✅ 共 {len(pdf_files)} 個 PDF: {len(changed)} 個新增/變更, {len(deleted)} 個已刪除, "
+          f"{len(pdf_files) - len(changed)} 個未變更。")
+    manifest.save()
+
+    if not changed and not deleted:
+        print("\n[結束] 沒有需要更新的檔案。")
+        exit(0)
+
+    for pdf_file in deleted:
+        stale = manifest.forget(pdf_file)
+        delete_ids(store, stale)
+        manifest.save()
+        print(f"  🗑️ 已移除 {pdf_file} 的 {len(stale)} 個區塊。")
+    if deleted:
+        bump_collection_version(PDF_COLLECTION_NAME)
+
+    def finalize(pdf_file: str, sha: str, ids: List[str]) -> None:
+        # 新區塊全部寫入後才刪除舊版本，更新期間搜尋不會中斷
+        old_ids = set(manifest.files.get(pdf_file, {}).get("chunk_ids", [])) - set(ids)
+        delete_ids(store, sorted(old_ids))
+        manifest.record(pdf_file, sha, ids)
+        manifest.save()
+        # API 端的搜尋 / 答案快取以此版本判斷是否過期
+        bump_collection_version(PDF_COLLECTION_NAME)
+        embedder.checkpoint.discard(ids)
+        print(f"  ✅ {pdf_file}: 寫入 {len(ids)} 個區塊, 移除 {len(old_ids)} 個舊區塊。")
+
+    failed: List[str] = []
+    embedder = build_embedder(PDF_COLLECTION_NAME)
     try:
-        for i in range(0, len(docs_unified), BATCH_SIZE):
-            batch = docs_unified[i:i+BATCH_SIZE]
-            Milvus.from_documents(
-                documents=batch,
-                embedding=embeddings,
-                collection_name=PDF_COLLECTION_NAME,
-                connection_args={"host": MILVUS_HOST, "port": MILVUS_PORT},
-                drop_old=(i == 0)
-            )
-            print(f"  ✅ 已寫入第 {i} ~ {i+len(batch)-1} 筆文件。")
-        print("✅ [成功] LangChain 'from_documents' 批次寫入 Milvus 完成！")
-    except Exception as e:
+        stats = run_pipeline(
+            iter_pdf_items(changed, finalize, failed, INGEST_PARSE_WORKERS),
+            embed_fn=embedder.embed_chunks,
+            insert_fn=lambda batch: upsert_embedded(store, batch),
+            embed_batch=INGEST_EMBED_BATCH,
+            insert_batch=INGEST_INSERT_BATCH,
+            queue_size=INGEST_QUEUE_SIZE,
+        )
+    except PipelineError as e:
         print(f"❌ [嚴重錯誤] 在寫入 Milvus 時發生錯誤: {e}")
         import traceback
         traceback.print_exc()
+        print(embedder.report())
+        exit(1)
+    finally:
+        embedder.close()
 
-    print("\n[結束] Ingest 腳本執行完畢。")
+    print("\n" + format_report(stats, time.perf_counter() - started))
+    print(embedder.report())
+    print(f"\n[結束] Ingest 腳本執行完畢。{len(failed)} 個檔案處理失敗。")
+    exit(1 if failed else 0)
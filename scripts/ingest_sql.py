@@ -1,58 +1,83 @@
-import pyodbc
-from langchain.schema.document import Document
-from langchain_community.vectorstores import Milvus
-from langchain_community.embeddings import OllamaEmbeddings
+import time
+
 from src.config import (
-    MILVUS_HOST, MILVUS_PORT, SQL_COLLECTION_NAME, OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL,
-    MSSQL_SERVER, MSSQL_DATABASE, MSSQL_USER, MSSQL_PASSWORD
+    SQL_COLLECTION_NAME, MSSQL_SERVER, MSSQL_DATABASE, MSSQL_USER, MSSQL_PASSWORD,
+    SQL_INGEST_TABLES_FILE, SQL_INGEST_STATE_PATH, SQL_FETCH_SIZE,
+    INGEST_EMBED_BATCH, INGEST_INSERT_BATCH, INGEST_QUEUE_SIZE,
 )
-
-# MSSQL 連線字串
-conn_str = (
-    f"DRIVER={{ODBC Driver 18 for SQL Server}};"
-    f"SERVER={MSSQL_SERVER};"
-    f"DATABASE={MSSQL_DATABASE};"
-    f"UID={MSSQL_USER};"
-    f"PWD={MSSQL_PASSWORD};"
-    f"TrustServerCertificate=yes;"
+from src.chains.cache import bump_collection_version
+from src.chains.milvus_index import INDEX_PARAMS, ensure_index
+from src.ingest.embedder import build_embedder
+from src.ingest.milvus_sink import (
+    open_store, collection_exists, has_string_ids, layout_matches, upsert_embedded, delete_ids,
 )
-conn = pyodbc.connect(conn_str)
-cursor = conn.cursor()
+from src.ingest.pipeline import PipelineError, run_pipeline, format_report
+from src.ingest.sql import SqlIngestState, load_table_specs, iter_sql_items
 
-# 查詢 Products 表，這裡取一些重要欄位
-cursor.execute("""
-    SELECT ProductID, ProductName, SupplierID, CategoryID, QuantityPerUnit, UnitPrice, UnitsInStock
-    FROM Products
-""")
+def connect_mssql():
+    import pyodbc
 
-docs = []
-for row in cursor.fetchall():
-    content = (
-        f"Product Name: {row.ProductName}\n"
-        f"Supplier ID: {row.SupplierID}\n"
-        f"Category ID: {row.CategoryID}\n"
-        f"Quantity Per Unit: {row.QuantityPerUnit}\n"
-        f"Unit Price: {row.UnitPrice}\n"
-        f"Units In Stock: {row.UnitsInStock}"
+    # MSSQL 連線字串
+    conn_str = (
+        f"DRIVER={{ODBC Driver 18 for SQL Server}};"
+        f"SERVER={MSSQL_SERVER};"
+        f"DATABASE={MSSQL_DATABASE};"
+        f"UID={MSSQL_USER};"
+        f"PWD={MSSQL_PASSWORD};"
+        f"TrustServerCertificate=yes;"
     )
-    metadata = {"ProductID": row.ProductID}
-    docs.append(Document(page_content=content, metadata=metadata))
+    return pyodbc.connect(conn_str)
 
-conn.close()
+if __name__ == "__main__":
+    started = time.perf_counter()
+    specs = load_table_specs(SQL_INGEST_TABLES_FILE)
+    state = SqlIngestState.load(SQL_INGEST_STATE_PATH, SQL_COLLECTION_NAME)
 
-# 建立 Embeddings
-embeddings = OllamaEmbeddings(
-    model=OLLAMA_EMBED_MODEL,
-    base_url=OLLAMA_BASE_URL
-)
+    store = open_store(SQL_COLLECTION_NAME)
+    if not collection_exists(store):
+        state.tables.clear()
+    elif not has_string_ids(store) or not state.tables:
+        # 舊版 (drop_old 重建的 auto_id) collection 或遺失狀態檔: 只重建這一次
+        print("⚠️ 現有 collection 無對應狀態檔，將重建一次。")
+        state.tables.clear()
+        store = open_store(SQL_COLLECTION_NAME, drop_old=True)
+    elif not layout_matches(store):
+        print("⚠️ 現有 collection 的欄位配置與 MILVUS_PAYLOAD / MILVUS_VECTOR_DTYPE 不同 (或 docstore 遺失)，將重建一次。")
+        state.tables.clear()
+        store = open_store(SQL_COLLECTION_NAME, drop_old=True)
+    if ensure_index(store):
+        print(f"🔧 已依設定重建索引: {INDEX_PARAMS}")
+    # 狀態檔中已不在設定內的資料表不再追蹤
+    for name in list(state.tables):
+        if name not in {spec.name for spec in specs}:
+            state.tables.pop(name)
+    state.save()
 
-# 將文件寫入 Milvus，並使用 drop_old=True 重建 collection schema
-vector_store = Milvus.from_documents(
-    documents=docs,
-    embedding=embeddings,
-    collection_name=SQL_COLLECTION_NAME,
-    connection_args={"host": MILVUS_HOST, "port": MILVUS_PORT},
-    drop_old=True,
-)
+    conn = connect_mssql()
+    embedder = build_embedder(SQL_COLLECTION_NAME)
+    try:
+        stats = run_pipeline(
+            iter_sql_items(conn, specs, state, lambda ids: delete_ids(store, ids), SQL_FETCH_SIZE),
+            embed_fn=embedder.embed_chunks,
+            insert_fn=lambda batch: upsert_embedded(store, batch),
+            embed_batch=INGEST_EMBED_BATCH,
+            insert_batch=INGEST_INSERT_BATCH,
+            queue_size=INGEST_QUEUE_SIZE,
+            source_name="fetch",
+        )
+    except PipelineError as e:
+        print(f"❌ [嚴重錯誤] SQL ingest 失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+    finally:
+        conn.close()
+        # 即使中途失敗，已寫入的資料列也讓 API 端的快取失效
+        bump_collection_version(SQL_COLLECTION_NAME)
 
-print(f"✅ 已將 {len(docs)} 筆 Products 資料寫入 Milvus")
+    # 所有資料列都已寫入並更新狀態，checkpoint 不再需要
+    embedder.checkpoint.clear()
+    print(format_report(stats, time.perf_counter() - started))
+    print(embedder.report())
+    embedder.close()
+    print(f"✅ 已將 {stats[0].items} 筆新增/變更的資料列寫入 Milvus ({', '.join(s.name for s in specs)})")
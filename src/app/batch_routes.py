@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+import asyncio
+import json
+import threading
+
+from src.chains.batch import BatchLineError, iter_batch, iter_batch_items
+from src.app.executor import agent_pool
+from src.app.runtime import get_agent
+
+router = APIRouter()
+
+@router.post("/v1/batch")
+async def batch(request: Request):
+    """JSONL body ({"id", "prompt"} or {"id", "messages"} per line) -> JSONL results in completion order.
+
+    Results carry the input id, so a client can resume by re-sending only the ids it has not received.
+    """
+    body = (await request.body()).decode("utf-8")
+    try:
+        items = list(iter_batch_items(body.splitlines()))
+    except BatchLineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # first use builds the agent; keep that off the event loop
+    agent = await run_in_threadpool(get_agent)
+    cancel = threading.Event()
+    loop = asyncio.get_running_loop()
+
+    def execute(fn):
+        # each running item holds an agent_pool slot, so batch and chat requests share one limit
+        return asyncio.run_coroutine_threadsafe(agent_pool.run_background(fn, cancel), loop).result()
+
+    results = iter_batch(items, agent, cancel=cancel, execute=execute)
+
+    async def stream_gen():
+        try:
+            async for result in iterate_in_threadpool(results):
+                yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+        finally:
+            # Client gone or done: drop queued items, running ones stop at their next LLM token.
+            # The generator may still be executing in a worker thread, so it is signalled, not closed.
+            cancel.set()
+
+    return StreamingResponse(stream_gen(), media_type="application/x-ndjson", headers={"X-Batch-Size": str(len(items))})
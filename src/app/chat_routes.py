@@ -1,22 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
 from datetime import datetime
-from src.chains.agent_chain import init_agent
+from src.app.executor import agent_pool
+from src.app.runtime import get_agent
+from src.metrics import RequestMetrics
 
 router = APIRouter()
-agent = init_agent()
 
 class ChatRequest(BaseModel):
     model: str
     messages: list
 
 @router.post("/chat")
-async def chat(req: ChatRequest):
-    user_message = next(
-        (m["content"] for m in reversed(req.messages) if m["role"] == "user"),
-        ""
-    )
-    answer = agent.run(user_message)
+async def chat(req: ChatRequest, request: Request):
+    metrics = RequestMetrics()
+
+    def run(callbacks):
+        try:
+            return get_agent().chat(req.messages, callbacks=callbacks + [metrics])
+        finally:
+            metrics.finish()
+
+    answer = await agent_pool.run(run, request=request)
     return {
         "model": req.model,
         "created_at": datetime.utcnow().isoformat() + "Z",
@@ -24,5 +29,8 @@ async def chat(req: ChatRequest):
             "role": "assistant",
             "content": answer
         },
-        "done": True
+        "done": True,
+        # 與 Ollama /api/chat 相同的 token 統計欄位
+        "prompt_eval_count": metrics.prompt_tokens,
+        "eval_count": metrics.completion_tokens,
     }
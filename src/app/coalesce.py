@@ -0,0 +1,161 @@
+# coalesce.py
+# Single-flight: concurrent requests with the same key share one in-flight computation.
+# Non-streaming callers await the same task; streaming callers subscribe to one event stream
+# (late joiners get the events so far replayed). The work is cancelled only when every caller left.
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+from prometheus_client import Counter, Gauge
+
+from src.config import COALESCE_ENABLED, DISCONNECT_POLL_INTERVAL
+
+T = TypeVar("T")
+
+COALESCED = Counter("rag_coalesce_requests_total", "Requests by single-flight role", ["kind", "role"])
+IN_FLIGHT = Gauge("rag_coalesce_in_flight", "Distinct computations currently in flight", ["kind"])
+
+
+async def _client_gone(request: Optional[Request]) -> bool:
+    return request is not None and await request.is_disconnected()
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    __slots__ = ("task", "admitted", "events", "done", "error", "changed", "subscribers")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.admitted: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = COALESCE_ENABLED):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Stream] = {}
+
+    def _key(self, key: Hashable) -> Hashable:
+        # disabled: every request gets a private key, but the same code path
+        return key if self.enabled else object()
+
+    async def call(self, key: Hashable, fn: Callable[[], Awaitable[T]], request: Optional[Request] = None) -> T:
+        key = self._key(key)
+        entry = self._calls.get(key)
+        if entry is None:
+            entry = _Call(asyncio.create_task(fn()))
+            self._calls[key] = entry
+            entry.task.add_done_callback(lambda _: self._forget(self._calls, key, entry, "call"))
+            IN_FLIGHT.labels("call").inc()
+            COALESCED.labels("call", "leader").inc()
+        else:
+            COALESCED.labels("call", "follower").inc()
+        entry.waiters += 1
+        try:
+            while True:
+                done, _ = await asyncio.wait({entry.task}, timeout=DISCONNECT_POLL_INTERVAL)
+                if done:
+                    return entry.task.result()
+                if await _client_gone(request):
+                    raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.task.done():
+                entry.task.cancel()
+
+    async def stream(
+        self,
+        key: Hashable,
+        open_events: Callable[[], Awaitable[AsyncIterator]],
+        request: Optional[Request] = None,
+    ) -> AsyncIterator:
+        """Join (or start) the stream for `key`; admission errors (429/503) are raised here."""
+        key = self._key(key)
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _Stream()
+            self._streams[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, open_events))
+            IN_FLIGHT.labels("stream").inc()
+            COALESCED.labels("stream", "leader").inc()
+        else:
+            COALESCED.labels("stream", "follower").inc()
+        flight.subscribers += 1
+        try:
+            await asyncio.shield(flight.admitted)
+        except BaseException:
+            self._leave(key, flight)
+            raise
+        return self._subscribe(key, flight, request)
+
+    async def _pump(self, key: Hashable, flight: _Stream, open_events) -> None:
+        try:
+            try:
+                events = await open_events()
+            except BaseException as e:
+                flight.admitted.set_exception(e)
+                return
+            flight.admitted.set_result(None)
+            async for event in events:
+                flight.events.append(event)
+                flight.changed.set()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.changed.set()
+            self._forget(self._streams, key, flight, "stream")
+
+    async def _subscribe(self, key: Hashable, flight: _Stream, request: Optional[Request]):
+        sent = 0
+        try:
+            while True:
+                if sent < len(flight.events):
+                    pending = flight.events[sent:]
+                    sent += len(pending)
+                    for event in pending:
+                        yield event
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                flight.changed.clear()
+                try:
+                    await asyncio.wait_for(flight.changed.wait(), DISCONNECT_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await _client_gone(request):
+                        return
+        finally:
+            self._leave(key, flight)
+
+    def _leave(self, key: Hashable, flight: _Stream) -> None:
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.done:
+            # nobody is listening any more: stop the agent run (AgentPool sets its cancel event)
+            flight.task.cancel()
+            self._forget(self._streams, key, flight, "stream")
+
+    @staticmethod
+    def _forget(table: Dict, key: Hashable, entry, kind: str) -> None:
+        if table.get(key) is entry:
+            del table[key]
+            IN_FLIGHT.labels(kind).dec()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,194 @@
+# executor.py
+# Bounded worker pool for the synchronous agent / LLM calls, so they never run on the event loop.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, List, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Gauge
+
+from src.config import (
+    AGENT_MAX_CONCURRENCY, AGENT_MAX_QUEUE, AGENT_QUEUE_TIMEOUT, AGENT_RUN_TIMEOUT,
+    DISCONNECT_POLL_INTERVAL,
+)
+from src.metrics import time_stage
+
+T = TypeVar("T")
+
+# fn(callbacks) -> result; the callbacks must be passed on to agent.run / llm.invoke
+RunFn = Callable[[List[BaseCallbackHandler]], T]
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class CancelHandler(BaseCallbackHandler):
+    """Aborts a run at the next LLM token / tool / agent step once the event is set."""
+
+    raise_error = True
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def _check(self) -> None:
+        if self.event.is_set():
+            raise RunCancelled()
+
+    def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+        self._check()
+
+    def on_llm_new_token(self, *args: Any, **kwargs: Any) -> None:
+        self._check()
+
+    def on_tool_start(self, *args: Any, **kwargs: Any) -> None:
+        self._check()
+
+    def on_agent_action(self, *args: Any, **kwargs: Any) -> None:
+        self._check()
+
+
+class AgentPool:
+    def __init__(
+        self,
+        max_concurrency: int = AGENT_MAX_CONCURRENCY,
+        max_queue: int = AGENT_MAX_QUEUE,
+        queue_timeout: float = AGENT_QUEUE_TIMEOUT,
+        run_timeout: float = AGENT_RUN_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.run_timeout = run_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent-run")
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    async def _acquire(self) -> None:
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise HTTPException(status_code=429, detail="Server busy, retry later", headers={"Retry-After": "5"})
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Timed out waiting for a worker", headers={"Retry-After": "10"})
+        finally:
+            self.waiting -= 1
+            time_stage("queue_wait", "", time.perf_counter() - started)
+        self.active += 1
+
+    def _release(self, fut: "asyncio.Future") -> None:
+        # The slot is held until the worker thread really finishes, even after a timeout or disconnect.
+        self.active -= 1
+        self._slots.release()
+        if not fut.cancelled():
+            fut.exception()
+
+    def _submit(self, fn: RunFn, cancel: threading.Event) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self._executor, fn, [CancelHandler(cancel)])
+        fut.add_done_callback(self._release)
+        return fut
+
+    async def run_background(self, fn: RunFn, cancel: threading.Event) -> T:
+        """Run work that has no waiting client (batch items) in a pool slot.
+
+        It queues for a slot without the queue limit or timeouts, but is counted in
+        `active` / `waiting` like a request, so interactive callers see the load.
+        """
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            time_stage("queue_wait", "", time.perf_counter() - started)
+        if cancel.is_set():
+            self._slots.release()
+            raise RunCancelled()
+        self.active += 1
+        # shielded: if the caller is cancelled, the slot is still held until the thread finishes
+        return await asyncio.shield(self._submit(fn, cancel))
+
+    async def _client_gone(self, request: Optional[Request]) -> bool:
+        return request is not None and await request.is_disconnected()
+
+    async def run(self, fn: RunFn, request: Optional[Request] = None, timeout: Optional[float] = None) -> T:
+        await self._acquire()
+        cancel = threading.Event()
+        fut = self._submit(fn, cancel)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.run_timeout)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise HTTPException(status_code=504, detail="Agent run timed out")
+                done, _ = await asyncio.wait({fut}, timeout=min(remaining, DISCONNECT_POLL_INTERVAL))
+                if done:
+                    return fut.result()
+                if await self._client_gone(request):
+                    raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            if not fut.done():
+                cancel.set()
+
+    async def open_stream(
+        self,
+        fn: RunFn,
+        make_handler: Callable[[Callable[[Any], None]], BaseCallbackHandler],
+        request: Optional[Request] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator:
+        """Admit the run now (so saturation can still be answered with 429/503), then stream its events.
+
+        `make_handler(sink)` builds the callback handler that turns LLM tokens into
+        ("token", text) / ("step", info) events; if nothing was streamed, the final
+        result is yielded as one token.
+        """
+        await self._acquire()
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        handler = make_handler(lambda ev: loop.call_soon_threadsafe(events.put_nowait, ev))
+        cancel = threading.Event()
+        fut = self._submit(lambda cbs: fn([handler] + cbs), cancel)
+        fut.add_done_callback(lambda _: events.put_nowait(("done", None)))
+        return self._drain(events, fut, cancel, request, loop.time() + (timeout or self.run_timeout))
+
+    async def _drain(self, events: asyncio.Queue, fut, cancel: threading.Event, request, deadline: float):
+        loop = asyncio.get_running_loop()
+        streamed = False
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise HTTPException(status_code=504, detail="Agent run timed out")
+                try:
+                    kind, payload = await asyncio.wait_for(events.get(), min(remaining, DISCONNECT_POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    if await self._client_gone(request):
+                        return
+                    continue
+                if kind == "done":
+                    result = fut.result()
+                    if not streamed and result:
+                        yield "token", result
+                    return
+                if kind == "token":
+                    streamed = True
+                yield kind, payload
+        finally:
+            if not fut.done():
+                cancel.set()
+
+
+agent_pool = AgentPool()
+
+Gauge("rag_agent_pool_active", "Agent runs currently executing").set_function(lambda: agent_pool.active)
+Gauge("rag_agent_pool_waiting", "Requests waiting for an agent worker").set_function(lambda: agent_pool.waiting)
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Literal, Optional, Generator
+from typing import Any, AsyncGenerator, Dict, List, Literal, Optional
 from datetime import datetime
 import json
+import time
 
-from src.config import OLLAMA_MODEL   # 新增
-from src.chains.agent_chain import init_agent, get_llm  # 若 get_llm 尚未 export 就補 export
+from src.config import OLLAMA_MODEL, STREAM_AGENT_STEPS
+from src.chains.agent_chain import get_llm
+from src.chains.answer_cache import answer_cache
+from src.chains.retrieval import DEFAULT_COLLECTIONS, retrieve
+from src.chains.router import route_stats
+from src.chains.sessions import as_messages, conversation_key, render_prompt, sessions
+from src.chains.vector_registry import query_embedding_cache, search_cache
+from src.chains.streaming import FinalAnswerStreamHandler, TokenStreamHandler
+from src.app.coalesce import single_flight
+from src.app.executor import agent_pool
+from src.app.runtime import get_agent
+from src.metrics import RequestMetrics, time_stage
 
 router = APIRouter()
 
@@ -15,8 +26,6 @@ AVAILABLE_MODELS = [
     {"id": OLLAMA_MODEL, "object": "model"}
 ]
 
-agent = init_agent()
-
 class Message(BaseModel):
     role: Literal["user", "assistant", "system"]
     content: str
@@ -26,7 +35,12 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     stream: Optional[bool] = True
 
-def _build_completion(answer: str, model: str):
+class RetrieveRequest(BaseModel):
+    queries: List[str]
+    collections: List[str] = list(DEFAULT_COLLECTIONS)
+    k: int = 3
+
+def _build_completion(answer: str, model: str, usage: Dict[str, int]):
     return {
         "id": "chatcmpl-1",
         "object": "chat.completion",
@@ -39,44 +53,136 @@ def _build_completion(answer: str, model: str):
                 "finish_reason": "stop"
             }
         ],
-        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        "usage": usage
     }
 
-def _select_model_answer(model: str, prompt: str, raw: bool) -> str:
+def _select_model_run(model: str, messages: List[Message], raw: bool):
+    """Return fn(callbacks) -> answer, to be executed on the agent pool."""
     if model != OLLAMA_MODEL:
-        return f"Unknown model: {model}"
+        return lambda callbacks: f"Unknown model: {model}"
     if raw:
-        return get_llm()(prompt)
-    return agent.run(prompt)
+        prompt = render_prompt(as_messages(messages))
+        return lambda callbacks: get_llm().invoke(prompt, config={"callbacks": callbacks})
+    return lambda callbacks: get_agent().chat(messages, callbacks=callbacks)
+
+def _chunk(model: str, created: int, delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> bytes:
+    payload = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "delta": delta,
+                "finish_reason": finish_reason
+            }
+        ],
+        **extra
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
 
 @router.post("/v1/chat/completions")
-async def chat(req: ChatRequest, raw: bool = Query(False)):
-    user_message = next((m.content for m in reversed(req.messages) if m.role == "user"), "")
-    answer = _select_model_answer(req.model, user_message, raw)
+async def chat(req: ChatRequest, request: Request, raw: bool = Query(False), steps: bool = Query(STREAM_AGENT_STEPS)):
+    select = _select_model_run(req.model, req.messages, raw)
+    # the same question in different conversations must not share an answer
+    conversation = conversation_key(as_messages(req.messages))
+    # Only used by the request that starts the computation; coalesced requests share its result.
+    metrics = RequestMetrics()
+
+    def run(callbacks):
+        try:
+            return select(callbacks + [metrics])
+        finally:
+            metrics.finish()
 
     if not req.stream:
-        return _build_completion(answer, req.model)
+        async def compute():
+            # disconnects are handled per caller by single_flight, so the shared run gets no request
+            answer = await agent_pool.run(run)
+            return answer, metrics.usage()
+
+        answer, usage = await single_flight.call((req.model, conversation, raw), compute, request=request)
+        return _build_completion(answer, req.model, usage)
+
+    if raw:
+        make_handler = TokenStreamHandler
+    else:
+        make_handler = lambda sink: FinalAnswerStreamHandler(sink, include_steps=steps)
 
-    def stream_gen() -> Generator[bytes, None, None]:
+    async def open_events():
+        events = await agent_pool.open_stream(run, make_handler)
+
+        async def with_usage():
+            async for event in events:
+                yield event
+            yield "usage", metrics.usage()
+
+        return with_usage()
+
+    started = time.perf_counter()
+    events = await single_flight.stream((req.model, conversation, raw, steps), open_events, request=request)
+
+    async def stream_gen() -> AsyncGenerator[bytes, None]:
         created = int(datetime.utcnow().timestamp())
-        delta = {
-            "id": "chatcmpl-1",
-            "object": "chat.completion.chunk",
-            "created": created,
-            "model": req.model,
-            "choices": [
-                {
-                    "index": 0,
-                    "delta": {"role": "assistant", "content": answer},
-                    "finish_reason": None
-                }
-            ]
-        }
-        yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode("utf-8")
+        yield _chunk(req.model, created, {"role": "assistant", "content": ""})
+        first_token = True
+        usage = None
+        try:
+            async for kind, payload in events:
+                if kind == "token":
+                    if first_token:
+                        time_stage("time_to_first_token", req.model, time.perf_counter() - started)
+                        first_token = False
+                    yield _chunk(req.model, created, {"content": payload})
+                elif kind == "usage":
+                    usage = payload
+                else:
+                    # 非 OpenAI 標準欄位，Open WebUI 等前端會忽略
+                    yield _chunk(req.model, created, {}, agent_step=payload)
+        except Exception as e:
+            err = {"error": {"message": str(getattr(e, "detail", e)), "type": type(e).__name__}}
+            yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n".encode("utf-8")
+        time_stage("stream", req.model, time.perf_counter() - started)
+        yield _chunk(req.model, created, {}, finish_reason="stop", usage=usage or metrics.usage())
         yield b"data: [DONE]\n\n"
 
     return StreamingResponse(stream_gen(), media_type="text/event-stream")
 
 @router.get("/v1/models")
 def list_models():
-    return {"object": "list", "data": AVAILABLE_MODELS}
\ No newline at end of file
+    return {"object": "list", "data": AVAILABLE_MODELS}
+
+@router.post("/v1/retrieve")
+def retrieve_documents(req: RetrieveRequest):
+    unknown = set(req.collections) - set(DEFAULT_COLLECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {sorted(unknown)}")
+    if not 1 <= req.k <= 50:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 50")
+    results = retrieve(req.queries, req.collections, req.k)
+    return {
+        "object": "list",
+        "data": [
+            {
+                "collection": name,
+                "query": query,
+                "documents": [{"content": d.page_content, "metadata": d.metadata} for d in docs],
+            }
+            for name, per_query in results.items()
+            for query, docs in zip(req.queries, per_query)
+        ],
+    }
+
+@router.get("/v1/router/stats")
+def router_stats():
+    return route_stats.snapshot()
+
+@router.get("/v1/cache/stats")
+def cache_stats():
+    return {
+        "query_embedding": query_embedding_cache.stats(),
+        "vector_search": search_cache.stats(),
+        "semantic_answer": answer_cache.stats(),
+        "sessions": sessions.stats(),
+    }
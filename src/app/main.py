@@ -1,9 +1,27 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from src.app.chat_routes import router as legacy_router
 from src.app.fastapi_adapter import router as openai_router
+from src.app.batch_routes import router as batch_router
+from src.app.runtime import runtime
+from src.config import WARMUP_ON_START
+from src.metrics import observe_request, route_path
+
+_PROBE_PATHS = ("/metrics", "/healthz", "/readyz")
 
-app = FastAPI(title="Lab RAG API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # agent 與模型在背景載入，伺服器立即可接受連線 (未就緒前的請求會自行建立 agent)
+    if WARMUP_ON_START:
+        runtime.start_warmup()
+    yield
+
+app = FastAPI(title="Lab RAG API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,3 +33,26 @@ app.add_middleware(
 
 app.include_router(legacy_router, prefix="/api")
 app.include_router(openai_router)
+app.include_router(batch_router)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # 串流回應只量到開始回傳的時間，完整生成時間請看 rag_stage_seconds{stage="llm"}
+    path = route_path(request)
+    if path and path not in _PROBE_PATHS:
+        observe_request(request.method, path, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    return JSONResponse(runtime.snapshot(), status_code=200 if runtime.ready else 503)
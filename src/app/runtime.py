@@ -0,0 +1,98 @@
+# runtime.py
+# The one agent (sessions + answer cache + router around the ReAct agent) shared by every route, built on
+# first use, plus the startup warmup that loads the Ollama / embedding models behind /readyz.
+
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+from src.config import OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, WARMUP_RETRY_INTERVAL
+from src.chains.agent_chain import get_llm, init_agent
+from src.chains.answer_cache import with_answer_cache
+from src.chains.python_sandbox import python_pool
+from src.chains.router import with_router
+from src.chains.sessions import with_sessions
+from src.chains.vector_registry import get_embeddings
+
+
+class AgentRuntime:
+    def __init__(self):
+        self._agent = None
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        # step -> "pending" | "ok" | error message
+        self.checks: Dict[str, str] = {
+            "agent": "pending", "llm": "pending", "embeddings": "pending", "python_pool": "pending",
+        }
+        self.ready_at: Optional[float] = None
+        self._started = time.monotonic()
+
+    def agent(self):
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = with_sessions(with_answer_cache(with_router(init_agent())), llm_factory=get_llm)
+        return self._agent
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def _check(self, name: str, fn) -> bool:
+        try:
+            fn()
+        except Exception as e:
+            self.checks[name] = f"{type(e).__name__}: {e}"
+            return False
+        self.checks[name] = "ok"
+        return True
+
+    def _load_llm(self) -> None:
+        # a generate request without a prompt only loads the model; keep_alive keeps it resident
+        res = requests.post(f"{OLLAMA_BASE_URL}/api/generate",
+                            json={"model": OLLAMA_MODEL, "keep_alive": OLLAMA_KEEP_ALIVE}, timeout=300)
+        res.raise_for_status()
+
+    def _load_embeddings(self) -> None:
+        get_embeddings().embed_query("warmup")
+        # embeds the router's example questions, so the first routed request does not pay for it
+        prefetch = getattr(self.agent(), "prefetch", None)
+        if prefetch is not None:
+            prefetch(["hello"])
+
+    def warmup(self) -> bool:
+        ok = self._check("agent", self.agent)
+        ok = self._check("llm", self._load_llm) and ok
+        ok = self._check("embeddings", self._load_embeddings) and ok
+        ok = self._check("python_pool", python_pool.start) and ok
+        if ok and self.ready_at is None:
+            self.ready_at = time.monotonic()
+            print(f"✅ Warmup 完成 ({self.ready_at - self._started:.1f}s)")
+        return ok
+
+    def start_warmup(self) -> None:
+        """Warm up in the background, retrying until Ollama answers; the server serves meanwhile."""
+        def loop():
+            while not self.warmup():
+                print(f"⚠️ Warmup 未完成: {self.checks}，{WARMUP_RETRY_INTERVAL:.0f}s 後重試")
+                time.sleep(WARMUP_RETRY_INTERVAL)
+
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=loop, name="warmup", daemon=True)
+            self._warmup_thread.start()
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "checks": dict(self.checks),
+            "warmup_seconds": round(self.ready_at - self._started, 3) if self.ready else None,
+        }
+
+
+runtime = AgentRuntime()
+
+
+def get_agent():
+    return runtime.agent()
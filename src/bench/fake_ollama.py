@@ -0,0 +1,185 @@
+# fake_ollama.py
+# Stand-in for the Ollama HTTP API used by the load benchmark: scripted prompt-eval delay,
+# streamed tokens at a fixed rate and deterministic embeddings, so runs are comparable and
+# need no GPU. Only the endpoints this project calls are implemented.
+
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_FILLER = ("the", "results", "show", "that", "this", "method", "improves", "accuracy", "on", "our", "dataset")
+
+
+@lru_cache(maxsize=65536)
+def _word_vector(word: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha1(word.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """Bag-of-words hash embedding: texts sharing words get similar vectors, so search returns related chunks."""
+    words = _WORD.findall(text.lower()) or [""]
+    vec = np.sum([_word_vector(w, dim) for w in words], axis=0)
+    norm = float(np.linalg.norm(vec))
+    return (vec / norm if norm > 0 else vec).tolist()
+
+
+def scripted_response(prompt: str, tokens: int) -> str:
+    """ReAct prompts get one LabPaperSearch action, then a final answer; other prompts get plain text."""
+    words = " ".join(_FILLER[i % len(_FILLER)] for i in range(max(1, tokens)))
+    if "\nQuestion:" not in prompt or "Action Input:" not in prompt:
+        return words
+    question, _, scratchpad = prompt.rsplit("\nQuestion:", 1)[-1].partition("\n")
+    if "Observation:" in scratchpad:
+        return f" I now know the final answer\nFinal Answer: {words}"
+    return f" I should search the lab papers.\nAction: LabPaperSearch\nAction Input: {question.strip()}"
+
+
+def _split_tokens(text: str) -> List[str]:
+    # whitespace-preserving pieces, roughly one per word like a real tokenizer stream
+    return re.findall(r"\s*\S+", text) or [""]
+
+
+class FakeOllama:
+    """Threaded HTTP server; `parallel` generations run at once and the rest queue, like OLLAMA_NUM_PARALLEL."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dim: int = 768, prompt_ms: float = 200,
+                 token_ms: float = 20, tokens: int = 40, embed_ms: float = 10, parallel: int = 4):
+        self.dim = dim
+        self.prompt_ms = prompt_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.embed_ms = embed_ms
+        self._slots = threading.Semaphore(max(1, parallel))
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"generate": 0, "embeddings": 0, "embedded_texts": 0, "load": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[key] += n
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self._count("embeddings")
+        self._count("embedded_texts", len(texts))
+        time.sleep(self.embed_ms / 1000)
+        return [fake_embedding(t, self.dim) for t in texts]
+
+    def generate(self, model: str, prompt: str) -> Iterator[dict]:
+        """NDJSON parts of /api/generate; the slot is held for the whole generation."""
+        self._count("generate")
+        pieces = _split_tokens(scripted_response(prompt, self.tokens))
+        queued = time.perf_counter()
+        with self._slots:
+            started = time.perf_counter()
+            time.sleep(self.prompt_ms / 1000)
+            prompt_done = time.perf_counter()
+            for piece in pieces:
+                yield {"model": model, "created_at": _now(), "response": piece, "done": False}
+                time.sleep(self.token_ms / 1000)
+            finished = time.perf_counter()
+        yield {
+            "model": model, "created_at": _now(), "response": "", "done": True, "done_reason": "stop",
+            "total_duration": int((finished - queued) * 1e9), "load_duration": int((started - queued) * 1e9),
+            "prompt_eval_count": max(1, len(prompt) // 4), "prompt_eval_duration": int((prompt_done - started) * 1e9),
+            "eval_count": len(pieces), "eval_duration": int((finished - prompt_done) * 1e9),
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):  # keep the benchmark output readable
+                pass
+
+            def _json(self, payload: dict, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": []})
+                elif self.path == "/":
+                    self._json({"status": "Ollama is running"})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/api/embeddings":
+                    self._json({"embedding": fake.embed([body.get("prompt", "")])[0]})
+                elif self.path == "/api/embed":
+                    texts = body.get("input", "")
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._json({"model": body.get("model"), "embeddings": fake.embed(texts)})
+                elif self.path == "/api/generate":
+                    self._generate(body)
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def _generate(self, body: dict) -> None:
+                model = body.get("model", "")
+                if not body.get("prompt"):
+                    # a request without a prompt only loads the model (warmup)
+                    fake._count("load")
+                    self._json({"model": model, "created_at": _now(), "response": "", "done": True})
+                    return
+                parts = fake.generate(model, body["prompt"])
+                if body.get("stream") is False:
+                    pieces = list(parts)
+                    final = dict(pieces[-1], response="".join(p["response"] for p in pieces))
+                    self._json(final)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for part in parts:
+                    line = json.dumps(part).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,92 @@
+# fixtures.py
+# Synthetic inputs for the load benchmark: small text PDFs for ingest_pdfs.py and a SQLite copy
+# of the Northwind Products table for ingest_sql.py. Same seed -> same corpus, so runs compare.
+
+import os
+import random
+import sqlite3
+from typing import List
+
+_TOPICS = {
+    "retrieval": "dense retrieval embeddings vector index recall reranking queries passages",
+    "vision": "convolutional network image segmentation detection backbone augmentation pixels",
+    "speech": "acoustic model spectrogram transcription speaker noise waveform decoder",
+    "graphs": "graph neural network node edge message passing citation benchmark",
+    "robotics": "robot arm grasping trajectory control policy simulation sensors",
+}
+_GLUE = "we propose a method that improves the baseline on the dataset and report accuracy results".split()
+
+PRODUCT_WORDS = "Chai Chang Aniseed Syrup Cajun Seasoning Gumbo Mix Boysenberry Spread Pears Sauce Tofu Ikura".split()
+
+
+def _sentence(rng: random.Random, topic: str) -> str:
+    words = _TOPICS[topic].split()
+    picked = [rng.choice(words if rng.random() < 0.6 else _GLUE) for _ in range(rng.randint(8, 16))]
+    return " ".join(picked).capitalize() + "."
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: str, pages: List[List[str]]) -> None:
+    """Minimal PDF 1.4 with one Helvetica text line per entry; enough for PyPDFLoader to extract."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"] + [f"({_escape(line)}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_pdf_corpus(directory: str, files: int, pages: int, seed: int = 0) -> List[str]:
+    """`files` PDFs of `pages` pages (~60 lines each), each about one topic."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    topics = sorted(_TOPICS)
+    for i in range(files):
+        topic = topics[i % len(topics)]
+        path = os.path.join(directory, f"paper_{i:04d}_{topic}.pdf")
+        write_text_pdf(path, [[_sentence(rng, topic) for _ in range(60)] for _ in range(pages)])
+        paths.append(path)
+    return paths
+
+
+def make_products_db(path: str, rows: int, seed: int = 0) -> None:
+    """SQLite database with the Products columns of the default SQL ingest spec."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE Products (ProductID INTEGER PRIMARY KEY, ProductName TEXT, SupplierID INTEGER, "
+        "CategoryID INTEGER, QuantityPerUnit TEXT, UnitPrice REAL, UnitsInStock INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO Products VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (i, " ".join(rng.sample(PRODUCT_WORDS, 2)) + f" {i}", rng.randint(1, 29), rng.randint(1, 8),
+             f"{rng.randint(1, 48)} boxes x {rng.choice([12, 20, 500])} g", round(rng.uniform(2, 260), 2),
+             rng.randint(0, 120))
+            for i in range(1, rows + 1)
+        ],
+    )
+    conn.commit()
+    conn.close()
@@ -0,0 +1,108 @@
+# report.py
+# Numbers for the load benchmark: latency percentiles, per-stage deltas scraped from the app's
+# /metrics, and the comparison of two saved runs that flags regressions.
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+
+StageTotals = Dict[str, Tuple[float, float]]
+
+
+def latency_summary(seconds: Sequence[float]) -> Optional[Dict[str, float]]:
+    if not seconds:
+        return None
+    ms = np.asarray(seconds) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def stage_totals(metrics_text: str, family: str = "rag_stage_seconds") -> StageTotals:
+    """stage -> (count, seconds) summed over every `name` label of the histogram."""
+    totals: Dict[str, List[float]] = {}
+    for metric in text_string_to_metric_families(metrics_text):
+        if metric.name != family:
+            continue
+        for sample in metric.samples:
+            field = 0 if sample.name.endswith("_count") else 1 if sample.name.endswith("_sum") else None
+            if field is None:
+                continue
+            totals.setdefault(sample.labels["stage"], [0.0, 0.0])[field] += sample.value
+    return {stage: (count, total) for stage, (count, total) in totals.items()}
+
+
+def stage_delta(before: StageTotals, after: StageTotals) -> Dict[str, Dict[str, float]]:
+    """Per-stage count / total / mean observed between two scrapes."""
+    out = {}
+    for stage, (count, total) in sorted(after.items()):
+        prev_count, prev_total = before.get(stage, (0.0, 0.0))
+        n, secs = count - prev_count, total - prev_total
+        if n > 0:
+            out[stage] = {"count": int(n), "total_s": round(secs, 3), "mean_ms": round(secs / n * 1000, 2)}
+    return out
+
+
+# (path in a result, higher is better)
+_CHAT_KEYS = (
+    (("throughput_rps",), True),
+    (("latency", "p50_ms"), False),
+    (("latency", "p95_ms"), False),
+    (("latency", "p99_ms"), False),
+    (("ttft", "p95_ms"), False),
+)
+_INGEST_KEYS = ((("wall_s",), False),)
+
+
+def _get(result: dict, path: Iterable[str]) -> Optional[float]:
+    value = result
+    for key in path:
+        if not isinstance(value, dict) or value.get(key) is None:
+            return None
+        value = value[key]
+    return float(value)
+
+
+def _compare_pair(label: str, old: dict, new: dict, keys, tolerance: float) -> List[dict]:
+    rows = []
+    for path, higher_is_better in keys:
+        a, b = _get(old, path), _get(new, path)
+        if a is None or b is None or a == 0:
+            continue
+        change = (b - a) / a
+        worse = -change if higher_is_better else change
+        rows.append({
+            "case": label, "metric": ".".join(path), "baseline": a, "current": b,
+            "change": round(change, 4), "regression": worse > tolerance,
+        })
+    return rows
+
+
+def compare_runs(baseline: dict, current: dict, tolerance: float) -> List[dict]:
+    """Row per metric present in both runs; `regression` when it got worse by more than tolerance (0.2 = 20%)."""
+    rows = []
+    old_chat = {(r["endpoint"], r["concurrency"]): r for r in baseline.get("chat", [])}
+    for result in current.get("chat", []):
+        old = old_chat.get((result["endpoint"], result["concurrency"]))
+        if old is not None:
+            label = f"{result['endpoint']}@{result['concurrency']}"
+            rows += _compare_pair(label, old, result, _CHAT_KEYS, tolerance)
+    for script, result in current.get("ingest", {}).items():
+        old = baseline.get("ingest", {}).get(script)
+        if old is not None:
+            rows += _compare_pair(script, old, result, _INGEST_KEYS, tolerance)
+    return rows
+
+
+def format_comparison(rows: List[dict]) -> str:
+    lines = [f"{'case':<24} {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for r in rows:
+        mark = "  ❌" if r["regression"] else ""
+        lines.append(f"{r['case']:<24} {r['metric']:<16} {r['baseline']:>10.2f} {r['current']:>10.2f} "
+                     f"{r['change']:>+8.1%}{mark}")
+    return "\n".join(lines)
@@ -1,66 +1,40 @@
 # agent.py
 
 from langchain.agents import initialize_agent, AgentType, Tool
-from langchain_experimental.tools.python.tool import PythonREPLTool
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Milvus
 from langchain_ollama import OllamaLLM
 
 from src.config import (
-    SQL_COLLECTION_NAME, PDF_COLLECTION_NAME, OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_TEMPERATURE,
-    OLLAMA_EMBED_MODEL, MILVUS_HOST, MILVUS_PORT
+    SQL_COLLECTION_NAME, PDF_COLLECTION_NAME, OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_TEMPERATURE, OLLAMA_KEEP_ALIVE,
+    AGENT_VERBOSE, CONTEXT_TOOL_K, CONTEXT_TOOL_TOKENS,
 )
+from src.chains.vector_registry import get_vector_store, search
+from src.chains.sql_tools import sql_schema_fn, sql_query_fn
+from src.chains.python_sandbox import python_repl_fn
+from src.chains.retrieval import search_everything_fn
+from src.chains.context import format_snippets
+from src.chains.sessions import with_history
 
 def get_llm():
     return OllamaLLM(
         base_url=OLLAMA_BASE_URL,
         model=OLLAMA_MODEL,
         temperature=OLLAMA_TEMPERATURE,
+        keep_alive=OLLAMA_KEEP_ALIVE,
     )
 
 def build_pdf_vector_engine():
-    embeddings = OllamaEmbeddings(
-        model=OLLAMA_EMBED_MODEL,
-        base_url=OLLAMA_BASE_URL
-    )
-    
-    vector_store = Milvus(
-        embedding_function=embeddings,
-        collection_name=PDF_COLLECTION_NAME,
-        connection_args={"host": MILVUS_HOST, "port": MILVUS_PORT},
-    )
-    return vector_store
+    return get_vector_store(PDF_COLLECTION_NAME)
 
 def labpapersearch_fn(query: str):
-    vector_store = build_pdf_vector_engine()
-    docs = vector_store.similarity_search(query, k=3)
-    summarized = []
-    for i, d in enumerate(docs):
-        meta_src = d.metadata.get("source", "paper") if hasattr(d, "metadata") else "paper"
-        content = d.page_content if hasattr(d, "page_content") else str(d)
-        summarized.append(f"[{i+1}] {meta_src}: {content[:220].replace('\n',' ')}...")
-    return "\n".join(summarized) if summarized else "NO_MATCH"
+    docs = search(PDF_COLLECTION_NAME, query, k=CONTEXT_TOOL_K)
+    return format_snippets(docs, CONTEXT_TOOL_TOKENS)
 
 def build_sql_vector_engine():
-    embeddings = OllamaEmbeddings(
-        model=OLLAMA_EMBED_MODEL,
-        base_url=OLLAMA_BASE_URL
-    )
-    vector_store = Milvus(
-        embedding_function=embeddings,
-        collection_name=SQL_COLLECTION_NAME,
-        connection_args={"host": MILVUS_HOST, "port": MILVUS_PORT},
-    )
-    return vector_store
+    return get_vector_store(SQL_COLLECTION_NAME)
 
 def mssql_vector_search_fn(query: str):
-    vector_store = build_sql_vector_engine()
-    docs = vector_store.similarity_search(query, k=3)
-    summarized = []
-    for i, d in enumerate(docs):
-        content = d.page_content if hasattr(d, "page_content") else str(d)
-        summarized.append(f"[{i+1}] {content[:200].replace('\n',' ')}...")
-    return "\n".join(summarized) if summarized else "NO_MATCH"
+    docs = search(SQL_COLLECTION_NAME, query, k=CONTEXT_TOOL_K)
+    return format_snippets(docs, CONTEXT_TOOL_TOKENS)
 
 def llm_answer_fn(query: str):
     return get_llm()(query)
@@ -78,10 +52,25 @@ def init_agent():
             func=mssql_vector_search_fn,
             description="Use for semantic search over MSSQL data in Milvus (returns short snippets)."
         ),
+        Tool(
+            name="SearchAll",
+            func=search_everything_fn,
+            description="Search the PDF corpus AND the MSSQL data in one step (in parallel); returns merged, de-duplicated snippets. Several sub-queries may be separated by ';'."
+        ),
+        Tool(
+            name="SQLSchema",
+            func=sql_schema_fn,
+            description="Returns compact MSSQL table definitions (columns, types, PK, FK). Pass table names to narrow it, or an empty string for all tables."
+        ),
+        Tool(
+            name="SQLQuery",
+            func=sql_query_fn,
+            description="Run ONE read-only SELECT against MSSQL and get the rows back. Use for counts, totals, averages and other numeric questions; aggregate in SQL."
+        ),
         Tool(
             name="Python_REPL",
-            func=PythonREPLTool().run,
-            description="Execute Python code."
+            func=python_repl_fn,
+            description="Execute Python code in an isolated process and return what it prints (use print()). Time and memory limited."
         ),
         Tool(
             name="LLMAnswer",
@@ -97,6 +86,7 @@ def init_agent():
             "Tools:\n"
             "- LabPaperSearch: research / paper / dataset / algorithm questions needing PDF snippets.\n"
             "- MSSQLVectorSearch: semantic search over embedded MSSQL textual fragments.\n"
+            "- SearchAll: when a question needs both PDF and MSSQL context, instead of calling the two searches separately.\n"
             "- SQLSchema: when unsure about table/column names BEFORE writing SQLQuery.\n"
             "- SQLQuery: ONE clean pure SQL statement (no prose) ending with a semicolon.\n"
             "- Python_REPL: calculations.\n"
@@ -112,13 +102,14 @@ def init_agent():
         agent_type=AgentType.CHAT_ZERO_SHOT_REACT_DESCRIPTION,
         max_iterations=10,
         handle_parsing_errors="Final Answer: Sorry, the model format parsing failed. Here is the final answer based on the current information.",
-        verbose=True,
+        verbose=AGENT_VERBOSE,
         agent_kwargs=agent_kwargs
     )
 
     # run
     class _Wrapped:
-        def run(self, question: str):
-            return agent.run(question)
+        def run(self, question: str, callbacks=None):
+            # a follow-up turn sees the conversation so far
+            return agent.run(with_history(question), callbacks=callbacks)
 
     return _Wrapped()
\ No newline at end of file
@@ -0,0 +1,177 @@
+# answer_cache.py
+# Semantic answer cache: a question whose embedding is close enough to an earlier one gets the
+# stored answer without running the router / agent again.
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import (
+    PDF_COLLECTION_NAME, SQL_COLLECTION_NAME, ANSWER_CACHE_ENABLED, ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD,
+)
+from src.chains.cache import CACHE_REQUESTS, collection_version
+from src.chains.sessions import is_followup
+from src.chains.vector_registry import embed_queries, get_embeddings
+
+# Agent fallbacks that must not be served to later users
+_UNCACHEABLE = (
+    "Sorry, the model format parsing failed",
+    "Agent stopped due to iteration limit or time limit",
+)
+
+_SENTENCE = re.compile(r"[.?!;:](?:\s+|$)|\n")
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_][\w'-]*")
+# Capitalized only because they open the question
+_OPENERS = frozenset("""
+    what which who whom whose where when why how is are was were do does did can could would should will
+    list show give tell find get count compare please the a an i in on for of to from by with and or
+""".split())
+
+
+def key_terms(question: str) -> FrozenSet[str]:
+    """Numbers and proper nouns in the question; a cached answer is only reused when these match exactly.
+
+    Embeddings place "unit price of Chai" and "unit price of Chang" almost on top of each other,
+    so similarity alone would serve one product's answer for the other.
+    """
+    terms = set()
+    for sentence in _SENTENCE.split(question):
+        for pos, token in enumerate(_TOKEN.findall(sentence)):
+            if token[0].isdigit():
+                terms.add(token.replace(",", ""))
+            elif any(ch.isupper() for ch in token) and not (pos == 0 and token.lower() in _OPENERS):
+                terms.add(token.lower())
+    return frozenset(terms)
+
+
+class SemanticAnswerCache:
+    """Bounded LRU of (question embedding, key terms, answer) with TTL, matched by cosine similarity.
+
+    The whole cache is dropped when the version of any source collection changes.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD,
+                 versions: Callable[[], Tuple] = lambda: (collection_version(PDF_COLLECTION_NAME),
+                                                          collection_version(SQL_COLLECTION_NAME))):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._versions = versions
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, np.ndarray, FrozenSet[str], str]]" = OrderedDict()
+        self._next_id = 0
+        self._seen_versions: Optional[Tuple] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[int] = []
+        self.hits = 0
+        self.misses = 0
+
+    def _check_versions(self) -> None:
+        versions = self._versions()
+        if versions != self._seen_versions:
+            self._entries.clear()
+            self._matrix = None
+            self._seen_versions = versions
+
+    def _rebuild(self) -> None:
+        self._ids = list(self._entries)
+        self._matrix = np.stack([self._entries[i][1] for i in self._ids]) if self._ids else None
+
+    def lookup(self, vector: List[float], terms: FrozenSet[str] = frozenset()) -> Optional[str]:
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        now = time.monotonic()
+        with self._lock:
+            self._check_versions()
+            expired = [i for i, (expires, *_) in self._entries.items() if expires <= now]
+            for i in expired:
+                del self._entries[i]
+            if expired or self._matrix is None:
+                self._rebuild()
+            answer = None
+            if self._matrix is not None:
+                sims = self._matrix @ q
+                close = np.flatnonzero(sims >= self.threshold)
+                for best in close[np.argsort(-sims[close])]:
+                    entry_id = self._ids[best]
+                    if self._entries[entry_id][2] == terms:
+                        self._entries.move_to_end(entry_id)
+                        answer = self._entries[entry_id][3]
+                        break
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_REQUESTS.labels("semantic_answer", "miss" if answer is None else "hit").inc()
+        return answer
+
+    def store(self, vector: List[float], answer: str, terms: FrozenSet[str] = frozenset()) -> None:
+        if self.maxsize <= 0 or not answer or any(marker in answer for marker in _UNCACHEABLE):
+            return
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        with self._lock:
+            self._check_versions()
+            self._entries[self._next_id] = (time.monotonic() + self.ttl, q, terms, answer)
+            self._next_id += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._rebuild()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+            }
+
+
+answer_cache = SemanticAnswerCache()
+
+
+class CachedAgent:
+    """Same run interface as the wrapped agent; consults the answer cache first."""
+
+    def __init__(self, agent, cache: SemanticAnswerCache = answer_cache, embed_query=None):
+        self.agent = agent
+        self.cache = cache
+        # the embedding is cached, so the router below reuses it for free
+        self._embed_query = embed_query or get_embeddings().embed_query
+
+    def prefetch(self, questions: List[str]) -> None:
+        inner = getattr(self.agent, "prefetch", None)
+        if inner is not None:
+            inner(questions)
+        else:
+            embed_queries(questions, self._embed_query)
+
+    def run(self, question: str, callbacks=None) -> str:
+        if is_followup():
+            # the answer depends on the conversation, not only on the question
+            return self.agent.run(question, callbacks=callbacks)
+        try:
+            vector = self._embed_query(question)
+        except Exception as e:
+            print(f"[answer_cache] embedding failed, skipping cache: {e}")
+            return self.agent.run(question, callbacks=callbacks)
+        terms = key_terms(question)
+        answer = self.cache.lookup(vector, terms)
+        if answer is not None:
+            return answer
+        answer = self.agent.run(question, callbacks=callbacks)
+        self.cache.store(vector, answer, terms)
+        return answer
+
+
+def with_answer_cache(agent):
+    """Wrap the agent with the semantic answer cache unless ANSWER_CACHE_ENABLED is off."""
+    return CachedAgent(agent) if ANSWER_CACHE_ENABLED else agent
@@ -0,0 +1,134 @@
+# batch.py
+# Offline batch inference: JSONL prompts in, JSONL results out in completion order.
+# Each chunk of prompts is prefetched together (batched embeddings, multi-vector Milvus search)
+# while the previous chunk is still running through the LLM on a bounded thread pool.
+
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from src.config import BATCH_CONCURRENCY, BATCH_CHUNK_SIZE
+from src.metrics import RequestMetrics, span
+
+# how often a generator blocked on running items checks whether the batch was cancelled
+_CANCEL_POLL_INTERVAL = 0.1
+
+# execute(fn) calls fn(callbacks) and returns its result; the API runs it in an agent_pool slot
+Execute = Callable[[Callable[[list], str]], str]
+
+
+def _run_directly(fn: Callable[[list], str]) -> str:
+    return fn([])
+
+
+class BatchItem(NamedTuple):
+    id: str
+    # the question; for "messages" input, the last user message (used to prefetch retrieval)
+    prompt: str
+    messages: Optional[List[dict]] = None
+
+
+class BatchLineError(ValueError):
+    """A JSONL line that is not a valid batch item; the message starts with its line number."""
+
+
+def parse_batch_line(line: str, lineno: int) -> Optional[BatchItem]:
+    """{"id": ..., "prompt": ...} or {"id": ..., "messages": [...]}; the id defaults to the line number."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+        prompt = obj.get("prompt")
+        if prompt is None:
+            prompt = next((m["content"] for m in reversed(obj.get("messages", [])) if m.get("role") == "user"), "")
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise BatchLineError(f"line {lineno}: {type(e).__name__}: {e}") from e
+    if not isinstance(prompt, str):
+        raise BatchLineError(f"line {lineno}: prompt must be a string")
+    return BatchItem(str(obj.get("id", lineno)), prompt, obj.get("messages") if obj.get("prompt") is None else None)
+
+
+def iter_batch_items(lines: Iterable[str]) -> Iterator[BatchItem]:
+    for lineno, line in enumerate(lines, 1):
+        item = parse_batch_line(line, lineno)
+        if item is not None:
+            yield item
+
+
+def _run_one(agent, item: BatchItem, cancel: threading.Event, execute: Execute) -> Optional[Dict[str, Any]]:
+    if cancel.is_set():
+        # queued before the batch was cancelled: do not start it
+        return None
+    metrics = RequestMetrics()
+    started = time.perf_counter()
+    chat = getattr(agent, "chat", None)
+
+    def run(callbacks):
+        if item.messages is not None and chat is not None:
+            # the session path, so earlier turns are part of the question like on /v1/chat/completions
+            return chat(item.messages, callbacks=callbacks + [metrics])
+        return agent.run(item.prompt, callbacks=callbacks + [metrics])
+
+    try:
+        answer = execute(run)
+        return {"id": item.id, "answer": answer, "usage": metrics.usage(),
+                "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        return {"id": item.id, "error": f"{type(e).__name__}: {e}", "seconds": round(time.perf_counter() - started, 3)}
+    finally:
+        metrics.finish()
+
+
+def iter_batch(
+    items: Iterable[BatchItem],
+    agent,
+    concurrency: int = BATCH_CONCURRENCY,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    cancel: Optional[threading.Event] = None,
+    execute: Execute = _run_directly,
+) -> Iterator[Dict[str, Any]]:
+    """Yield one result dict per item, in completion order.
+
+    Setting `cancel` (from any thread) stops the batch: queued items are dropped and the
+    generator returns without waiting for the items already running.
+    At most `concurrency` items are handed to `execute` at a time.
+    """
+    cancel = cancel if cancel is not None else threading.Event()
+    prefetch = getattr(agent, "prefetch", None)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    pending = set()
+    items = iter(items)
+
+    def wait_some():
+        nonlocal pending
+        while not cancel.is_set():
+            done, pending = wait(pending, timeout=_CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if done:
+                return [r for r in (fut.result() for fut in done) if r is not None]
+        return []
+
+    try:
+        while not cancel.is_set():
+            chunk: List[BatchItem] = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            if prefetch is not None:
+                # only a warm-up: every item still runs (and fails) on its own;
+                # failures show up as rag_stage_errors_total{stage="batch_prefetch"}
+                try:
+                    with span("batch_prefetch"):
+                        prefetch([item.prompt for item in chunk])
+                except Exception:
+                    pass
+            pending.update(executor.submit(_run_one, agent, item, cancel, execute) for item in chunk)
+            # keep roughly one chunk queued behind the running one: output streams, memory stays flat
+            while len(pending) > chunk_size and not cancel.is_set():
+                yield from wait_some()
+        while pending and not cancel.is_set():
+            yield from wait_some()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
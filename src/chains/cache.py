@@ -0,0 +1,108 @@
+# cache.py
+# Size- and TTL-bounded LRU caches for query embeddings and vector search results, plus the
+# per-collection version marker that ingestion bumps so cached results of old data stop matching.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from prometheus_client import Counter
+
+from src.config import INGEST_STATE_DIR, CACHE_VERSION_CHECK_INTERVAL
+
+CACHE_REQUESTS = Counter("rag_cache_requests_total", "Cache lookups", ["cache", "result"])
+
+MISSING = object()
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.split())
+
+
+class TTLCache:
+    """Thread-safe LRU with a per-entry time to live."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.labels(self.name, "hit").inc()
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+        return MISSING
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+            }
+
+
+# --- collection versions (written by the ingest scripts, read by the API process) ---
+
+_versions_lock = threading.Lock()
+_versions: Dict[str, tuple] = {}
+
+
+def _version_path(collection_name: str) -> str:
+    return os.path.join(INGEST_STATE_DIR, "versions", f"{collection_name}.version")
+
+
+def bump_collection_version(collection_name: str) -> None:
+    """Mark a collection as changed; every cached search / answer that used it becomes stale."""
+    path = _version_path(collection_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp, path)
+
+
+def collection_version(collection_name: str) -> Optional[str]:
+    """Current version marker, re-read from disk at most every CACHE_VERSION_CHECK_INTERVAL seconds."""
+    now = time.monotonic()
+    cached = _versions.get(collection_name)
+    if cached is not None and now - cached[1] < CACHE_VERSION_CHECK_INTERVAL:
+        return cached[0]
+    try:
+        with open(_version_path(collection_name), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        version = None
+    with _versions_lock:
+        _versions[collection_name] = (version, now)
+    return version
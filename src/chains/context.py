@@ -0,0 +1,131 @@
+# context.py
+# Context assembly for retrieved chunks: overlapping chunks of the same source are stitched
+# back together, near-duplicates dropped, and the rest packed into a token budget in rank order.
+
+import math
+import re
+from typing import List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from src.config import CONTEXT_DEDUP_THRESHOLD, CONTEXT_MIN_OVERLAP
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough count without a tokenizer: ~4 ASCII chars per token, one token per CJK / other char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars))
+
+
+def source_of(doc: Document) -> str:
+    return doc.metadata.get("source") or doc.metadata.get("table") or ""
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) <= n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def is_near_duplicate(a: set, b: set, threshold: float = CONTEXT_DEDUP_THRESHOLD) -> bool:
+    """Word-trigram containment, so a chunk mostly inside a bigger one also counts."""
+    if not a or not b:
+        return False
+    return len(a & b) / min(len(a), len(b)) >= threshold
+
+
+def _overlap(a: str, b: str, min_len: int) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b` (0 if shorter than min_len)."""
+    if len(b) < min_len:
+        return 0
+    probe = b[:min_len]
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+
+def merge_overlapping(a: str, b: str, min_len: int = CONTEXT_MIN_OVERLAP) -> Optional[str]:
+    """Join two splitter chunks that share their chunk_overlap text, in either order."""
+    k = _overlap(a, b, min_len)
+    if k:
+        return a + b[k:]
+    k = _overlap(b, a, min_len)
+    if k:
+        return b + a[k:]
+    return None
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    # chars per token differ between scripts, so shrink until the estimate fits
+    cut = text
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[: int(len(cut) * max_tokens / estimate_tokens(cut)) - 1]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "..."
+
+
+def _prefix(i: int, source: str) -> str:
+    return f"[{i}] {source}: " if source else f"[{i}] "
+
+
+def pack_context(docs: Sequence[Document], budget: int, min_tokens: int = 40) -> List[Document]:
+    """Docs in rank order -> fewer, longer, non-redundant docs whose formatted size fits `budget` tokens.
+
+    A doc that overlaps an already chosen one from the same source is merged into it (costing only
+    the new text); a near-duplicate is skipped; the first doc that does not fit is truncated to the
+    remaining budget if at least `min_tokens` are left, and packing stops there.
+    """
+    packed: List[dict] = []
+    used = 0
+    for doc in docs:
+        text = doc.page_content.strip()
+        if not text:
+            continue
+        source = source_of(doc)
+        shingles = _shingles(text)
+        if any(is_near_duplicate(shingles, p["shingles"]) for p in packed):
+            continue
+
+        merged = False
+        for p in packed:
+            if p["source"] != source:
+                continue
+            joined = merge_overlapping(p["text"], text)
+            if joined is None:
+                continue
+            extra = estimate_tokens(joined) - estimate_tokens(p["text"])
+            if used + extra <= budget:
+                p["text"], p["shingles"] = joined, p["shingles"] | shingles
+                used += extra
+            merged = True  # overlapping text is never repeated as a separate snippet
+            break
+        if merged:
+            continue
+
+        cost = estimate_tokens(_prefix(len(packed) + 1, source) + text)
+        if used + cost <= budget:
+            packed.append({"doc": doc, "source": source, "text": text, "shingles": shingles})
+            used += cost
+            continue
+        room = budget - used - estimate_tokens(_prefix(len(packed) + 1, source))
+        if room >= min_tokens:
+            packed.append({"doc": doc, "source": source, "text": _truncate(text, room), "shingles": shingles})
+        break
+    return [Document(page_content=p["text"], metadata=dict(p["doc"].metadata)) for p in packed]
+
+
+def format_context(docs: Sequence[Document]) -> str:
+    return "\n".join(_prefix(i + 1, source_of(d)) + d.page_content.replace("\n", " ") for i, d in enumerate(docs))
+
+
+def format_snippets(docs: Sequence[Document], budget: int) -> str:
+    """Tool output: packed context, or NO_MATCH."""
+    return format_context(pack_context(docs, budget)) or "NO_MATCH"
@@ -0,0 +1,135 @@
+# docstore.py
+# Chunk text and metadata kept next to the vector index instead of inside it: with
+# MILVUS_PAYLOAD=docstore a Milvus collection only holds ids and vectors, and the top-k ids of
+# a search are resolved here in one bulk lookup.
+#
+# One SQLite file per collection, DOCSTORE_DIR/<collection>.sqlite, in WAL mode so the ingest
+# process can write while the API reads. Each row is the zlib-compressed JSON [text, metadata].
+
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src.config import DOCSTORE_DIR
+
+# below SQLite's default limit on bound parameters per statement
+_MAX_PARAMS = 900
+# zlib level: chunk text compresses ~2-3x, higher levels gain little and cost ingest time
+_LEVEL = 6
+
+
+def _pack(text: str, metadata: dict) -> bytes:
+    return zlib.compress(json.dumps([text, metadata], ensure_ascii=False, separators=(",", ":")).encode("utf-8"), _LEVEL)
+
+
+def _unpack(blob: bytes) -> Tuple[str, dict]:
+    text, metadata = json.loads(zlib.decompress(blob))
+    return text, metadata
+
+
+class DocStore:
+    """id -> (text, metadata) for one collection. Safe for one writer process and many readers."""
+
+    def __init__(self, collection_name: str, root: str = DOCSTORE_DIR, drop_old: bool = False):
+        self.collection_name = collection_name
+        self.path = os.path.join(root, f"{collection_name}.sqlite")
+        self._local = threading.local()
+        # bumped by drop() so connections other threads opened on the old file are replaced
+        self._generation = 0
+        if drop_old:
+            self.drop()
+
+    def _inode(self) -> int:
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return -1
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # reopen after drop(), here or in the ingest process (which recreates the file)
+        if conn is not None and (self._local.generation != self._generation or self._local.inode != self._inode()):
+            conn.close()
+            conn = None
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, doc BLOB NOT NULL) WITHOUT ROWID")
+            self._local.conn, self._local.generation, self._local.inode = conn, self._generation, self._inode()
+        return conn
+
+    def upsert(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[dict]) -> None:
+        if not ids:
+            return
+        rows = [(i, _pack(t, m or {})) for i, t, m in zip(ids, texts, metadatas)]
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO docs (id, doc) VALUES (?, ?)", rows)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if not ids:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany("DELETE FROM docs WHERE id = ?", [(i,) for i in ids])
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, Tuple[str, dict]]:
+        """One SELECT per _MAX_PARAMS ids; ids that are not stored are left out."""
+        unique = list(dict.fromkeys(ids))
+        found: Dict[str, Tuple[str, dict]] = {}
+        conn = self._conn()
+        for start in range(0, len(unique), _MAX_PARAMS):
+            part = unique[start:start + _MAX_PARAMS]
+            marks = ",".join("?" * len(part))
+            for doc_id, blob in conn.execute(f"SELECT id, doc FROM docs WHERE id IN ({marks})", part):
+                found[doc_id] = _unpack(blob)
+        return found
+
+    def documents(self, ids_per_query: Sequence[Sequence[str]]) -> List[List[Document]]:
+        """Search hits (ids per query, best first) -> Documents, resolved in one bulk lookup.
+
+        A hit whose row is missing (deleted after the search ran) is dropped.
+        """
+        found = self.get_many([i for ids in ids_per_query for i in ids])
+        return [
+            [Document(page_content=found[i][0], metadata={**found[i][1], "pk": i}) for i in ids if i in found]
+            for ids in ids_per_query
+        ]
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def drop(self) -> None:
+        self.close()
+        self._generation += 1
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+_lock = threading.Lock()
+_docstores: Dict[str, DocStore] = {}
+
+
+def get_docstore(collection_name: str) -> DocStore:
+    """Process-wide DocStore per collection (connections are per thread inside it)."""
+    store = _docstores.get(collection_name)
+    if store is None:
+        with _lock:
+            store = _docstores.setdefault(collection_name, DocStore(collection_name))
+    return store
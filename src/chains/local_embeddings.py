@@ -0,0 +1,129 @@
+# local_embeddings.py
+# In-process CPU embeddings with sentence-transformers (EMBED_PROVIDER=local), so retrieval no
+# longer queues behind LLM generations on the Ollama server. Concurrent embed_query calls are
+# collected for a few milliseconds and encoded as one batch.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from src.config import (
+    EMBED_DIM, LOCAL_EMBED_MODEL, LOCAL_EMBED_DEVICE, LOCAL_EMBED_THREADS, LOCAL_EMBED_BATCH_WINDOW_MS,
+    LOCAL_EMBED_MAX_BATCH, LOCAL_EMBED_TRUST_REMOTE_CODE,
+)
+from src.chains.cache import MISSING, TTLCache, normalize_query
+from src.metrics import span
+
+
+class MicroBatcher:
+    """Queue single texts and hand them to `encode` in batches of up to max_batch.
+
+    A batch closes max_wait seconds after its first text arrives (or when full), so an idle
+    server adds at most max_wait to a lone query.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], max_wait: float, max_batch: int):
+        self._encode = encode
+        self._max_wait = max_wait
+        self._max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, text: str) -> Future:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+                    self._thread.start()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._max_wait
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batches += 1
+            self.texts += len(batch)
+            try:
+                vectors = self._encode([text for text, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(batch, vectors):
+                fut.set_result(vec)
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers model loaded once per process; `model` may be injected (tests)."""
+
+    def __init__(self, model_name: str = LOCAL_EMBED_MODEL, device: str = LOCAL_EMBED_DEVICE,
+                 threads: int = LOCAL_EMBED_THREADS, max_wait_ms: float = LOCAL_EMBED_BATCH_WINDOW_MS,
+                 max_batch: int = LOCAL_EMBED_MAX_BATCH, dim: int = EMBED_DIM, model=None,
+                 cache: Optional[TTLCache] = None):
+        self.model = f"local:{model_name}"
+        self.model_name = model_name
+        self.device = device
+        self.threads = threads
+        self.dim = dim
+        self.max_batch = max_batch
+        self._st_model = model
+        self._dim_checked = False
+        self._cache = cache
+        self._load_lock = threading.Lock()
+        self._batcher = MicroBatcher(self._encode, max_wait_ms / 1000, max_batch)
+
+    def _load(self):
+        if self._st_model is None:
+            with self._load_lock:
+                if self._st_model is None:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                    except ImportError as e:
+                        raise ImportError("EMBED_PROVIDER=local requires `pip install sentence-transformers`") from e
+                    if self.threads > 0:
+                        import torch
+                        torch.set_num_threads(self.threads)
+                    self._st_model = SentenceTransformer(
+                        self.model_name, device=self.device, trust_remote_code=LOCAL_EMBED_TRUST_REMOTE_CODE,
+                    )
+        if not self._dim_checked:
+            dim = self._st_model.get_sentence_embedding_dimension()
+            if dim != self.dim:
+                raise ValueError(f"{self.model_name} produces {dim}-dim vectors but EMBED_DIM={self.dim}; "
+                                 f"pick a {self.dim}-dim model or change EMBED_DIM and re-ingest")
+            self._dim_checked = True
+        return self._st_model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        model = self._load()
+        with span("embedding", self.model):
+            return model.encode(texts, batch_size=self.max_batch, convert_to_numpy=True).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model, normalize_query(text))
+        if self._cache is not None:
+            vector = self._cache.get(key)
+            if vector is not MISSING:
+                return vector
+        vector = self._batcher.submit(text).result()
+        if self._cache is not None:
+            self._cache.put(key, vector)
+        return vector
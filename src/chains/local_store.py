@@ -0,0 +1,234 @@
+# local_store.py
+# Embedded vector store: normalized embeddings in a memory-mapped array plus an append-only
+# JSONL log (ids, text, metadata, deletes), searched exactly with blocked matrix products.
+# Selected per collection with VECTOR_BACKEND / VECTOR_LOCAL_COLLECTIONS instead of Milvus.
+#
+# Layout of VECTOR_LOCAL_DIR/<collection>/:
+#   meta.json            {"dim", "dtype", "generation"}  (replaced atomically)
+#   vectors-<gen>.bin    row-major float32 / float16 rows, row i = i-th "add" in the log
+#   log-<gen>.jsonl      {"op": "add", "id", "text", "metadata"} | {"op": "del", "id"}
+# Writers append vectors first, then the log line, so a reader never sees a row without its
+# vector; compaction writes the next generation and swaps meta.json.
+
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import VECTOR_BACKEND, VECTOR_LOCAL_COLLECTIONS, VECTOR_LOCAL_DIR, VECTOR_LOCAL_DTYPE
+
+# rows scored per matrix product, bounds the (queries x rows) score buffer
+_BLOCK_ROWS = 65536
+# rewrite the files once this share of the rows are deleted / superseded
+_COMPACT_RATIO = 0.5
+
+
+def uses_local_backend(collection_name: str) -> bool:
+    return VECTOR_BACKEND == "local" or collection_name in VECTOR_LOCAL_COLLECTIONS
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class LocalVectorStore:
+    """Exact cosine top-k over one collection. Safe for one writer process and many readers."""
+
+    def __init__(self, collection_name: str, root: str = VECTOR_LOCAL_DIR, dtype: str = VECTOR_LOCAL_DTYPE,
+                 drop_old: bool = False):
+        self.collection_name = collection_name
+        self.path = os.path.join(root, collection_name)
+        # dtype for a new collection; an existing one is read with the dtype in its meta.json
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        if drop_old:
+            shutil.rmtree(self.path, ignore_errors=True)
+        self._reset(None)
+
+    # --- reading -----------------------------------------------------------------------------
+
+    def _reset(self, meta: Optional[dict]) -> None:
+        self._meta = meta
+        self._meta_mtime = None
+        self._log_offset = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors: Optional[np.ndarray] = None
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> str:
+        gen = self._meta["generation"] if generation is None else generation
+        return os.path.join(self.path, f"{kind}-{gen}.{'bin' if kind == 'vectors' else 'jsonl'}")
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self) -> None:
+        """Pick up rows / deletes appended by another process (cheap when nothing changed)."""
+        with self._lock:
+            try:
+                mtime = os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+            except FileNotFoundError:
+                if self._meta is not None:
+                    self._reset(None)
+                return
+            if mtime != self._meta_mtime:
+                meta = self._read_meta()
+                if self._meta is None or meta["generation"] != self._meta["generation"]:
+                    self._reset(meta)
+                self._meta, self._meta_mtime = meta, mtime
+            self._read_log()
+
+    def _read_log(self) -> None:
+        try:
+            with open(self._file("log"), "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1  # a line still being written is picked up next time
+        if not end:
+            return
+        self._log_offset += end
+        added, dead = 0, []
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            old = self._rows.pop(entry["id"], None)
+            if old is not None:
+                dead.append(old)
+            if entry["op"] == "add":
+                self._rows[entry["id"]] = len(self._ids)
+                self._ids.append(entry["id"])
+                self._texts.append(entry["text"])
+                self._metadatas.append(entry.get("metadata") or {})
+                added += 1
+        if added:
+            self._alive = np.concatenate([self._alive, np.ones(added, dtype=bool)])
+            self._vectors = np.memmap(self._file("vectors"), dtype=np.dtype(self._meta["dtype"]), mode="r",
+                                      shape=(len(self._ids), self._meta["dim"]))
+        self._alive[dead] = False
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._rows)
+
+    def exists(self) -> bool:
+        self.refresh()
+        return self._meta is not None
+
+    def search_vectors(self, vectors: Sequence[Sequence[float]], k: int) -> List[List[Document]]:
+        """Exact top-k by cosine similarity for each query vector."""
+        with self._lock:
+            self.refresh()
+            # the lists are append-only within a generation, so a snapshot stays consistent
+            # while the products run outside the lock
+            vectors_mm, alive = self._vectors, self._alive.copy()
+            ids, texts, metadatas = self._ids, self._texts, self._metadatas
+        if vectors_mm is None or not alive.any():
+            return [[] for _ in vectors]
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        k = min(k, int(alive.sum()))
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(vectors_mm), _BLOCK_ROWS):
+            block = np.asarray(vectors_mm[start:start + _BLOCK_ROWS], dtype=np.float32)
+            scores = queries @ block.T
+            scores[:, ~alive[start:start + len(block)]] = -np.inf
+            block_rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, block_rows], axis=1)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k else np.argsort(-scores, axis=1)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        return [
+            [Document(page_content=texts[r], metadata={**metadatas[r], "pk": ids[r]})
+             for r, score in zip(rows.tolist(), scores) if score > -np.inf]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return self.search_vectors([embedding], k)[0]
+
+    # --- writing -----------------------------------------------------------------------------
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def upsert(self, ids: List[str], texts: List[str], vectors: List[List[float]], metadatas: List[dict]) -> None:
+        """Append rows; an id that already exists is superseded by its new row."""
+        if not ids:
+            return
+        arr = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            self.refresh()
+            if self._meta is None:
+                os.makedirs(self.path, exist_ok=True)
+                self._write_meta({"dim": arr.shape[1], "dtype": self.dtype.name, "generation": 0})
+                self.refresh()
+            # an existing collection keeps the dtype it was created with
+            arr = arr.astype(self._meta["dtype"])
+            if arr.shape[1] != self._meta["dim"]:
+                raise ValueError(f"{self.collection_name}: vectors have dim {arr.shape[1]}, collection has {self._meta['dim']}")
+            with open(self._file("vectors"), "ab") as f:
+                f.write(arr.tobytes())
+            self._append_log({"op": "add", "id": i, "text": t, "metadata": m} for i, t, m in zip(ids, texts, metadatas))
+            self._maybe_compact()
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            self.refresh()
+            gone = [i for i in ids if i in self._rows]
+            if gone:
+                self._append_log({"op": "del", "id": i} for i in gone)
+                self._maybe_compact()
+
+    def _append_log(self, entries) -> None:
+        with open(self._file("log"), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+        self.refresh()
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._ids) - len(self._rows)
+        if dead > 1000 and dead > _COMPACT_RATIO * len(self._ids):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite only the live rows as the next generation."""
+        with self._lock:
+            self.refresh()
+            if self._meta is None:
+                return
+            old_gen = self._meta["generation"]
+            gen = old_gen + 1
+            rows = np.flatnonzero(self._alive)
+            with open(self._file("vectors", gen), "wb") as f:
+                for start in range(0, len(rows), _BLOCK_ROWS):
+                    f.write(np.asarray(self._vectors[rows[start:start + _BLOCK_ROWS]]).tobytes())
+            with open(self._file("log", gen), "w", encoding="utf-8") as f:
+                for r in rows:
+                    f.write(json.dumps({"op": "add", "id": self._ids[r], "text": self._texts[r],
+                                        "metadata": self._metadatas[r]}, ensure_ascii=False) + "\n")
+            self._write_meta({**self._meta, "generation": gen})
+            self.refresh()
+            for kind in ("vectors", "log"):
+                try:
+                    os.remove(self._file(kind, old_gen))
+                except OSError:
+                    pass  # a reader may still have it open (Windows)
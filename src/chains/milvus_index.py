@@ -0,0 +1,124 @@
+# milvus_index.py
+# Index build / search parameters shared by the ingest scripts and the query side, so the
+# recall vs latency trade-off is configured in one place (MILVUS_INDEX_* in src/config.py).
+
+import json
+from typing import Any, Dict, Optional
+
+from pymilvus import DataType
+
+from src.config import (
+    MILVUS_INDEX_TYPE, MILVUS_METRIC_TYPE, MILVUS_INDEX_PARAMS, MILVUS_SEARCH_PARAMS,
+    PDF_COLLECTION_NAME, SQL_COLLECTION_NAME, PDF_PARTITION_KEY, SQL_PARTITION_KEY,
+)
+
+# nlist ~ 4 * sqrt(rows) suits corpora up to ~100k chunks; HNSW values favour recall over build time
+DEFAULT_BUILD_PARAMS: Dict[str, Dict[str, Any]] = {
+    "FLAT": {},
+    "IVF_FLAT": {"nlist": 1024},
+    "IVF_SQ8": {"nlist": 1024},
+    "IVF_PQ": {"nlist": 1024, "m": 16, "nbits": 8},
+    "HNSW": {"M": 16, "efConstruction": 200},
+}
+DEFAULT_SEARCH_PARAMS: Dict[str, Dict[str, Any]] = {
+    "FLAT": {},
+    "IVF_FLAT": {"nprobe": 16},
+    "IVF_SQ8": {"nprobe": 16},
+    "IVF_PQ": {"nprobe": 32},
+    "HNSW": {"ef": 64},
+}
+
+
+def _overrides(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw) if raw else {}
+
+
+def index_params(index_type: str = MILVUS_INDEX_TYPE, metric_type: str = MILVUS_METRIC_TYPE,
+                 params: Optional[Dict[str, Any]] = None) -> dict:
+    """create_index() parameters: per-type defaults with `params` laid over them."""
+    if index_type not in DEFAULT_BUILD_PARAMS:
+        raise ValueError(f"Unsupported index type {index_type!r}, expected one of {sorted(DEFAULT_BUILD_PARAMS)}")
+    return {"index_type": index_type, "metric_type": metric_type,
+            "params": {**DEFAULT_BUILD_PARAMS[index_type], **(params or {})}}
+
+
+def search_params(index_type: str = MILVUS_INDEX_TYPE, metric_type: str = MILVUS_METRIC_TYPE,
+                  params: Optional[Dict[str, Any]] = None) -> dict:
+    """Collection.search() `param` for an index of this type."""
+    return {"metric_type": metric_type, "params": {**DEFAULT_SEARCH_PARAMS.get(index_type, {}), **(params or {})}}
+
+
+INDEX_PARAMS = index_params(params=_overrides(MILVUS_INDEX_PARAMS))
+SEARCH_PARAMS = search_params(params=_overrides(MILVUS_SEARCH_PARAMS))
+
+
+def partition_key(collection_name: str) -> Optional[str]:
+    keys = {PDF_COLLECTION_NAME: PDF_PARTITION_KEY, SQL_COLLECTION_NAME: SQL_PARTITION_KEY}
+    return keys.get(collection_name) or None
+
+
+def payload_in_docstore(store) -> bool:
+    """True for an ids + vectors collection whose text and metadata live in the docstore."""
+    return store.col is not None and store._text_field not in store.fields
+
+
+def vector_dtype(store) -> str:
+    """float16 or float32, the storage type of the collection's vector field."""
+    field = next(f for f in store.col.schema.fields if f.name == store._vector_field)
+    return "float16" if field.dtype == DataType.FLOAT16_VECTOR else "float32"
+
+
+def current_index(store) -> Optional[dict]:
+    """index_param ({"index_type", "metric_type", "params"}) of the vector field, or None."""
+    index = store._get_index() if store.col is not None else None
+    return index["index_param"] if index else None
+
+
+def _same_params(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    # Milvus hands the params back with string values
+    return {k: str(v) for k, v in a.items()} == {k: str(v) for k, v in b.items()}
+
+
+def index_matches(existing: Optional[dict], wanted: dict) -> bool:
+    if existing is None:
+        return False
+    params = existing.get("params") or {}
+    if isinstance(params, str):
+        params = json.loads(params)
+    return (existing.get("index_type") == wanted["index_type"]
+            and existing.get("metric_type") == wanted["metric_type"]
+            and _same_params(params, wanted["params"]))
+
+
+def search_params_for(store, wanted: dict = INDEX_PARAMS, configured: dict = SEARCH_PARAMS) -> Optional[dict]:
+    """Configured search params if the collection carries the configured index; otherwise
+    defaults for the index it does have (metric must match or Milvus rejects the search)."""
+    existing = current_index(store)
+    if existing is None:
+        return store.search_params
+    if existing.get("index_type") == wanted["index_type"] and existing.get("metric_type") == wanted["metric_type"]:
+        return configured
+    print(f"[milvus] {store.collection_name} has a {existing.get('index_type')}/{existing.get('metric_type')} index, "
+          f"not {wanted['index_type']}/{wanted['metric_type']}; re-run ingest to rebuild it")
+    return search_params(existing.get("index_type"), existing.get("metric_type"))
+
+
+def ensure_index(store, wanted: dict = INDEX_PARAMS, configured: dict = SEARCH_PARAMS) -> bool:
+    """Rebuild the vector index when it differs from the configuration. Returns True if rebuilt."""
+    if getattr(store, "col", None) is None:  # not created yet, or the local backend (no index)
+        return False
+    wanted_key = partition_key(store.collection_name)
+    actual_key = next((f.name for f in store.col.schema.fields if getattr(f, "is_partition_key", False)), None)
+    if wanted_key != actual_key:
+        print(f"⚠️ {store.collection_name} 的 partition key 為 {actual_key}，設定為 {wanted_key}；需重建 collection 才會套用。")
+    index = store._get_index()
+    if index is not None and index_matches(index["index_param"], wanted):
+        return False
+    store.col.release()
+    if index is not None:
+        store.col.drop_index(index_name=index["index_name"])
+    store.col.create_index(store._vector_field, index_params=wanted)
+    store.col.load()
+    store.index_params = wanted
+    store.search_params = configured
+    return True
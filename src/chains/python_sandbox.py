@@ -0,0 +1,201 @@
+# python_sandbox.py
+# Python_REPL runs in a pool of pre-started worker processes instead of the API process, so a
+# heavy calculation cannot hold the API's GIL and a runaway loop cannot hang a request.
+# Each run gets a wall-clock timeout, the workers an address-space cap, output is truncated,
+# and a worker is replaced after PYTHON_MAX_RUNS runs (or after a timeout / crash / MemoryError).
+
+import atexit
+import io
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from src.config import PYTHON_POOL_SIZE, PYTHON_TIMEOUT, PYTHON_MEMORY_MB, PYTHON_MAX_OUTPUT, PYTHON_MAX_RUNS
+
+PYTHON_RUNS = Counter("rag_python_runs_total", "Python_REPL executions", ["result"])
+
+
+def sanitize_input(code: str) -> str:
+    """Same cleanup as langchain's PythonREPLTool: strip backticks, whitespace and a leading `python`."""
+    code = re.sub(r"^(\s|`)*(?i:python)?\s*", "", code)
+    return re.sub(r"(\s|`)*$", "", code)
+
+
+class _LimitedWriter(io.TextIOBase):
+    """stdout that keeps only the first `limit` characters, so a print loop cannot exhaust memory."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts: List[str] = []
+        self.size = 0
+        self.dropped = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        room = self.limit - self.size
+        if room > 0:
+            self.parts.append(s[:room])
+            self.size += min(room, len(s))
+        self.dropped += max(0, len(s) - max(room, 0))
+        return len(s)
+
+    def getvalue(self) -> str:
+        out = "".join(self.parts)
+        return out + f"\n...[truncated {self.dropped} chars]" if self.dropped else out
+
+
+def _limit_resources(memory_mb: int) -> None:
+    # one BLAS thread per worker: the pool is the parallelism, and idle BLAS threads reserve address space
+    for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+    try:
+        import resource
+    except ImportError:  # Windows: no RLIMIT_AS, only the timeout applies
+        return
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _execute(code: str, max_output: int) -> Tuple[str, bool]:
+    """Run code in a fresh namespace -> (output, worker should be replaced)."""
+    out = _LimitedWriter(max_output)
+    try:
+        with redirect_stdout(out), redirect_stderr(out):
+            exec(code, {"__name__": "__main__", "__builtins__": __builtins__})
+    except MemoryError:
+        return "MemoryError: exceeded the worker memory limit", True
+    except BaseException as e:  # SystemExit / KeyboardInterrupt from user code must not kill the worker loop
+        return (out.getvalue() + repr(e))[: max_output + 64], False
+    return out.getvalue(), False
+
+
+def _worker_main(conn, memory_mb: int, max_output: int) -> None:
+    _limit_resources(memory_mb)
+    sys.stdin = open(os.devnull)
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            return
+        if code is None:
+            return
+        conn.send(_execute(code, max_output))
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int, max_output: int):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, memory_mb, max_output),
+                                   name="python-repl", daemon=True)
+        self.process.start()
+        child.close()
+        self.runs = 0
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                kill = True
+        if kill:
+            self.process.kill()
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PythonPool:
+    """Fixed set of worker processes; run() blocks the calling thread (an agent worker), not the API."""
+
+    def __init__(self, size: int = PYTHON_POOL_SIZE, timeout: float = PYTHON_TIMEOUT,
+                 memory_mb: int = PYTHON_MEMORY_MB, max_output: int = PYTHON_MAX_OUTPUT,
+                 max_runs: int = PYTHON_MAX_RUNS):
+        self.size = size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self.max_runs = max_runs
+        # spawn, not fork: forking the multi-threaded API process can deadlock the child
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.memory_mb, self.max_output)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, kill: bool = False) -> _Worker:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.stop(kill=kill)
+        return self._spawn()
+
+    def start(self) -> None:
+        """Start the workers (called by the warmup; run() starts them on first use otherwise)."""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def run(self, code: str) -> str:
+        self.start()
+        code = sanitize_input(code)
+        worker = self._idle.get()
+        try:
+            try:
+                worker.conn.send(code)
+            except OSError:  # died while idle
+                worker = self._retire(worker, kill=True)
+                worker.conn.send(code)
+            if not worker.conn.poll(self.timeout):
+                worker = self._retire(worker, kill=True)
+                PYTHON_RUNS.labels("timeout").inc()
+                return f"TimeoutError: execution took longer than {self.timeout:g}s and was stopped"
+            try:
+                output, recycle = worker.conn.recv()
+            except (EOFError, OSError):
+                worker = self._retire(worker, kill=True)
+                PYTHON_RUNS.labels("crash").inc()
+                return "RuntimeError: the Python worker crashed (likely out of memory)"
+            worker.runs += 1
+            PYTHON_RUNS.labels("memory_error" if recycle else "ok").inc()
+            if recycle or worker.runs >= self.max_runs:
+                worker = self._retire(worker)
+            return output
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop(kill=True)
+
+
+python_pool = PythonPool()
+atexit.register(python_pool.close)
+
+
+def python_repl_fn(code: str) -> str:
+    return python_pool.run(code)
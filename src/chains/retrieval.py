@@ -0,0 +1,67 @@
+# retrieval.py
+# Multi-query, multi-collection retrieval: all queries embedded in one fan-out, one multi-vector
+# search per collection, collections searched in parallel. Backs /v1/retrieve and the SearchAll tool.
+
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+from langchain_core.documents import Document
+
+from src.config import PDF_COLLECTION_NAME, SQL_COLLECTION_NAME, CONTEXT_TOOL_K, CONTEXT_TOOL_TOKENS
+from src.chains.context import format_snippets
+from src.chains.vector_registry import embed_queries, search_many
+
+DEFAULT_COLLECTIONS = (PDF_COLLECTION_NAME, SQL_COLLECTION_NAME)
+
+_executor = ThreadPoolExecutor(max_workers=len(DEFAULT_COLLECTIONS) * 2, thread_name_prefix="retrieve")
+
+
+def retrieve(queries: Sequence[str], collections: Sequence[str] = DEFAULT_COLLECTIONS, k: int = 3) -> Dict[str, List[List[Document]]]:
+    """{collection: [docs for each query]}, results lined up with `queries`."""
+    queries = list(queries)
+    if not queries:
+        return {name: [] for name in collections}
+    # one embedding fan-out for every collection; search_many then finds them cached
+    embed_queries(queries)
+    futures = {name: _executor.submit(search_many, name, queries, k) for name in collections}
+    return {name: fut.result() for name, fut in futures.items()}
+
+
+def _doc_key(doc: Document) -> str:
+    return hashlib.sha1(" ".join(doc.page_content.split()).encode("utf-8")).hexdigest()
+
+
+def merge_results(results: Dict[str, List[List[Document]]], limit: int) -> List[Document]:
+    """Round-robin by rank over every (collection, query) list, skipping duplicate contents.
+
+    Scores are not comparable across collections, so rank is the fairest common order.
+    """
+    lists = [docs for per_query in results.values() for docs in per_query]
+    merged, seen = [], set()
+    for rank in range(max((len(docs) for docs in lists), default=0)):
+        for docs in lists:
+            if rank >= len(docs):
+                continue
+            key = _doc_key(docs[rank])
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(docs[rank])
+            if len(merged) >= limit:
+                return merged
+    return merged
+
+
+def split_queries(text: str) -> List[str]:
+    """The agent may pass several sub-queries separated by newlines or ';'."""
+    return [q.strip() for q in re.split(r"[\n;]+", text) if q.strip()]
+
+
+def search_everything_fn(query: str) -> str:
+    queries = split_queries(query) or [query]
+    results = retrieve(queries, DEFAULT_COLLECTIONS, k=CONTEXT_TOOL_K)
+    # rank-interleaved candidates; pack_context drops near-duplicates and stitches overlaps
+    docs = merge_results(results, limit=CONTEXT_TOOL_K * len(queries) * len(DEFAULT_COLLECTIONS))
+    return format_snippets(docs, CONTEXT_TOOL_TOKENS)
@@ -0,0 +1,294 @@
+# router.py
+# Fast-path routing in front of the ReAct agent: a query is matched against labeled example
+# questions by embedding similarity and, when the match is clear, answered with one LLM call
+# (optionally after a single vector search) instead of the multi-step agent loop.
+
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.config import (
+    PDF_COLLECTION_NAME, SQL_COLLECTION_NAME, ROUTER_ENABLED, ROUTER_INTENTS_FILE,
+    ROUTER_MIN_SCORE, ROUTER_MIN_MARGIN, ROUTER_RAG_K, CONTEXT_RAG_TOKENS, SESSION_LLM_CONTEXT_TOKENS,
+)
+from src.chains.agent_chain import get_llm
+from src.chains.context import format_context, pack_context
+from src.chains.sessions import current_turn, history_block, retrieval_query, with_history
+from src.chains.streaming import DIRECT_ANSWER_TAG
+from src.chains.vector_registry import embed_queries, get_embeddings, search, search_many
+from src.metrics import span
+
+ROUTES = ("direct", "pdf_rag", "sql_rag", "agent")
+
+DEFAULT_INTENTS: Dict[str, List[str]] = {
+    "direct": [
+        "hello",
+        "hi, who are you?",
+        "what can you do?",
+        "What is the Northwind database?",
+        "explain what a vector database is",
+        "what is the difference between precision and recall?",
+        "translate this sentence into English",
+        "你好",
+        "請用簡單的方式解釋什麼是機器學習",
+    ],
+    "pdf_rag": [
+        "what does the lab's paper say about this method?",
+        "summarize the research on this topic in our papers",
+        "which dataset was used in the experiments?",
+        "what algorithm did the paper propose?",
+        "what were the evaluation results reported in the paper?",
+        "論文中使用了哪些資料集？",
+        "這篇論文提出的方法是什麼？",
+    ],
+    "sql_rag": [
+        "what is the unit price of Chai?",
+        "which supplier provides Tofu?",
+        "how many units of Chang are in stock?",
+        "what is the quantity per unit of Aniseed Syrup?",
+        "which category does this product belong to?",
+        "Chai 的單價是多少？",
+    ],
+    "agent": [
+        "what are the total sales by category?",
+        "compare the average price of beverages and seafood and compute the difference",
+        "how many orders were shipped to each country last year?",
+        "list the top 5 customers by revenue",
+        "calculate the growth rate of sales between 1997 and 1998",
+        "find products whose stock is below the reorder level and estimate the cost to restock them",
+        "根據論文內容與資料庫數據比較兩者的結果",
+    ],
+}
+
+_RAG_PROMPT = (
+    "Answer the question using the context below. Cite snippets as [n]. "
+    "If the context does not contain the answer, say that you could not find it.\n\n"
+    "Context:\n{context}\n\nQuestion: {question}\nAnswer:"
+)
+
+
+def load_intents(path: Optional[str]) -> Dict[str, List[str]]:
+    """Read {"route": ["example question", ...]} from JSON; routes not listed are never chosen."""
+    if not path:
+        return DEFAULT_INTENTS
+    with open(path, "r", encoding="utf-8") as f:
+        intents = json.load(f)
+    unknown = set(intents) - set(ROUTES)
+    if unknown:
+        raise ValueError(f"Unknown routes in {path}: {sorted(unknown)}")
+    return intents
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+class IntentClassifier:
+    """Nearest labeled example by cosine similarity; ambiguous or weak matches go to the agent."""
+
+    def __init__(self, embed_query, intents: Dict[str, List[str]], min_score: float = ROUTER_MIN_SCORE,
+                 min_margin: float = ROUTER_MIN_MARGIN):
+        self._embed_query = embed_query
+        self._intents = intents
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._labels: List[str] = []
+
+    def _examples(self) -> Tuple[np.ndarray, List[str]]:
+        if self._matrix is None:
+            with self._lock:
+                if self._matrix is None:
+                    labels, vectors = [], []
+                    for route, examples in self._intents.items():
+                        for text in examples:
+                            # embed_query on both sides so the model's query/passage prefixes match
+                            vectors.append(self._embed_query(text))
+                            labels.append(route)
+                    self._labels = labels
+                    self._matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        return self._matrix, self._labels
+
+    def classify(self, vector: List[float]) -> Tuple[str, float]:
+        """Return (route, best score) for an already embedded query."""
+        matrix, labels = self._examples()
+        sims = matrix @ _normalize(np.asarray(vector, dtype=np.float32))
+        best: Dict[str, float] = {}
+        for label, score in zip(labels, sims.tolist()):
+            best[label] = max(best.get(label, -1.0), score)
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)
+        route, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score < self.min_score or score - runner_up < self.min_margin:
+            return "agent", score
+        return route, score
+
+
+class _LLMCallCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs: Any) -> None:
+        self.calls += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        self.calls += 1
+
+
+class RouteStats:
+    """Per-route request counts, latency and LLM calls, to compare fast paths with the agent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {r: {"requests": 0, "errors": 0, "seconds": 0.0, "llm_calls": 0} for r in ROUTES}
+        self._classify = {"requests": 0, "errors": 0, "seconds": 0.0}
+
+    def record_classify(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self._classify["requests"] += 1
+            self._classify["seconds"] += seconds
+            if not ok:
+                self._classify["errors"] += 1
+
+    def record(self, route: str, seconds: float, llm_calls: int, ok: bool = True) -> None:
+        with self._lock:
+            entry = self._routes[route]
+            entry["requests"] += 1
+            entry["seconds"] += seconds
+            entry["llm_calls"] += llm_calls
+            if not ok:
+                entry["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for route, e in self._routes.items():
+                n = e["requests"]
+                routes[route] = {
+                    **e,
+                    "avg_seconds": e["seconds"] / n if n else None,
+                    "avg_llm_calls": e["llm_calls"] / n if n else None,
+                }
+            classify = dict(self._classify)
+        agent = routes["agent"]
+        saved_calls = saved_seconds = None
+        if agent["requests"]:
+            # Estimated against the agent's average cost for the same traffic
+            fast = [routes[r] for r in ROUTES if r != "agent" and routes[r]["requests"]]
+            saved_calls = sum(r["requests"] * agent["avg_llm_calls"] - r["llm_calls"] for r in fast)
+            saved_seconds = sum(r["requests"] * agent["avg_seconds"] - r["seconds"] for r in fast)
+        return {
+            "routes": routes,
+            "classify": classify,
+            "estimated_saved_llm_calls": saved_calls,
+            "estimated_saved_seconds": saved_seconds,
+        }
+
+
+route_stats = RouteStats()
+
+
+class RoutedAgent:
+    """Same run interface as the agent returned by init_agent."""
+
+    def __init__(self, agent, classifier: IntentClassifier, embeddings=None, stats: RouteStats = route_stats,
+                 llm_factory=get_llm, rag_k: int = ROUTER_RAG_K, context_tokens: int = CONTEXT_RAG_TOKENS):
+        self.agent = agent
+        self.classifier = classifier
+        self._embeddings = embeddings or get_embeddings()
+        self.stats = stats
+        self._llm_factory = llm_factory
+        self._rag_k = rag_k
+        self._context_tokens = context_tokens
+
+    def route(self, question: str) -> Tuple[str, Optional[List[float]]]:
+        started = time.perf_counter()
+        try:
+            with span("route_classify"):
+                vector = self._embeddings.embed_query(question)
+                route, _ = self.classifier.classify(vector)
+        except Exception as e:
+            print(f"[router] classify failed, using agent: {e}")
+            self.stats.record_classify(time.perf_counter() - started, ok=False)
+            return "agent", None
+        self.stats.record_classify(time.perf_counter() - started)
+        return route, vector
+
+    def _answer(self, prompt: str, callbacks) -> str:
+        return self._llm_factory().invoke(prompt, config={"callbacks": callbacks, "tags": [DIRECT_ANSWER_TAG]})
+
+    def _direct(self, question: str, callbacks) -> str:
+        turn = current_turn.get()
+        if turn is None:
+            return self._answer(question, callbacks)
+        # In a conversation, pass Ollama the context tokens of the previous direct answer: the
+        # history is already in its KV cache, so only the new question needs prefill.
+        kwargs = {"context": turn.llm_context} if turn.llm_context else {}
+        prompt = question if turn.llm_context else with_history(question)
+        result = self._llm_factory().generate([prompt], callbacks=callbacks, tags=[DIRECT_ANSWER_TAG], **kwargs)
+        generation = result.generations[0][0]
+        context = (generation.generation_info or {}).get("context")
+        if context and len(context) <= SESSION_LLM_CONTEXT_TOKENS:
+            turn.state.llm_context = context
+        return generation.text
+
+    def _rag(self, collection: str, question: str, callbacks) -> Optional[str]:
+        # the query embedding computed for routing is served from the embedding cache here
+        docs = search(collection, retrieval_query(question), self._rag_k)
+        if not docs:
+            return None
+        context = format_context(pack_context(docs, self._context_tokens))
+        prompt = _RAG_PROMPT.format(context=context, question=question)
+        history = history_block()
+        return self._answer(f"{history}\n\n{prompt}" if history else prompt, callbacks)
+
+    def prefetch(self, questions: List[str]) -> None:
+        """Warm the caches for a batch of questions: embeddings fanned out together and one
+        multi-vector search per collection, so the per-question run() finds them cached."""
+        vectors = embed_queries(questions, self._embeddings.embed_query)
+        targets = {"pdf_rag": PDF_COLLECTION_NAME, "sql_rag": SQL_COLLECTION_NAME}
+        grouped: Dict[str, List[str]] = {}
+        for question, vector in zip(questions, vectors):
+            route, _ = self.classifier.classify(vector)
+            if route in targets:
+                grouped.setdefault(targets[route], []).append(question)
+        for collection, batch in grouped.items():
+            search_many(collection, batch, self._rag_k)
+
+    def run(self, question: str, callbacks=None) -> str:
+        # a follow-up such as "and its price?" is routed together with the question it follows
+        route, _ = self.route(retrieval_query(question))
+        counter = _LLMCallCounter()
+        callbacks = list(callbacks or []) + [counter]
+        started = time.perf_counter()
+        ok = False
+        try:
+            answer = None
+            if route == "direct":
+                answer = self._direct(question, callbacks)
+            elif route == "pdf_rag":
+                answer = self._rag(PDF_COLLECTION_NAME, question, callbacks)
+            elif route == "sql_rag":
+                answer = self._rag(SQL_COLLECTION_NAME, question, callbacks)
+            if answer is None:
+                # nothing retrieved: let the agent try its other tools
+                route = "agent"
+                answer = self.agent.run(question, callbacks=callbacks)
+            ok = True
+            return answer
+        finally:
+            self.stats.record(route, time.perf_counter() - started, counter.calls, ok=ok)
+
+
+def with_router(agent):
+    """Wrap the agent with the fast-path router unless ROUTER_ENABLED is off."""
+    if not ROUTER_ENABLED:
+        return agent
+    embeddings = get_embeddings()
+    return RoutedAgent(agent, IntentClassifier(embeddings.embed_query, load_intents(ROUTER_INTENTS_FILE)), embeddings)
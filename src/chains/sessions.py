@@ -0,0 +1,275 @@
+# sessions.py
+# Multi-turn chat: the whole `messages` list of a request becomes a history block bounded by a
+# token budget, and per-conversation state (summary of older turns, chunks retrieved so far,
+# Ollama context tokens of the last direct answer) is kept so a follow-up does not redo that work.
+# A conversation is identified by its message history, so clients need no session id.
+
+import hashlib
+import json
+from contextvars import ContextVar
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import (
+    SESSION_ENABLED, SESSION_MAX, SESSION_TTL, SESSION_HISTORY_TOKENS, SESSION_SUMMARY,
+    SESSION_REUSE_THRESHOLD, SESSION_MAX_RETRIEVALS,
+)
+from src.chains.cache import CACHE_REQUESTS, MISSING, TTLCache, normalize_query
+from src.chains.context import estimate_tokens
+from src.metrics import span
+
+# (role, content)
+Message = Tuple[str, str]
+
+_ROLE_NAMES = {"user": "User", "assistant": "Assistant", "system": "System"}
+
+_SUMMARY_PROMPT = (
+    "Summarize the conversation below in a few sentences for the assistant's memory. Keep names, numbers, "
+    "products and papers that were mentioned.\n\n{previous}{turns}\n\nSummary:"
+)
+
+
+def as_messages(messages: Sequence[Any]) -> List[Message]:
+    """Request messages (pydantic models or plain dicts) -> [(role, content)]."""
+    out = []
+    for m in messages:
+        role = m.get("role") if isinstance(m, dict) else m.role
+        content = m.get("content") if isinstance(m, dict) else m.content
+        out.append((role or "", content if isinstance(content, str) else str(content or "")))
+    return out
+
+
+def split_conversation(messages: Sequence[Message]) -> Tuple[List[Message], str]:
+    """(user/assistant turns before the last user message, last user message); system messages are dropped."""
+    turns = [m for m in messages if m[0] in ("user", "assistant")]
+    for i in range(len(turns) - 1, -1, -1):
+        if turns[i][0] == "user":
+            return turns[:i], turns[i][1]
+    return turns, ""
+
+
+def conversation_key(messages: Sequence[Message]) -> str:
+    payload = json.dumps([[role, normalize_query(content)] for role, content in messages], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def window_start(history: Sequence[Message], budget: int, start: int = 0) -> int:
+    """Index of the oldest turn kept verbatim.
+
+    The window start only moves when the history outgrows the budget, and then far enough that
+    the rest fits in half of it, so consecutive turns render the same prompt prefix (which
+    Ollama can serve from its KV cache) instead of a prefix that shifts every turn.
+    """
+    start = min(start, len(history))
+    costs = [estimate_tokens(content) + 2 for _, content in history]
+    remaining = sum(costs[start:])
+    if remaining <= budget:
+        return start
+    while start < len(history) and remaining > budget // 2:
+        remaining -= costs[start]
+        start += 1
+    return start
+
+
+def format_turns(turns: Sequence[Message]) -> str:
+    return "\n".join(f"{_ROLE_NAMES.get(role, role)}: {content}" for role, content in turns)
+
+
+def format_history(summary: str, turns: Sequence[Message]) -> str:
+    if not summary and not turns:
+        return ""
+    lines = ["Conversation so far:"]
+    if summary:
+        lines.append(f"(Earlier turns, summarized) {summary}")
+    if turns:
+        lines.append(format_turns(turns))
+    return "\n".join(lines)
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    return v / (np.linalg.norm(v) or 1.0)
+
+
+class RetrievalMemory:
+    """Chunks retrieved earlier in one conversation; a rephrased query with a close enough
+    embedding gets them back without another vector search."""
+
+    def __init__(self, maxsize: int = SESSION_MAX_RETRIEVALS, threshold: float = SESSION_REUSE_THRESHOLD,
+                 entries: Optional[list] = None):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        # (collection, collection version, query, k, unit vector, docs), oldest first
+        self._entries: list = list(entries or [])
+
+    def lookup(self, collection: str, version: Optional[str], vector: List[float], k: int) -> Optional[List[Document]]:
+        q = _unit(vector)
+        found = None
+        for name, ver, _, size, vec, docs in reversed(self._entries):
+            if name == collection and ver == version and size >= k and float(vec @ q) >= self.threshold:
+                found = docs[:k]
+                break
+        CACHE_REQUESTS.labels("session_retrieval", "miss" if found is None else "hit").inc()
+        return found
+
+    def remember(self, collection: str, version: Optional[str], query: str, vector: List[float], k: int,
+                 docs: List[Document]) -> None:
+        if self.maxsize <= 0:
+            return
+        query = normalize_query(query)
+        self._entries = [e for e in self._entries if e[:4] != (collection, version, query, k)]
+        self._entries.append((collection, version, query, k, _unit(vector), docs))
+        del self._entries[:-self.maxsize]
+
+    def copy(self) -> "RetrievalMemory":
+        return RetrievalMemory(self.maxsize, self.threshold, self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SessionState:
+    """What a conversation has built up so far. Each turn works on a copy stored under the new
+    history, so a client that regenerates an earlier answer finds the state of that point."""
+
+    def __init__(self, summary: str = "", summarized: int = 0, window_start: int = 0,
+                 llm_context: Optional[List[int]] = None, retrievals: Optional[RetrievalMemory] = None,
+                 turns: int = 0):
+        self.summary = summary
+        # history[:summarized] is covered by the summary, history[window_start:] is kept verbatim
+        self.summarized = summarized
+        self.window_start = window_start
+        self.llm_context = llm_context
+        self.retrievals = retrievals if retrievals is not None else RetrievalMemory()
+        self.turns = turns
+
+    def next(self) -> "SessionState":
+        return SessionState(self.summary, self.summarized, self.window_start, self.llm_context,
+                            self.retrievals.copy(), self.turns)
+
+
+class Turn:
+    """The conversation turn being answered on this thread (see `current_turn`)."""
+
+    def __init__(self, state: SessionState, history: str, previous_question: str = ""):
+        self.state = state
+        self.history = history
+        self.previous_question = previous_question
+        # only valid for this turn if it is answered by a call that continues that context
+        self.llm_context = state.llm_context
+        state.llm_context = None
+
+    @property
+    def followup(self) -> bool:
+        return bool(self.history)
+
+
+# Set by SessionAgent.chat for the duration of one turn; read by the router, the agent, the
+# answer cache and vector search, which all run on the same thread.
+current_turn: ContextVar[Optional[Turn]] = ContextVar("current_turn", default=None)
+
+
+def is_followup() -> bool:
+    turn = current_turn.get()
+    return turn is not None and turn.followup
+
+
+def history_block() -> str:
+    turn = current_turn.get()
+    return turn.history if turn is not None else ""
+
+
+def with_history(question: str) -> str:
+    """The question, preceded by the conversation so far when it is a follow-up."""
+    block = history_block()
+    return f"{block}\n\nCurrent question: {question}" if block else question
+
+
+def retrieval_query(question: str) -> str:
+    """Search text for a follow-up: the previous question gives a bare "and its price?" its subject."""
+    turn = current_turn.get()
+    if turn is None or not turn.previous_question:
+        return question
+    return f"{turn.previous_question} {question}"
+
+
+def session_retrievals() -> Optional[RetrievalMemory]:
+    turn = current_turn.get()
+    return turn.state.retrievals if turn is not None else None
+
+
+def render_prompt(messages: Sequence[Message], budget: int = SESSION_HISTORY_TOKENS) -> str:
+    """Stateless version for raw completions: last question plus as much recent history as fits."""
+    history, question = split_conversation(messages)
+    start = window_start(history, budget)
+    block = format_history("", history[start:])
+    return f"{block}\n\nCurrent question: {question}" if block else question
+
+
+sessions = TTLCache("session", SESSION_MAX, SESSION_TTL)
+
+
+class SessionAgent:
+    """Same run interface as the wrapped agent, plus chat() for a whole message list."""
+
+    def __init__(self, agent, llm_factory=None, store: TTLCache = sessions, enabled: bool = SESSION_ENABLED,
+                 history_tokens: int = SESSION_HISTORY_TOKENS, summarize: bool = SESSION_SUMMARY):
+        self.agent = agent
+        self._llm_factory = llm_factory
+        self.store = store
+        self.enabled = enabled
+        self.history_tokens = history_tokens
+        self.summarize = summarize and llm_factory is not None
+
+    def prefetch(self, questions: List[str]) -> None:
+        inner = getattr(self.agent, "prefetch", None)
+        if inner is not None:
+            inner(questions)
+
+    def run(self, question: str, callbacks=None) -> str:
+        return self.agent.run(question, callbacks=callbacks)
+
+    def _summarize(self, previous: str, turns: Sequence[Message]) -> str:
+        # only the newest part of what dropped out of the window, so the call stays bounded
+        keep = window_start(turns, self.history_tokens * 4)
+        prompt = _SUMMARY_PROMPT.format(
+            previous=f"Earlier summary: {previous}\n\n" if previous else "", turns=format_turns(turns[keep:]),
+        )
+        # not the request's callbacks: those would stream the summary to the client and bill it to the answer
+        with span("session_summary"):
+            return self._llm_factory().invoke(prompt).strip()
+
+    def _open_turn(self, state: SessionState, history: List[Message]) -> Turn:
+        start = window_start(history, self.history_tokens, state.window_start)
+        if self.summarize and start > state.summarized:
+            try:
+                state.summary = self._summarize(state.summary, history[state.summarized:start])
+                state.summarized = start
+            except Exception as e:
+                print(f"[sessions] summary failed, truncating history: {e}")
+        state.window_start = start
+        previous = next((content for role, content in reversed(history) if role == "user"), "")
+        return Turn(state, format_history(state.summary, history[start:]), previous)
+
+    def chat(self, messages: Sequence[Any], callbacks=None) -> str:
+        history, question = split_conversation(as_messages(messages))
+        if not self.enabled:
+            return self.agent.run(question, callbacks=callbacks)
+        found = self.store.get(conversation_key(history))
+        state = SessionState() if found is MISSING else found.next()
+        turn = self._open_turn(state, history)
+        token = current_turn.set(turn)
+        try:
+            answer = self.agent.run(question, callbacks=callbacks)
+        finally:
+            current_turn.reset(token)
+        state.turns += 1
+        self.store.put(conversation_key(history + [("user", question), ("assistant", answer)]), state)
+        return answer
+
+
+def with_sessions(agent, llm_factory=None):
+    """Wrap the agent for multi-turn chat; with SESSION_ENABLED off, chat() answers the last user message alone."""
+    return SessionAgent(agent, llm_factory=llm_factory)
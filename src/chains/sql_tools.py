@@ -0,0 +1,180 @@
+# sql_tools.py
+# SQLSchema / SQLQuery agent tools: pooled SQLAlchemy engine, schema introspected once and
+# cached in a compact form, read-only guard, statement timeout and row/byte caps on results.
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import URL, Engine
+
+from src.config import (
+    MSSQL_SERVER, MSSQL_DATABASE, MSSQL_USER, MSSQL_PASSWORD, SQL_DATABASE_URL,
+    SQL_POOL_SIZE, SQL_QUERY_TIMEOUT, SQL_MAX_ROWS, SQL_MAX_RESULT_BYTES, SQL_SCHEMA_TTL,
+)
+
+_lock = threading.Lock()
+_engine: Optional[Engine] = None
+_schema: Optional[Dict[str, str]] = None
+_schema_loaded_at = 0.0
+
+_FORBIDDEN = re.compile(
+    r"\b(insert|update|delete|merge|drop|alter|create|truncate|exec|execute|grant|revoke|deny|into|"
+    r"backup|restore|shutdown|dbcc|bulk|openrowset|openquery|opendatasource|waitfor|use|declare|set)\b"
+    r"|\b(xp|sp)_\w+",
+    re.IGNORECASE,
+)
+
+
+def _default_url():
+    if SQL_DATABASE_URL:
+        return SQL_DATABASE_URL
+    return URL.create(
+        "mssql+pyodbc",
+        username=MSSQL_USER,
+        password=MSSQL_PASSWORD,
+        host=MSSQL_SERVER,
+        database=MSSQL_DATABASE,
+        query={"driver": "ODBC Driver 18 for SQL Server", "TrustServerCertificate": "yes"},
+    )
+
+
+def _build_engine() -> Engine:
+    engine = create_engine(
+        _default_url(),
+        pool_size=SQL_POOL_SIZE,
+        max_overflow=SQL_POOL_SIZE,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+    if engine.dialect.driver == "pyodbc":
+        @event.listens_for(engine, "connect")
+        def _set_timeout(dbapi_conn, _record):
+            # pyodbc: per-statement timeout in seconds for every cursor of this connection
+            dbapi_conn.timeout = int(SQL_QUERY_TIMEOUT)
+    return engine
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = _build_engine()
+    return _engine
+
+
+def use_engine(engine: Optional[Engine]) -> None:
+    """Swap the engine (e.g. a SQLite stand-in) and drop the cached schema."""
+    global _engine, _schema
+    with _lock:
+        _engine = engine
+        _schema = None
+
+
+def _compact_type(col_type) -> str:
+    return str(col_type).split(" COLLATE")[0].lower()
+
+
+def load_schema(refresh: bool = False) -> Dict[str, str]:
+    """table name -> "Table(col type PK, col type -> Other.col, ...)", introspected once per SQL_SCHEMA_TTL."""
+    global _schema, _schema_loaded_at
+    if _schema is not None and not refresh and time.monotonic() - _schema_loaded_at < SQL_SCHEMA_TTL:
+        return _schema
+    with _lock:
+        if _schema is not None and not refresh and time.monotonic() - _schema_loaded_at < SQL_SCHEMA_TTL:
+            return _schema
+        insp = inspect(get_engine())
+        schema = {}
+        for table in sorted(insp.get_table_names()):
+            pk = set(insp.get_pk_constraint(table).get("constrained_columns") or [])
+            fks = {}
+            for fk in insp.get_foreign_keys(table):
+                for col, ref in zip(fk["constrained_columns"], fk["referred_columns"]):
+                    fks[col] = f"{fk['referred_table']}.{ref}"
+            cols = []
+            for col in insp.get_columns(table):
+                desc = f"{col['name']} {_compact_type(col['type'])}"
+                if col["name"] in pk:
+                    desc += " PK"
+                if col["name"] in fks:
+                    desc += f" -> {fks[col['name']]}"
+                cols.append(desc)
+            schema[table] = f"{table}({', '.join(cols)})"
+        _schema = schema
+        _schema_loaded_at = time.monotonic()
+    return _schema
+
+
+def sql_schema_fn(query: str = "") -> str:
+    try:
+        schema = load_schema()
+    except Exception as e:
+        return f"SQL_ERROR: cannot read schema: {e}"
+    wanted = [t for t in schema if re.search(rf"\b{re.escape(t)}\b", query or "", re.IGNORECASE)]
+    return "\n".join(schema[t] for t in (wanted or schema))
+
+
+def clean_sql(text: str) -> str:
+    """Strip markdown fences, comments and the trailing semicolon the prompt asks the model for."""
+    text = re.sub(r"^```(?:sql)?|```$", "", text.strip(), flags=re.IGNORECASE | re.MULTILINE)
+    text = re.sub(r"--[^\n]*", " ", text)
+    text = re.sub(r"/\*.*?\*/", " ", text, flags=re.DOTALL)
+    return text.strip().rstrip(";").strip()
+
+
+def check_read_only(sql: str) -> Optional[str]:
+    if not sql:
+        return "empty statement"
+    # string literals may legitimately contain ';' or keywords
+    bare = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    if ";" in bare:
+        return "only one statement is allowed"
+    if not re.match(r"^\s*(select|with)\b", bare, re.IGNORECASE):
+        return "only SELECT / WITH queries are allowed"
+    match = _FORBIDDEN.search(bare)
+    if match:
+        return f"keyword not allowed in read-only queries: {match.group(0)}"
+    return None
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "NULL"
+    return str(value).replace("\n", " ")
+
+
+def sql_query_fn(query: str) -> str:
+    sql = clean_sql(query)
+    problem = check_read_only(sql)
+    if problem:
+        return f"SQL_ERROR: {problem}"
+    try:
+        with get_engine().connect() as conn:
+            try:
+                result = conn.exec_driver_sql(sql)
+                columns = list(result.keys())
+                rows = result.fetchmany(SQL_MAX_ROWS + 1)
+                result.close()
+            finally:
+                conn.rollback()
+    except Exception as e:
+        return f"SQL_ERROR: {str(e).splitlines()[0][:300]}"
+
+    if not rows:
+        return "NO_ROWS"
+    lines: List[str] = [" | ".join(columns)]
+    size = len(lines[0])
+    truncated = len(rows) > SQL_MAX_ROWS
+    for row in rows[:SQL_MAX_ROWS]:
+        line = " | ".join(_fmt(v) for v in row)
+        if size + len(line) + 1 > SQL_MAX_RESULT_BYTES:
+            truncated = True
+            break
+        lines.append(line)
+        size += len(line) + 1
+    if truncated:
+        lines.append(f"... (truncated to {len(lines) - 1} rows; aggregate in SQL instead)")
+    return "\n".join(lines)
@@ -0,0 +1,63 @@
+# streaming.py
+# Callback handlers that turn agent / LLM runs into token events for SSE responses.
+
+from typing import Any, Callable, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+# LLM calls tagged with this produce the answer directly (no ReAct format), so stream every token.
+DIRECT_ANSWER_TAG = "direct_answer"
+
+# (kind, payload) where kind is "token" or "step"
+StreamEvent = Tuple[str, Any]
+
+
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """Forwards only the tokens after 'Final Answer:' of each agent LLM call; reasoning stays hidden."""
+
+    def __init__(self, sink: Callable[[StreamEvent], None], include_steps: bool = False):
+        self._sink = sink
+        self._include_steps = include_steps
+        self._buffer = ""
+        self._answering = False
+        self._leading = True
+
+    def on_llm_start(self, serialized, prompts, **kwargs: Any) -> None:
+        self._buffer = ""
+        self._answering = DIRECT_ANSWER_TAG in (kwargs.get("tags") or [])
+        self._leading = True
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if not self._answering:
+            self._buffer += token
+            idx = self._buffer.find(FINAL_ANSWER_PREFIX)
+            if idx < 0:
+                return
+            self._answering = True
+            token = self._buffer[idx + len(FINAL_ANSWER_PREFIX):]
+        if self._leading:
+            token = token.lstrip()
+            if not token:
+                return
+            self._leading = False
+        self._sink(("token", token))
+
+    def on_agent_action(self, action, **kwargs: Any) -> None:
+        if self._include_steps:
+            self._sink(("step", {"type": "action", "tool": action.tool, "input": str(action.tool_input)}))
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        if self._include_steps:
+            self._sink(("step", {"type": "observation", "output": str(output)[:500]}))
+
+
+class TokenStreamHandler(BaseCallbackHandler):
+    """Forwards every LLM token; used for raw (non-agent) completions."""
+
+    def __init__(self, sink: Callable[[StreamEvent], None]):
+        self._sink = sink
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self._sink(("token", token))
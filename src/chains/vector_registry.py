@@ -0,0 +1,293 @@
+# vector_registry.py
+# Process-wide cache of embedding clients and vector stores, shared by every tool call.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+
+import grpc
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_community.embeddings import OllamaEmbeddings
+from langchain_community.vectorstores import Milvus
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pymilvus import MilvusException, connections, utility
+
+from src.metrics import span
+from src.chains.cache import MISSING, TTLCache, collection_version, normalize_query
+from src.chains.local_embeddings import LocalEmbeddings
+from src.chains.local_store import LocalVectorStore, uses_local_backend
+from src.chains.docstore import get_docstore
+from src.chains.milvus_index import INDEX_PARAMS, payload_in_docstore, search_params_for, vector_dtype
+from src.chains.sessions import session_retrievals
+from src.config import (
+    OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL, OLLAMA_KEEP_ALIVE, EMBED_PROVIDER, LOCAL_EMBED_MODEL, MILVUS_HOST, MILVUS_PORT,
+    MILVUS_HEALTHCHECK_INTERVAL, OLLAMA_HTTP_POOL_SIZE,
+    CACHE_EMBED_SIZE, CACHE_EMBED_TTL, CACHE_SEARCH_SIZE, CACHE_SEARCH_TTL,
+)
+
+T = TypeVar("T")
+
+_lock = threading.RLock()
+_session: Optional[requests.Session] = None
+_embeddings: Dict[Tuple[str, str], Embeddings] = {}
+_stores: Dict[str, "_StoreEntry"] = {}
+
+_embed_executor: Optional[ThreadPoolExecutor] = None
+
+query_embedding_cache = TTLCache("query_embedding", CACHE_EMBED_SIZE, CACHE_EMBED_TTL)
+search_cache = TTLCache("vector_search", CACHE_SEARCH_SIZE, CACHE_SEARCH_TTL)
+
+# Milvus caps the number of query vectors per search request
+_MAX_NQ = 1024
+
+
+def _http_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=OLLAMA_HTTP_POOL_SIZE, pool_maxsize=OLLAMA_HTTP_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+class PooledOllamaEmbeddings(OllamaEmbeddings):
+    """OllamaEmbeddings that reuses keep-alive HTTP connections instead of one socket per text.
+
+    Query embeddings are also cached, keyed by model and whitespace-normalized text.
+    """
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model, normalize_query(text))
+        vector = query_embedding_cache.get(key)
+        if vector is MISSING:
+            vector = super().embed_query(text)
+            query_embedding_cache.put(key, vector)
+        return vector
+
+    def _process_emb_response(self, input: str) -> List[float]:
+        headers = {"Content-Type": "application/json", **(self.headers or {})}
+        try:
+            with span("embedding", self.model):
+                res = _http_session().post(
+                    f"{self.base_url}/api/embeddings",
+                    headers=headers,
+                    json={"model": self.model, "prompt": input, "keep_alive": OLLAMA_KEEP_ALIVE, **self._default_params},
+                )
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Error raised by inference endpoint: {e}")
+        if res.status_code != 200:
+            raise ValueError(
+                "Error raised by inference API HTTP code: %s, %s" % (res.status_code, res.text)
+            )
+        try:
+            return res.json()["embedding"]
+        except requests.exceptions.JSONDecodeError as e:
+            raise ValueError(f"Error raised by inference API: {e}.\nResponse: {res.text}")
+
+
+class _StoreEntry:
+    __slots__ = ("store", "checked_at")
+
+    def __init__(self, store: Milvus):
+        self.store = store
+        self.checked_at = time.monotonic()
+
+
+def get_embeddings(model: str = OLLAMA_EMBED_MODEL, base_url: str = OLLAMA_BASE_URL,
+                   provider: str = EMBED_PROVIDER) -> Embeddings:
+    """Embedding client shared by the query and ingest paths; `.model` identifies the vector space."""
+    key = (provider, LOCAL_EMBED_MODEL) if provider == "local" else (model, base_url)
+    emb = _embeddings.get(key)
+    if emb is None:
+        with _lock:
+            emb = _embeddings.get(key)
+            if emb is None:
+                if provider == "local":
+                    emb = LocalEmbeddings(cache=query_embedding_cache)
+                else:
+                    emb = PooledOllamaEmbeddings(model=model, base_url=base_url)
+                _embeddings[key] = emb
+    return emb
+
+
+def _connect(collection_name: str) -> Union[Milvus, LocalVectorStore]:
+    if uses_local_backend(collection_name):
+        return LocalVectorStore(collection_name)
+    # langchain reuses an existing pymilvus alias for the same host/port,
+    # so every collection shares one gRPC channel.
+    store = Milvus(
+        embedding_function=get_embeddings(),
+        collection_name=collection_name,
+        connection_args={"host": MILVUS_HOST, "port": MILVUS_PORT},
+        index_params=INDEX_PARAMS,
+    )
+    store.search_params = search_params_for(store)
+    return store
+
+
+def _is_healthy(store: Milvus) -> bool:
+    if isinstance(store, LocalVectorStore):
+        return True
+    try:
+        utility.get_server_version(using=store.alias)
+        # A store opened before ingestion created the collection must be rebuilt to see it.
+        return store.col is not None or not utility.has_collection(store.collection_name, using=store.alias)
+    except Exception:
+        return False
+
+
+def get_vector_store(collection_name: str) -> Union[Milvus, LocalVectorStore]:
+    entry = _stores.get(collection_name)
+    if entry is not None:
+        now = time.monotonic()
+        if now - entry.checked_at < MILVUS_HEALTHCHECK_INTERVAL:
+            return entry.store
+        if _is_healthy(entry.store):
+            entry.checked_at = now
+            return entry.store
+        invalidate(collection_name, reconnect=True)
+
+    with _lock:
+        entry = _stores.get(collection_name)
+        if entry is None:
+            entry = _StoreEntry(_connect(collection_name))
+            _stores[collection_name] = entry
+    return entry.store
+
+
+def invalidate(collection_name: Optional[str] = None, reconnect: bool = False) -> None:
+    """Forget cached stores; with reconnect=True also drop the shared Milvus connection."""
+    with _lock:
+        names = [collection_name] if collection_name else list(_stores)
+        aliases = set()
+        for name in names:
+            entry = _stores.pop(name, None)
+            if entry is not None and not isinstance(entry.store, LocalVectorStore):
+                aliases.add(entry.store.alias)
+        if reconnect:
+            # Stores on the same alias share the broken channel; drop them too.
+            for name, entry in list(_stores.items()):
+                if getattr(entry.store, "alias", None) in aliases:
+                    _stores.pop(name)
+            for alias in aliases:
+                try:
+                    connections.disconnect(alias)
+                except Exception:
+                    pass
+
+
+def with_vector_store(collection_name: str, fn: Callable[[Milvus], T]) -> T:
+    """Run fn against the cached store, reconnecting and retrying once on failure."""
+    stage = "local_search" if uses_local_backend(collection_name) else "milvus_search"
+    with span(stage, collection_name):
+        try:
+            return fn(get_vector_store(collection_name))
+        except (MilvusException, grpc.RpcError):
+            invalidate(collection_name, reconnect=True)
+            return fn(get_vector_store(collection_name))
+
+
+def search(collection_name: str, query: str, k: int):
+    """similarity_search with the query embedding and the result list both served from cache.
+
+    Results are keyed by the collection's ingest version, so a re-ingest makes them miss.
+    During a chat turn, a query close to one searched earlier in the same conversation gets
+    those results back (see sessions.RetrievalMemory).
+    """
+    version = collection_version(collection_name)
+    key = (collection_name, version, normalize_query(query), k)
+    memory = session_retrievals()
+    docs = search_cache.get(key)
+    if docs is not MISSING and memory is None:
+        return docs
+    # embed outside the store call so embedding and Milvus time are measured separately
+    vector = get_embeddings().embed_query(query)
+    if docs is MISSING:
+        reused = memory.lookup(collection_name, version, vector, k) if memory is not None else None
+        if reused is not None:
+            return reused
+        docs = with_vector_store(collection_name, lambda vs: _search_one(vs, vector, k))
+        search_cache.put(key, docs)
+    if memory is not None:
+        memory.remember(collection_name, version, query, vector, k, docs)
+    return docs
+
+
+def embed_queries(texts: Sequence[str], embed_query: Optional[Callable[[str], List[float]]] = None) -> List[List[float]]:
+    """Embed many queries at once: cached ones are free, the rest go out concurrently on the pooled session
+    (or, with EMBED_PROVIDER=local, meet in the micro-batcher and are encoded together).
+
+    (Ollama's batch /api/embed returns normalized vectors that would not match the
+    stored /api/embeddings ones, so the batch is fanned out instead.)
+    """
+    global _embed_executor
+    if _embed_executor is None:
+        with _lock:
+            if _embed_executor is None:
+                _embed_executor = ThreadPoolExecutor(OLLAMA_HTTP_POOL_SIZE, thread_name_prefix="embed-query")
+    return list(_embed_executor.map(embed_query or get_embeddings().embed_query, texts))
+
+
+def _search_vectors(store: Milvus, vectors: List[List[float]], k: int) -> List[List[Document]]:
+    """One multi-vector Collection.search, parsed the same way as Milvus.similarity_search_by_vector.
+
+    An ids + vectors collection returns only ids, resolved in one docstore lookup for all queries.
+    """
+    if isinstance(store, LocalVectorStore):
+        return store.search_vectors(vectors, k)
+    if store.col is None:
+        return [[] for _ in vectors]
+    in_docstore = payload_in_docstore(store)
+    output_fields = [] if in_docstore else [f for f in store.fields if f != store._vector_field]
+    if in_docstore and vector_dtype(store) == "float16":
+        vectors = [np.asarray(v, dtype=np.float16) for v in vectors]
+    res = store.col.search(
+        data=vectors,
+        anns_field=store._vector_field,
+        param=store.search_params,
+        limit=k,
+        output_fields=output_fields,
+        timeout=store.timeout,
+    )
+    if in_docstore:
+        with span("docstore", store.collection_name):
+            return get_docstore(store.collection_name).documents([[hit.id for hit in hits] for hits in res])
+    return [[store._parse_document({f: hit.entity.get(f) for f in output_fields}) for hit in hits] for hits in res]
+
+
+def _search_one(store: Milvus, vector: List[float], k: int) -> List[Document]:
+    if isinstance(store, Milvus) and payload_in_docstore(store):
+        return _search_vectors(store, [vector], k)[0]
+    return store.similarity_search_by_vector(vector, k=k)
+
+
+def search_many(collection_name: str, queries: Sequence[str], k: int) -> List[List[Document]]:
+    """search() for many queries: cache hits are served directly, the misses are embedded
+    together and sent to Milvus as multi-vector requests. Results line up with `queries`."""
+    version = collection_version(collection_name)
+    keys = [(collection_name, version, normalize_query(q), k) for q in queries]
+    results = [search_cache.get(key) for key in keys]
+    todo: Dict[tuple, str] = {}
+    for key, query, docs in zip(keys, queries, results):
+        if docs is MISSING:
+            todo.setdefault(key, query)
+    if todo:
+        pending = list(todo)
+        vectors = embed_queries([todo[key] for key in pending])
+        found: Dict[tuple, List[Document]] = {}
+        for start in range(0, len(pending), _MAX_NQ):
+            part = vectors[start:start + _MAX_NQ]
+            hits = with_vector_store(collection_name, lambda vs: _search_vectors(vs, part, k))
+            for key, docs in zip(pending[start:start + _MAX_NQ], hits):
+                search_cache.put(key, docs)
+                found[key] = docs
+        results = [found[key] if docs is MISSING else docs for key, docs in zip(keys, results)]
+    return results
@@ -8,6 +8,92 @@ OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://ollama-alan:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 OLLAMA_TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", "0.2"))
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+# 模型在 Ollama 中保持載入的時間 (避免閒置後第一個請求冷啟動)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# 啟動時在背景載入 agent、LLM 與 embedding 模型 (/readyz 於完成後回 200)，失敗時每隔幾秒重試
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "10"))
+
+# Embedding 來源: ollama (HTTP) 或 local (程序內 sentence-transformers，CPU)
+# 查詢與 ingest 共用同一個來源；切換來源或模型後需重新 ingest
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "ollama").lower()
+# 與 Ollama 的 nomic-embed-text 相同權重，維度需等於 EMBED_DIM
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "nomic-ai/nomic-embed-text-v1.5")
+LOCAL_EMBED_TRUST_REMOTE_CODE = os.getenv("LOCAL_EMBED_TRUST_REMOTE_CODE", "true").lower() == "true"
+LOCAL_EMBED_DEVICE = os.getenv("LOCAL_EMBED_DEVICE", "cpu")
+# torch 執行緒數 (0 = torch 預設)
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "0"))
+# 同時進來的查詢在此時間 (毫秒) 內合併成一批，每批最多 LOCAL_EMBED_MAX_BATCH 筆
+LOCAL_EMBED_BATCH_WINDOW_MS = float(os.getenv("LOCAL_EMBED_BATCH_WINDOW_MS", "5"))
+LOCAL_EMBED_MAX_BATCH = int(os.getenv("LOCAL_EMBED_MAX_BATCH", "32"))
+
+# Streaming: 是否預設在 SSE 中附帶 agent 中間步驟 (可用 ?steps=true 覆寫)
+STREAM_AGENT_STEPS = os.getenv("STREAM_AGENT_STEPS", "false").lower() == "true"
+
+# Agent 執行池: 同時執行數、等待佇列長度與逾時 (秒)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "4"))
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "16"))
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "30"))
+AGENT_RUN_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "300"))
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+# 批次推論 (/v1/batch): 同時執行的問題數、每次預先 embedding / 搜尋的問題數
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+# 相同 (模型, 問題, 模式) 的同時請求共用同一次執行 / 串流
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+# Agent 推理過程是否印到 stdout (高負載時建議關閉，改看 /metrics)
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "true").lower() == "true"
+
+# Python_REPL 工具: 在獨立的 worker process 中執行 (數量、每次逾時秒數、記憶體上限 MB、輸出字元上限、
+# 每個 worker 執行幾次後換新)
+PYTHON_POOL_SIZE = int(os.getenv("PYTHON_POOL_SIZE", "2"))
+PYTHON_TIMEOUT = float(os.getenv("PYTHON_TIMEOUT", "10"))
+PYTHON_MEMORY_MB = int(os.getenv("PYTHON_MEMORY_MB", "1024"))
+PYTHON_MAX_OUTPUT = int(os.getenv("PYTHON_MAX_OUTPUT", "4000"))
+PYTHON_MAX_RUNS = int(os.getenv("PYTHON_MAX_RUNS", "50"))
+
+# 查詢路由: 以 embedding 相似度把簡單問題直接送到 LLM / 單次 RAG，其餘才進 agent
+# 最高分低於 ROUTER_MIN_SCORE 或與第二名差距小於 ROUTER_MIN_MARGIN 時交給 agent
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_INTENTS_FILE = os.getenv("ROUTER_INTENTS_FILE")
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.5"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.03"))
+ROUTER_RAG_K = int(os.getenv("ROUTER_RAG_K", "4"))
+
+# 快取: query embedding 與向量搜尋結果 (LRU + TTL 秒)，以及語意相近問題的答案快取
+CACHE_EMBED_SIZE = int(os.getenv("CACHE_EMBED_SIZE", "2048"))
+CACHE_EMBED_TTL = float(os.getenv("CACHE_EMBED_TTL", "3600"))
+CACHE_SEARCH_SIZE = int(os.getenv("CACHE_SEARCH_SIZE", "1024"))
+CACHE_SEARCH_TTL = float(os.getenv("CACHE_SEARCH_TTL", "600"))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "1800"))
+# 問題 embedding 的 cosine 相似度需達此值才重用答案 (問題中的數字與專有名詞也必須相同)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# 多輪對話: 以 messages 歷史辨識同一段對話 (不需要 session id)，保留最多 SESSION_MAX 段、閒置 SESSION_TTL 秒後移除
+# 歷史依 SESSION_HISTORY_TOKENS 截斷；SESSION_SUMMARY=true 時移出視窗的舊對話以一次 LLM 呼叫摘要並沿用
+SESSION_ENABLED = os.getenv("SESSION_ENABLED", "true").lower() == "true"
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1000"))
+SESSION_SUMMARY = os.getenv("SESSION_SUMMARY", "false").lower() == "true"
+# 同一段對話中 query embedding 相似度達此值時重用先前檢索到的 chunk (每段對話保留最近幾次檢索)
+SESSION_REUSE_THRESHOLD = float(os.getenv("SESSION_REUSE_THRESHOLD", "0.92"))
+SESSION_MAX_RETRIEVALS = int(os.getenv("SESSION_MAX_RETRIEVALS", "8"))
+# 直接回答的後續問題帶上一輪 Ollama 回傳的 context tokens，只需 prefill 新問題；超過此長度改用文字歷史
+SESSION_LLM_CONTEXT_TOKENS = int(os.getenv("SESSION_LLM_CONTEXT_TOKENS", "4096"))
+# 每隔幾秒檢查 ingest 是否更新了 collection (版本檔位於 INGEST_STATE_DIR/versions)
+CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("CACHE_VERSION_CHECK_INTERVAL", "5"))
+
+# 檢索內容組裝: 同一來源重疊的 chunk 會合併、近似重複的會去除，再依排名填入 token 預算
+# 工具 (LabPaperSearch / MSSQLVectorSearch / SearchAll) 每次取 CONTEXT_TOOL_K 筆，輸出上限 CONTEXT_TOOL_TOKENS
+CONTEXT_TOOL_K = int(os.getenv("CONTEXT_TOOL_K", "5"))
+CONTEXT_TOOL_TOKENS = int(os.getenv("CONTEXT_TOOL_TOKENS", "400"))
+# 路由後單次 RAG 回答的 context 上限
+CONTEXT_RAG_TOKENS = int(os.getenv("CONTEXT_RAG_TOKENS", "1200"))
+# 詞三元組重疊比例達此值視為重複；合併時重疊至少要有幾個字元
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+CONTEXT_MIN_OVERLAP = int(os.getenv("CONTEXT_MIN_OVERLAP", "40"))
 
 # Milvus
 MILVUS_URI = os.getenv("MILVUS_URI", "tcp://milvus-standalone-alan:19530")
@@ -16,6 +102,32 @@ MILVUS_USER    = os.getenv("MILVUS_USER", "root")
 MILVUS_PASS    = os.getenv("MILVUS_PASS")
 MILVUS_HOST = os.getenv("MILVUS_HOST", "milvus-standalone-alan")
 MILVUS_PORT = os.getenv("MILVUS_PORT", "19530")
+# 已快取的 vector store 每隔幾秒做一次健康檢查
+MILVUS_HEALTHCHECK_INTERVAL = float(os.getenv("MILVUS_HEALTHCHECK_INTERVAL", "30"))
+OLLAMA_HTTP_POOL_SIZE = int(os.getenv("OLLAMA_HTTP_POOL_SIZE", "16"))
+# 向量後端: milvus 或 local (NumPy memmap，精確 cosine 搜尋，不需要 Milvus / MinIO / etcd)
+# VECTOR_LOCAL_COLLECTIONS 可只讓部分小 collection (如 sql_collection) 使用 local
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "milvus").lower()
+VECTOR_LOCAL_COLLECTIONS = [c.strip() for c in os.getenv("VECTOR_LOCAL_COLLECTIONS", "").split(",") if c.strip()]
+VECTOR_LOCAL_DIR = os.getenv("VECTOR_LOCAL_DIR", "data/vectors")
+# 新建 local collection 的向量格式: float32 或 float16 (省一半空間)
+VECTOR_LOCAL_DTYPE = os.getenv("VECTOR_LOCAL_DTYPE", "float32")
+# 向量索引: FLAT / IVF_FLAT / IVF_SQ8 / IVF_PQ / HNSW、距離 (L2 / IP / COSINE)
+# 建索引參數與查詢參數為 JSON，未設定時依索引類型使用預設值 (見 src/chains/milvus_index.py)
+# ingest 發現現有索引與設定不同時會重建索引；查詢端使用同一組設定
+MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "HNSW").upper()
+MILVUS_METRIC_TYPE = os.getenv("MILVUS_METRIC_TYPE", "L2").upper()
+MILVUS_INDEX_PARAMS = os.getenv("MILVUS_INDEX_PARAMS")
+MILVUS_SEARCH_PARAMS = os.getenv("MILVUS_SEARCH_PARAMS")
+# Milvus collection 內容: inline (全部存在 Milvus，預設) 或 docstore (只存 id 與向量，文字 / metadata 存在 DOCSTORE_DIR 的 SQLite)
+# 新建 collection 的向量格式: float32 或 float16 (只適用 docstore)；ingest 發現現有 collection 與設定不同時會重建一次
+# (重建期間檢索結果不完整，所以 docstore 需要明確開啟)
+MILVUS_PAYLOAD = os.getenv("MILVUS_PAYLOAD", "inline").lower()
+MILVUS_VECTOR_DTYPE = os.getenv("MILVUS_VECTOR_DTYPE", "float32").lower()
+DOCSTORE_DIR = os.getenv("DOCSTORE_DIR", "data/docstore")
+# Partition key 欄位 (依來源分區)，只在建立 collection 時生效；設為空字串停用
+PDF_PARTITION_KEY = os.getenv("PDF_PARTITION_KEY", "source")
+SQL_PARTITION_KEY = os.getenv("SQL_PARTITION_KEY", "table")
 
 # MSSQL
 MSSQL_SERVER  = os.getenv("MSSQL_SERVER", "140.118.115.196")
@@ -23,9 +135,38 @@ MSSQL_DATABASE = os.getenv("MSSQL_DATABASE", "Northwind")
 MSSQL_USER    = os.getenv("MSSQL_USER", "llm")
 MSSQL_PASSWORD = os.getenv("MSSQL_PASSWORD", "1qaz2WSX")
 MSSQL_CHARSET = os.getenv("MSSQL_CHARSET", "utf8")
+# SQL ingest: 資料表設定檔 (JSON, 未設定時只匯入 Products)、每次 fetchmany 筆數
+SQL_INGEST_TABLES_FILE = os.getenv("SQL_INGEST_TABLES_FILE")
+SQL_FETCH_SIZE = int(os.getenv("SQL_FETCH_SIZE", "1000"))
+# SQLSchema / SQLQuery 工具: 連線池大小、查詢逾時 (秒)、回傳列數 / 位元組上限、schema 快取秒數
+# SQL_DATABASE_URL 可覆寫預設的 mssql+pyodbc 連線 (SQLAlchemy URL)
+SQL_DATABASE_URL = os.getenv("SQL_DATABASE_URL")
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "5"))
+SQL_QUERY_TIMEOUT = int(os.getenv("SQL_QUERY_TIMEOUT", "15"))
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "50"))
+SQL_MAX_RESULT_BYTES = int(os.getenv("SQL_MAX_RESULT_BYTES", "4000"))
+SQL_SCHEMA_TTL = float(os.getenv("SQL_SCHEMA_TTL", "3600"))
 
 # PDF 
 PDF_DIRECTORY_PATH = os.getenv("PDF_DIRECTORY_PATH", "data/pdf")
+# Ingest 狀態 (manifest / checkpoint) 存放位置
+INGEST_STATE_DIR = os.getenv("INGEST_STATE_DIR", "data/ingest")
+PDF_MANIFEST_PATH = os.getenv("PDF_MANIFEST_PATH", os.path.join(INGEST_STATE_DIR, "pdf_manifest.json"))
+SQL_INGEST_STATE_PATH = os.getenv("SQL_INGEST_STATE_PATH", os.path.join(INGEST_STATE_DIR, "sql_state.json"))
+PDF_CHUNK_SIZE = int(os.getenv("PDF_CHUNK_SIZE", "1000"))
+PDF_CHUNK_OVERLAP = int(os.getenv("PDF_CHUNK_OVERLAP", "200"))
+# Ingest pipeline: 解析 process 數、各階段批次大小、階段間佇列長度
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 2)))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "256"))
+INGEST_INSERT_BATCH = int(os.getenv("INGEST_INSERT_BATCH", "500"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "256"))
+# Embedding 階段: 同時請求數 (起始值與依延遲自動調整的範圍)、每次呼叫的文字數、單一請求的目標延遲 (秒)、失敗重試次數
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+INGEST_EMBED_MIN_CONCURRENCY = int(os.getenv("INGEST_EMBED_MIN_CONCURRENCY", "1"))
+INGEST_EMBED_MAX_CONCURRENCY = int(os.getenv("INGEST_EMBED_MAX_CONCURRENCY", "16"))
+INGEST_EMBED_REQUEST_BATCH = int(os.getenv("INGEST_EMBED_REQUEST_BATCH", "16"))
+INGEST_EMBED_TARGET_LATENCY = float(os.getenv("INGEST_EMBED_TARGET_LATENCY", "0.5"))
+INGEST_EMBED_MAX_RETRIES = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "5"))
 # Collection 
 PDF_COLLECTION_NAME = os.getenv("PDF_COLLECTION_NAME", "pdf_collection")
 SQL_COLLECTION_NAME = os.getenv("SQL_COLLECTION_NAME", "sql_collection")
\ No newline at end of file
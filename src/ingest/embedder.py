@@ -0,0 +1,213 @@
+# embedder.py
+# Concurrent embedding for ingestion: the number of requests in flight is tuned from observed
+# latency, with per-batch retry with backoff and an on-disk checkpoint of finished vectors.
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.config import (
+    INGEST_STATE_DIR, INGEST_EMBED_CONCURRENCY, INGEST_EMBED_MIN_CONCURRENCY, INGEST_EMBED_MAX_CONCURRENCY,
+    INGEST_EMBED_REQUEST_BATCH, INGEST_EMBED_TARGET_LATENCY, INGEST_EMBED_MAX_RETRIES,
+)
+from src.chains.vector_registry import get_embeddings
+from src.ingest.pipeline import Chunk
+
+EmbedTexts = Callable[[List[str]], List[List[float]]]
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCheckpoint:
+    """chunk id -> vector for chunks embedded but not yet committed, so a crashed run does not re-embed them."""
+
+    def __init__(self, path: str, model: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (id TEXT PRIMARY KEY, digest TEXT, vec BLOB)")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+        if row is None or row[0] != model:
+            # Vectors from another embedding model are useless.
+            self._db.execute("DELETE FROM vectors")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('model', ?)", (model,))
+        self._db.commit()
+
+    def get_many(self, chunks: Sequence[Chunk]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(chunks), 500):
+                part = {c.id: _digest(c.text) for c in chunks[i:i + 500]}
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(f"SELECT id, digest, vec FROM vectors WHERE id IN ({marks})", list(part))
+                for cid, digest, blob in rows:
+                    # A row whose text changed since it was checkpointed must be re-embedded.
+                    if part[cid] == digest:
+                        found[cid] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, chunks: Sequence[Chunk], vectors: Sequence[List[float]]) -> None:
+        rows = [(c.id, _digest(c.text), array("f", vec).tobytes()) for c, vec in zip(chunks, vectors)]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)", rows)
+            self._db.commit()
+
+    def discard(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM vectors WHERE id = ?", [(cid,) for cid in ids])
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM vectors")
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class ConcurrentEmbedder:
+    """Embeds `batch_size` texts per call with an adaptive number of calls in flight.
+
+    OllamaEmbeddings.embed_documents sends one HTTP request per text, one after another, so a
+    call's latency divided by its size is the latency of one request, and the calls in flight
+    are the requests Ollama is serving at once. That number is what AIMD tunes; the batch is
+    only the unit of retry and checkpointing.
+    """
+
+    def __init__(
+        self,
+        embed_texts: EmbedTexts,
+        concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        batch_size: int = 16,
+        target_latency: float = 0.5,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        checkpoint: Optional[EmbeddingCheckpoint] = None,
+    ):
+        self.embed_texts = embed_texts
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = max(min_concurrency, min(max_concurrency, concurrency))
+        self.batch_size = batch_size
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.checkpoint = checkpoint
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.resumed = 0
+        self.requests = 0
+        self.retries = 0
+        self.busy = 0.0
+
+    def _adapt(self, latency: Optional[float]) -> None:
+        # AIMD on requests in flight: one more while requests come back well under target,
+        # halve on slow or failed batches (a saturated Ollama queues requests, so latency grows).
+        with self._lock:
+            if latency is None or latency > self.target_latency:
+                self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+            elif latency < self.target_latency / 2:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            t0 = time.perf_counter()
+            try:
+                vectors = self.embed_texts(texts)
+            except Exception:
+                with self._lock:
+                    self.requests += 1
+                self._adapt(None)
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+                continue
+            latency = (time.perf_counter() - t0) / max(1, len(texts))
+            with self._lock:
+                self.requests += 1
+            self._adapt(latency)
+            return vectors
+
+    def embed_chunks(self, chunks: List[Chunk]) -> List[List[float]]:
+        """Embed chunks in order; only batches that failed are retried, finished ones are checkpointed."""
+        t0 = time.perf_counter()
+        result: List[Optional[List[float]]] = [None] * len(chunks)
+        todo = list(range(len(chunks)))
+        if self.checkpoint is not None:
+            cached = self.checkpoint.get_many(chunks)
+            if cached:
+                todo = []
+                for k, c in enumerate(chunks):
+                    if c.id in cached:
+                        result[k] = cached[c.id]
+                    else:
+                        todo.append(k)
+                self.resumed += len(chunks) - len(todo)
+
+        in_flight = {}
+        pos = 0
+        while pos < len(todo) or in_flight:
+            while pos < len(todo) and len(in_flight) < self.concurrency:
+                idx = todo[pos:pos + self.batch_size]
+                pos += len(idx)
+                in_flight[self._pool.submit(self._embed_with_retry, [chunks[k].text for k in idx])] = idx
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx = in_flight.pop(fut)
+                vectors = fut.result()
+                for k, vec in zip(idx, vectors):
+                    result[k] = vec
+                if self.checkpoint is not None:
+                    self.checkpoint.put_many([chunks[k] for k in idx], vectors)
+        self.chunks += len(chunks)
+        self.busy += time.perf_counter() - t0
+        return result
+
+    def report(self) -> str:
+        # busy time only: the stage also waits on parsing, which says nothing about the Ollama box
+        rate = self.chunks / self.busy if self.busy > 0 else 0.0
+        return (f"[統計] embedding: {self.chunks} chunks ({self.resumed} 來自 checkpoint), "
+                f"{rate:.1f} chunks/s, {self.requests} 次請求, {self.retries} 次重試, "
+                f"batch={self.batch_size}, 最終 concurrency={self.concurrency}")
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+
+
+def build_embedder(checkpoint_name: str) -> ConcurrentEmbedder:
+    """Embedder used by the ingest scripts, checkpointing into INGEST_STATE_DIR/<name>.embed.sqlite."""
+    os.makedirs(INGEST_STATE_DIR, exist_ok=True)
+    # same provider as the query side (EMBED_PROVIDER), so stored and query vectors share one space
+    embeddings = get_embeddings()
+    checkpoint = EmbeddingCheckpoint(
+        os.path.join(INGEST_STATE_DIR, f"{checkpoint_name}.embed.sqlite"), embeddings.model
+    )
+    return ConcurrentEmbedder(
+        embeddings.embed_documents,
+        concurrency=INGEST_EMBED_CONCURRENCY,
+        min_concurrency=INGEST_EMBED_MIN_CONCURRENCY,
+        max_concurrency=INGEST_EMBED_MAX_CONCURRENCY,
+        batch_size=INGEST_EMBED_REQUEST_BATCH,
+        target_latency=INGEST_EMBED_TARGET_LATENCY,
+        max_retries=INGEST_EMBED_MAX_RETRIES,
+        checkpoint=checkpoint,
+    )
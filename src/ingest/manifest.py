@@ -0,0 +1,74 @@
+# manifest.py
+# Persistent record of what has been ingested: file content hash -> chunk ids in the vector store.
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_ids_for(path: str, sha256: str, count: int) -> List[str]:
+    # Ids are derived from path + content, so re-parsing an unchanged file yields the same ids
+    # and two copies of one PDF never collide.
+    prefix = hashlib.sha1(f"{path}:{sha256}".encode("utf-8")).hexdigest()[:20]
+    return [f"{prefix}-{i:05d}" for i in range(count)]
+
+
+class Manifest:
+    """JSON manifest keyed by file path: {"sha256", "size", "mtime", "chunk_ids"}."""
+
+    def __init__(self, path: str, collection: str, files: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.collection = collection
+        self.files: Dict[str, dict] = files or {}
+
+    @classmethod
+    def load(cls, path: str, collection: str) -> "Manifest":
+        if not os.path.exists(path):
+            return cls(path, collection)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("collection") != collection:
+            # The manifest describes a different collection; start over.
+            return cls(path, collection)
+        return cls(path, collection, data.get("files", {}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection, "files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def changed_sha256(self, path: str) -> Optional[str]:
+        """The file's current sha256 if it is new or changed since it was recorded, else None.
+
+        size+mtime are checked first so a no-op run does not have to hash every file.
+        """
+        entry = self.files.get(path)
+        st = os.stat(path)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return None
+        sha = file_sha256(path)
+        if entry and entry["sha256"] == sha:
+            entry["size"], entry["mtime"] = st.st_size, st.st_mtime
+            return None
+        return sha
+
+    def record(self, path: str, sha256: str, chunk_ids: List[str]) -> None:
+        st = os.stat(path)
+        self.files[path] = {"sha256": sha256, "size": st.st_size, "mtime": st.st_mtime, "chunk_ids": chunk_ids}
+
+    def forget(self, path: str) -> List[str]:
+        return self.files.pop(path, {}).get("chunk_ids", [])
+
+    def all_chunk_ids(self) -> List[str]:
+        return [cid for entry in self.files.values() for cid in entry["chunk_ids"]]
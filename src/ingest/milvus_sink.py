@@ -0,0 +1,122 @@
+# milvus_sink.py
+# Write already-embedded batches into a LangChain-compatible Milvus collection
+# (or the local memmap store for collections on VECTOR_BACKEND=local). With
+# MILVUS_PAYLOAD=docstore the collection holds only ids and vectors, and text / metadata go
+# to the SQLite docstore.
+
+from typing import List, Union
+
+import numpy as np
+from langchain_community.vectorstores import Milvus
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema
+
+from src.config import MILVUS_HOST, MILVUS_PORT, MILVUS_PAYLOAD, MILVUS_VECTOR_DTYPE
+from src.chains.docstore import get_docstore
+from src.chains.local_store import LocalVectorStore, uses_local_backend
+from src.chains.milvus_index import INDEX_PARAMS, SEARCH_PARAMS, partition_key, payload_in_docstore, vector_dtype
+from src.chains.vector_registry import get_embeddings
+from src.ingest.pipeline import Embedded
+
+
+def open_store(collection_name: str, drop_old: bool = False) -> Union[Milvus, LocalVectorStore]:
+    if uses_local_backend(collection_name):
+        return LocalVectorStore(collection_name, drop_old=drop_old)
+    if drop_old:
+        get_docstore(collection_name).drop()
+    return Milvus(
+        embedding_function=get_embeddings(),
+        collection_name=collection_name,
+        connection_args={"host": MILVUS_HOST, "port": MILVUS_PORT},
+        auto_id=False,
+        drop_old=drop_old,
+        index_params=INDEX_PARAMS,
+        search_params=SEARCH_PARAMS,
+        partition_key_field=partition_key(collection_name),
+    )
+
+
+def collection_exists(store) -> bool:
+    if isinstance(store, LocalVectorStore):
+        return store.exists()
+    return store.col is not None
+
+
+def has_string_ids(store) -> bool:
+    """Collections written by the old drop-and-rebuild scripts use auto_id INT64 keys."""
+    if isinstance(store, LocalVectorStore):
+        return True
+    return store.col is not None and store.col.schema.primary_field.dtype == DataType.VARCHAR
+
+
+def layout_matches(store) -> bool:
+    """False when an existing collection is not laid out as MILVUS_PAYLOAD / MILVUS_VECTOR_DTYPE ask,
+    or its docstore was lost; either way it has to be rebuilt."""
+    if isinstance(store, LocalVectorStore) or store.col is None:
+        return True
+    if payload_in_docstore(store) != (MILVUS_PAYLOAD == "docstore"):
+        return False
+    if not payload_in_docstore(store):
+        return True
+    if vector_dtype(store) != MILVUS_VECTOR_DTYPE:
+        return False
+    return len(get_docstore(store.collection_name)) > 0 or store.col.num_entities == 0
+
+
+def _create_vector_collection(store: Milvus, dim: int) -> None:
+    """pk + vector (+ the partition key, which needs to be a field) instead of Milvus._create_collection's
+    one field per metadata key plus the text."""
+    dtype = DataType.FLOAT16_VECTOR if MILVUS_VECTOR_DTYPE == "float16" else DataType.FLOAT_VECTOR
+    fields = [
+        FieldSchema(store._primary_field, DataType.VARCHAR, is_primary=True, auto_id=False, max_length=65_535),
+        FieldSchema(store._vector_field, dtype, dim=dim),
+    ]
+    if store._partition_key_field:
+        fields.append(FieldSchema(store._partition_key_field, DataType.VARCHAR, max_length=65_535))
+    schema = CollectionSchema(fields, partition_key_field=store._partition_key_field)
+    store.col = Collection(name=store.collection_name, schema=schema, consistency_level=store.consistency_level,
+                           using=store.alias)
+    store._init(partition_names=store.partition_names, replica_number=store.replica_number, timeout=store.timeout)
+
+
+def upsert_embedded(store, batch: Embedded) -> None:
+    """Same column layout as Milvus.add_texts, but with precomputed vectors and idempotent upserts."""
+    if not batch.ids:
+        return
+    if isinstance(store, LocalVectorStore):
+        store.upsert(batch.ids, batch.texts, batch.vectors, batch.metadatas)
+        return
+    if not isinstance(store.col, Collection):
+        if MILVUS_PAYLOAD == "docstore":
+            _create_vector_collection(store, len(batch.vectors[0]))
+        else:
+            store._init(
+                embeddings=batch.vectors,
+                metadatas=batch.metadatas,
+                partition_names=store.partition_names,
+                replica_number=store.replica_number,
+                timeout=store.timeout,
+            )
+    columns = {store._primary_field: batch.ids, store._vector_field: batch.vectors}
+    if payload_in_docstore(store):
+        # written before the vectors, so a search never returns an id the docstore does not know
+        get_docstore(store.collection_name).upsert(batch.ids, batch.texts, batch.metadatas)
+        if vector_dtype(store) == "float16":
+            columns[store._vector_field] = [np.asarray(v, dtype=np.float16) for v in batch.vectors]
+    else:
+        columns[store._text_field] = batch.texts
+    data = []
+    for field in store.fields:
+        if field not in columns:
+            columns[field] = [m.get(field) for m in batch.metadatas]
+        data.append(columns[field])
+    store.col.upsert(data, timeout=store.timeout)
+
+
+def delete_ids(store, ids: List[str]) -> None:
+    if isinstance(store, LocalVectorStore):
+        store.delete(ids)
+        return
+    if ids and store.col is not None:
+        store.delete(ids=ids)
+        if payload_in_docstore(store):
+            get_docstore(store.collection_name).delete(ids)
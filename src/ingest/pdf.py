@@ -0,0 +1,90 @@
+# pdf.py
+# PDF parsing / splitting, importable so it can run inside a process pool.
+
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain.schema.document import Document
+
+from src.config import PDF_CHUNK_SIZE, PDF_CHUNK_OVERLAP
+from src.ingest.manifest import chunk_ids_for
+from src.ingest.pipeline import Chunk, Commit, Item
+
+# Milvus 的欄位由第一筆資料決定，增量寫入時每份 PDF 的 metadata 必須一致
+PDF_METADATA_DEFAULTS = {"source": "", "page": 0, "page_label": "", "title": "", "author": "", "total_pages": 0}
+
+
+def sanitize_metadata_keys(doc: Document) -> Document:
+    if not doc.metadata:
+        return doc
+    new_meta = {}
+    for k, v in doc.metadata.items():
+        new_key = re.sub(r'[^a-zA-Z0-9_]', '_', k)
+        new_meta[new_key] = v
+    return Document(page_content=doc.page_content, metadata=new_meta)
+
+
+def project_metadata(doc: Document) -> Document:
+    meta = doc.metadata or {}
+    new_meta = {}
+    for key, default in PDF_METADATA_DEFAULTS.items():
+        value = meta.get(key, default)
+        try:
+            new_meta[key] = type(default)(value) if value is not None else default
+        except (TypeError, ValueError):
+            new_meta[key] = default
+    return Document(page_content=doc.page_content, metadata=new_meta)
+
+
+def process_pdf(pdf_file: str) -> Optional[List[Document]]:
+    print(f" -> 正在處理檔案: {pdf_file}")
+    try:
+        loader = PyPDFLoader(pdf_file)
+        documents = loader.load()
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=PDF_CHUNK_SIZE, chunk_overlap=PDF_CHUNK_OVERLAP)
+        split_docs = text_splitter.split_documents(documents)
+        print(f"    -> 已切割成 {len(split_docs)} 個文件區塊。")
+        return [project_metadata(sanitize_metadata_keys(d)) for d in split_docs]
+    except Exception as e:
+        print(f"    ❌ [錯誤] 處理檔案 {pdf_file} 時失敗: {e}")
+        return None
+
+
+def iter_pdf_items(
+    changed: List[Tuple[str, str]],
+    finalize: Callable[[str, str, List[str]], None],
+    failed: List[str],
+    workers: int,
+) -> Iterator[Item]:
+    """Parse (path, sha256) pairs in a process pool and yield their chunks, one Commit per file.
+
+    At most 2 * workers files are in flight, so parsed-but-unconsumed text stays bounded.
+    """
+    todo = iter(changed)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def submit_next():
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending[pool.submit(process_pdf, nxt[0])] = nxt
+
+        for _ in range(2 * workers):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                path, sha = pending.pop(fut)
+                submit_next()
+                docs = fut.result()
+                if docs is None:
+                    failed.append(path)
+                    continue
+                ids = chunk_ids_for(path, sha, len(docs))
+                for cid, doc in zip(ids, docs):
+                    yield Chunk(cid, doc.page_content, doc.metadata)
+                yield Commit(partial(finalize, path, sha, ids))
@@ -0,0 +1,255 @@
+# pipeline.py
+# Staged ingest: source (parse/split) -> embed -> insert, joined by bounded queues so all
+# stages run at the same time and memory stays flat no matter how large the corpus is.
+
+import queue
+import resource
+import threading
+import time
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+
+class Chunk(NamedTuple):
+    id: str
+    text: str
+    metadata: dict
+
+
+class Commit(NamedTuple):
+    """Marker placed after the chunks of one unit (e.g. one PDF).
+
+    `callback` runs on the insert stage once every chunk before it has been written,
+    which is where manifests / checkpoints are updated.
+    """
+    callback: Callable[[], None]
+
+
+class Embedded(NamedTuple):
+    ids: List[str]
+    texts: List[str]
+    vectors: List[List[float]]
+    metadatas: List[dict]
+
+
+Item = Union[Chunk, Commit]
+EmbedFn = Callable[[List[Chunk]], List[List[float]]]
+InsertFn = Callable[[Embedded], None]
+
+_END = object()
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+
+    def row(self) -> str:
+        rate = self.items / self.busy if self.busy > 0 else 0.0
+        return (f"{self.name:<8} items={self.items:<7} batches={self.batches:<5} busy={self.busy:7.2f}s "
+                f"({rate:8.1f}/s) wait_in={self.wait_in:7.2f}s wait_out={self.wait_out:7.2f}s")
+
+
+class PipelineError(Exception):
+    pass
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _Stage(threading.Thread):
+    def __init__(self, name: str, inbox: "queue.Queue", stop: threading.Event):
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self.stats = StageStats(name)
+        self.inbox = inbox
+        self.stop = stop
+        self.error: Optional[BaseException] = None
+
+    def get(self):
+        t0 = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return self.inbox.get(timeout=0.2)
+                except queue.Empty:
+                    if self.stop.is_set():
+                        raise _Stopped()
+        finally:
+            self.stats.wait_in += time.perf_counter() - t0
+
+    def run(self):
+        try:
+            self.work()
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+
+    def work(self):
+        raise NotImplementedError
+
+
+def _put(q: "queue.Queue", item, stop: threading.Event, stats: StageStats) -> None:
+    t0 = time.perf_counter()
+    try:
+        while True:
+            try:
+                q.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    raise _Stopped()
+    finally:
+        stats.wait_out += time.perf_counter() - t0
+
+
+class _EmbedStage(_Stage):
+    def __init__(self, inbox, outbox, stop, embed_fn: EmbedFn, batch_size: int):
+        super().__init__("embed", inbox, stop)
+        self.outbox = outbox
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+
+    def emit(self, run: List[Chunk], vectors: List[List[float]]) -> None:
+        if run:
+            batch = Embedded([c.id for c in run], [c.text for c in run], vectors, [c.metadata for c in run])
+            _put(self.outbox, batch, self.stop, self.stats)
+
+    def flush(self, pending: List[Item]) -> None:
+        """Embed every chunk in `pending` at once, then forward chunks and Commits in their original order."""
+        chunks = [item for item in pending if isinstance(item, Chunk)]
+        vectors: List[List[float]] = []
+        if chunks:
+            t0 = time.perf_counter()
+            vectors = self.embed_fn(chunks)
+            self.stats.busy += time.perf_counter() - t0
+            self.stats.items += len(chunks)
+            self.stats.batches += 1
+        start = 0
+        run: List[Chunk] = []
+        for item in pending:
+            if isinstance(item, Chunk):
+                run.append(item)
+                continue
+            self.emit(run, vectors[start:start + len(run)])
+            start += len(run)
+            run = []
+            _put(self.outbox, item, self.stop, self.stats)
+        self.emit(run, vectors[start:])
+        pending.clear()
+
+    def work(self):
+        # Commits do not force a flush, so small files still fill whole embedding batches.
+        pending: List[Item] = []
+        count = 0
+        while True:
+            item = self.get()
+            if item is _END:
+                self.flush(pending)
+                _put(self.outbox, _END, self.stop, self.stats)
+                return
+            pending.append(item)
+            if isinstance(item, Chunk):
+                count += 1
+                if count >= self.batch_size:
+                    self.flush(pending)
+                    count = 0
+
+
+class _InsertStage(_Stage):
+    def __init__(self, inbox, stop, insert_fn: InsertFn, batch_size: int):
+        super().__init__("insert", inbox, stop)
+        self.insert_fn = insert_fn
+        self.batch_size = batch_size
+
+    def flush(self, pending: Embedded) -> None:
+        if not pending.ids:
+            return
+        t0 = time.perf_counter()
+        for i in range(0, len(pending.ids), self.batch_size):
+            j = i + self.batch_size
+            self.insert_fn(Embedded(pending.ids[i:j], pending.texts[i:j], pending.vectors[i:j], pending.metadatas[i:j]))
+            self.stats.batches += 1
+        self.stats.busy += time.perf_counter() - t0
+        self.stats.items += len(pending.ids)
+        for part in pending:
+            part.clear()
+
+    def work(self):
+        pending = Embedded([], [], [], [])
+        while True:
+            item = self.get()
+            if item is _END:
+                self.flush(pending)
+                return
+            if isinstance(item, Commit):
+                self.flush(pending)
+                item.callback()
+                continue
+            for mine, theirs in zip(pending, item):
+                mine.extend(theirs)
+            if len(pending.ids) >= self.batch_size:
+                self.flush(pending)
+
+
+def run_pipeline(
+    source: Iterable[Item],
+    embed_fn: EmbedFn,
+    insert_fn: InsertFn,
+    embed_batch: int,
+    insert_batch: int,
+    queue_size: int,
+    source_name: str = "parse",
+) -> List[StageStats]:
+    """Drive source -> embed -> insert; raises PipelineError if any stage fails."""
+    stop = threading.Event()
+    to_embed: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    to_insert: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    embed = _EmbedStage(to_embed, to_insert, stop, embed_fn, embed_batch)
+    insert = _InsertStage(to_insert, stop, insert_fn, insert_batch)
+    embed.start()
+    insert.start()
+
+    src_stats = StageStats(source_name)
+    error: Optional[BaseException] = None
+    it = iter(source)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            item = next(it, _END)
+            src_stats.busy += time.perf_counter() - t0
+            if item is not _END and isinstance(item, Chunk):
+                src_stats.items += 1
+            _put(to_embed, item, stop, src_stats)
+            if item is _END:
+                break
+    except _Stopped:
+        pass
+    except BaseException as e:
+        error = e
+        stop.set()
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None and error is not None:
+            close()
+
+    embed.join()
+    insert.join()
+    error = error or embed.error or insert.error
+    if error is not None:
+        raise PipelineError(f"ingest pipeline failed: {error}") from error
+    return [src_stats, embed.stats, insert.stats]
+
+
+def format_report(stats: Sequence[StageStats], wall: float) -> str:
+    lines = ["[統計] 各階段吞吐量:"]
+    lines += ["  " + s.row() for s in stats]
+    # ru_maxrss 在 Linux 上以 KB 計
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    lines.append(f"  wall={wall:.2f}s peak_rss={peak_mb:.0f}MB")
+    return "\n".join(lines)
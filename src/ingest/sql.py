@@ -0,0 +1,217 @@
+# sql.py
+# Table-driven SQL ingestion: stream rows with fetchmany, render them through a per-table
+# template and emit pipeline Chunks. Re-runs only touch rows past a watermark (rowversion /
+# modified date) or, for tables without one, rows whose rendered text changed.
+
+import hashlib
+import json
+import os
+from datetime import date, datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from src.ingest.pipeline import Chunk, Commit, Item
+
+
+class TableSpec(NamedTuple):
+    name: str
+    key: str
+    columns: List[str]
+    template: str
+    # Increasing column (e.g. rowversion, modified date; ties are broken by key); None falls back to comparing row hashes.
+    watermark: Optional[str] = None
+    where: Optional[str] = None
+
+
+DEFAULT_TABLES = [
+    TableSpec(
+        name="Products",
+        key="ProductID",
+        columns=["ProductID", "ProductName", "SupplierID", "CategoryID", "QuantityPerUnit", "UnitPrice", "UnitsInStock"],
+        template=(
+            "Product Name: {ProductName}\n"
+            "Supplier ID: {SupplierID}\n"
+            "Category ID: {CategoryID}\n"
+            "Quantity Per Unit: {QuantityPerUnit}\n"
+            "Unit Price: {UnitPrice}\n"
+            "Units In Stock: {UnitsInStock}"
+        ),
+    ),
+]
+
+
+def load_table_specs(path: Optional[str]) -> List[TableSpec]:
+    """Read a JSON list of table specs; without a file the Products table is ingested as before."""
+    if not path:
+        return DEFAULT_TABLES
+    with open(path, "r", encoding="utf-8") as f:
+        return [TableSpec(**spec) for spec in json.load(f)]
+
+
+def _dump_watermark(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return {"bytes": bytes(value).hex()}
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"date": value.isoformat()}
+    return value
+
+
+def _load_watermark(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "bytes" in value:
+            return bytes.fromhex(value["bytes"])
+        if "datetime" in value:
+            return datetime.fromisoformat(value["datetime"])
+        if "date" in value:
+            return date.fromisoformat(value["date"])
+    return value
+
+
+class SqlIngestState:
+    """Per-table progress: {"watermark": ..., "key": ...} or {"hashes": {key: sha1}}."""
+
+    def __init__(self, path: str, collection: str, tables: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.collection = collection
+        self.tables: Dict[str, dict] = tables or {}
+
+    @classmethod
+    def load(cls, path: str, collection: str) -> "SqlIngestState":
+        if not os.path.exists(path):
+            return cls(path, collection)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("collection") != collection:
+            return cls(path, collection)
+        return cls(path, collection, data.get("tables", {}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection, "tables": self.tables}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def watermark(self, table: str) -> Any:
+        return _load_watermark(self.tables.get(table, {}).get("watermark"))
+
+    def watermark_key(self, table: str) -> Any:
+        """Key of the last committed row at the watermark; None for state saved before keys were stored."""
+        return _load_watermark(self.tables.get(table, {}).get("key"))
+
+    def advance(self, table: str, value: Any, key: Any = None) -> None:
+        self.tables.setdefault(table, {}).update(watermark=_dump_watermark(value), key=_dump_watermark(key))
+        self.save()
+
+    def hashes(self, table: str) -> Dict[str, str]:
+        return self.tables.get(table, {}).get("hashes", {})
+
+    def update_hashes(self, table: str, changed: Dict[str, str], removed: List[str] = ()) -> None:
+        hashes = self.tables.setdefault(table, {}).setdefault("hashes", {})
+        hashes.update(changed)
+        for key in removed:
+            hashes.pop(key, None)
+        self.save()
+
+
+class _Blank(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def render_row(spec: TableSpec, row: Dict[str, Any]) -> str:
+    return spec.template.format_map(_Blank({k: ("" if v is None else v) for k, v in row.items()}))
+
+
+def chunk_id(spec: TableSpec, key: Any) -> str:
+    return f"{spec.name}:{key}"
+
+
+def build_query(spec: TableSpec, has_watermark_value: bool, has_key: bool = False) -> str:
+    """Rows are read in (watermark, key) order and resume after the last committed pair,
+    so rows sharing a modified date are not skipped when a run stops inside such a group."""
+    columns = list(dict.fromkeys(spec.columns + [spec.key] + ([spec.watermark] if spec.watermark else [])))
+    sql = f"SELECT {', '.join(f'[{c}]' for c in columns)} FROM [{spec.name}]"
+    conditions = []
+    if spec.where:
+        conditions.append(f"({spec.where})")
+    if spec.watermark and has_watermark_value and has_key:
+        conditions.append(f"([{spec.watermark}] > ? OR ([{spec.watermark}] = ? AND [{spec.key}] > ?))")
+    elif spec.watermark and has_watermark_value:
+        conditions.append(f"[{spec.watermark}] > ?")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if spec.watermark:
+        return sql + f" ORDER BY [{spec.watermark}], [{spec.key}]"
+    return sql + f" ORDER BY [{spec.key}]"
+
+
+def iter_table_items(
+    conn,
+    spec: TableSpec,
+    state: SqlIngestState,
+    delete_fn: Callable[[List[str]], None],
+    fetch_size: int,
+) -> Iterator[Item]:
+    """Yield Chunks for new/changed rows of one table and Commits that advance its state."""
+    last = state.watermark(spec.name) if spec.watermark else None
+    last_key = state.watermark_key(spec.name) if last is not None else None
+    if last_key is not None:
+        params = [last, last, last_key]
+    else:
+        params = [last] if last is not None else []
+    cursor = conn.cursor()
+    cursor.execute(build_query(spec, last is not None, last_key is not None), params)
+    names = [d[0] for d in cursor.description]
+    # Copy: Commits update the state from the insert thread while this scan is still running.
+    known = dict(state.hashes(spec.name)) if not spec.watermark else {}
+    seen = set()
+    try:
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            batch_wm = batch_key = None
+            changed: Dict[str, str] = {}
+            for row in rows:
+                record = dict(zip(names, row))
+                key = str(record[spec.key])
+                text = render_row(spec, record)
+                if spec.watermark:
+                    batch_wm, batch_key = record[spec.watermark], record[spec.key]
+                else:
+                    seen.add(key)
+                    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                    if known.get(key) == digest:
+                        continue
+                    changed[key] = digest
+                yield Chunk(chunk_id(spec, key), text, {"table": spec.name, "key": key})
+            if batch_wm is not None:
+                yield Commit(partial(state.advance, spec.name, batch_wm, batch_key))
+            elif changed:
+                yield Commit(partial(state.update_hashes, spec.name, changed))
+    finally:
+        cursor.close()
+
+    if not spec.watermark:
+        # Only full scans can see deleted rows.
+        removed = [key for key in known if key not in seen]
+        if removed:
+            def drop():
+                delete_fn([chunk_id(spec, key) for key in removed])
+                state.update_hashes(spec.name, {}, removed)
+            yield Commit(drop)
+
+
+def iter_sql_items(
+    conn,
+    specs: List[TableSpec],
+    state: SqlIngestState,
+    delete_fn: Callable[[List[str]], None],
+    fetch_size: int,
+) -> Iterator[Item]:
+    for spec in specs:
+        print(f" -> 正在讀取資料表: {spec.name}")
+        yield from iter_table_items(conn, spec, state, delete_fn, fetch_size)
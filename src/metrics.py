@@ -0,0 +1,175 @@
+# metrics.py
+# Prometheus histograms / counters for every request stage, plus optional OpenTelemetry spans
+# (used only when opentelemetry-api is installed and an SDK/exporter is configured).
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Histogram
+
+try:
+    from opentelemetry import trace as _otel_trace
+    _tracer = _otel_trace.get_tracer("lab-rag")
+except ImportError:
+    _tracer = None
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320)
+
+# stage: embedding / milvus_search / local_search / llm / llm_load / llm_prompt_eval / llm_eval / tool / agent_run /
+#        queue_wait / route_classify / time_to_first_token / stream; name: model, collection or tool name
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent per request stage", ["stage", "name"], buckets=_LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "End-to-end HTTP request time", ["method", "path", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+AGENT_ITERATIONS = Histogram(
+    "rag_agent_iterations", "Agent tool-using iterations per run", buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10),
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens processed by Ollama", ["kind"])
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Failed stages", ["stage", "name"])
+
+
+def _start_span(stage: str, name: str):
+    if _tracer is None:
+        return None
+    span = _tracer.start_span(stage)
+    if name:
+        span.set_attribute("rag.name", name)
+    return span
+
+
+@contextmanager
+def span(stage: str, name: str = "") -> Iterator[None]:
+    """Time a block into rag_stage_seconds (and an OpenTelemetry span when available)."""
+    otel = _start_span(stage, name)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage, name).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage, name).observe(time.perf_counter() - started)
+        if otel is not None:
+            otel.end()
+
+
+class RequestMetrics(BaseCallbackHandler):
+    """Per-run callback: times LLM calls and tools, counts agent iterations and Ollama tokens.
+
+    One instance per request; `usage()` feeds the OpenAI-style `usage` block.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, tuple] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.agent_runs = 0
+        self.iterations = 0
+
+    def _begin(self, run_id: UUID, stage: str, name: str) -> None:
+        with self._lock:
+            self._open[run_id] = (stage, name, time.perf_counter(), _start_span(stage, name))
+
+    def _end(self, run_id: UUID, failed: bool = False) -> None:
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return
+        stage, name, started, otel = entry
+        STAGE_SECONDS.labels(stage, name).observe(time.perf_counter() - started)
+        if failed:
+            STAGE_ERRORS.labels(stage, name).inc()
+        if otel is not None:
+            otel.end()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        model = ((kwargs.get("invocation_params") or {}).get("model")) or ""
+        with self._lock:
+            self.llm_calls += 1
+        self._begin(run_id, "llm", model)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+        for generations in response.generations:
+            for gen in generations:
+                self._record_ollama_stats(gen.generation_info or {})
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, failed=True)
+
+    def _record_ollama_stats(self, info: Dict[str, Any]) -> None:
+        prompt = info.get("prompt_eval_count") or 0
+        completion = info.get("eval_count") or 0
+        with self._lock:
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+        LLM_TOKENS.labels("prompt").inc(prompt)
+        LLM_TOKENS.labels("completion").inc(completion)
+        model = info.get("model", "")
+        # Ollama reports its own phases in nanoseconds: model load, prompt prefill, decoding
+        for key, stage in (("load_duration", "llm_load"), ("prompt_eval_duration", "llm_prompt_eval"),
+                           ("eval_duration", "llm_eval")):
+            if info.get(key):
+                STAGE_SECONDS.labels(stage, model).observe(info[key] / 1e9)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._begin(run_id, "tool", (serialized or {}).get("name", ""))
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, failed=True)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       **kwargs: Any) -> None:
+        # The only top-level chain in a request is the AgentExecutor; LLM-only routes have none.
+        if parent_run_id is None:
+            with self._lock:
+                self.agent_runs += 1
+            self._begin(run_id, "agent_run", "")
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, failed=True)
+
+    def on_agent_action(self, action, **kwargs: Any) -> None:
+        with self._lock:
+            self.iterations += 1
+
+    def finish(self) -> None:
+        """Call once the run is over; records the iteration count of agent runs."""
+        if self.agent_runs:
+            AGENT_ITERATIONS.observe(self.iterations)
+
+    def usage(self) -> Dict[str, int]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+        }
+
+
+def observe_request(method: str, path: str, status: int, seconds: float) -> None:
+    REQUEST_SECONDS.labels(method, path, str(status)).observe(seconds)
+
+
+def time_stage(stage: str, name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage, name).observe(seconds)
+
+
+def route_path(request) -> Optional[str]:
+    """Route template (e.g. /v1/chat/completions) instead of the raw URL, to bound label cardinality."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None)
@@ -0,0 +1,236 @@
+# test_batch.py
+# 批次推論與多向量搜尋 (不需要 Ollama / Milvus)
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from langchain_core.documents import Document
+from prometheus_client import REGISTRY
+
+from src.app import batch_routes
+from src.app.executor import AgentPool
+from src.chains import vector_registry
+from src.chains.batch import iter_batch, iter_batch_items
+
+
+class FakeAgent:
+    def __init__(self):
+        self.prefetched = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def prefetch(self, questions):
+        self.prefetched.append(list(questions))
+
+    def run(self, question, callbacks=None):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.01)
+        with self._lock:
+            self.running -= 1
+        if question == "boom":
+            raise RuntimeError("llm down")
+        return question.upper()
+
+
+def test_iter_batch():
+    lines = [
+        '{"id": "a", "prompt": "first"}',
+        "",
+        '{"messages": [{"role": "system", "content": "x"}, {"role": "user", "content": "second"}]}',
+        '{"id": 7, "prompt": "boom"}',
+    ] + [f'{{"id": "q{i}", "prompt": "q{i}"}}' for i in range(10)]
+    agent = FakeAgent()
+    results = list(iter_batch(iter_batch_items(lines), agent, concurrency=3, chunk_size=4))
+
+    by_id = {r["id"]: r for r in results}
+    assert len(results) == 13
+    assert by_id["a"]["answer"] == "FIRST"
+    assert by_id["3"]["answer"] == "SECOND"            # 沒有 id 時使用行號
+    assert by_id["7"]["error"] == "RuntimeError: llm down"
+    assert [len(chunk) for chunk in agent.prefetched] == [4, 4, 4, 1]
+    assert agent.peak <= 3
+
+
+class SlowAgent:
+    def __init__(self, seconds: float = 0.05, pool: AgentPool = None):
+        self.seconds = seconds
+        self.pool = pool
+        self.started = []
+        self.pool_active = []
+
+    def run(self, question, callbacks=None):
+        self.started.append(question)
+        if self.pool is not None:
+            self.pool_active.append(self.pool.active)
+        time.sleep(self.seconds)
+        return question
+
+
+def test_iter_batch_cancel_from_another_thread():
+    agent = SlowAgent(seconds=0.5)
+    cancel = threading.Event()
+    results = iter_batch(iter_batch_items(f'{{"prompt": "q{i}"}}' for i in range(20)), agent,
+                         concurrency=2, chunk_size=4, cancel=cancel)
+    finished = []
+    consumer = threading.Thread(target=lambda: finished.append(list(results)))
+    consumer.start()
+    time.sleep(0.1)
+    started = time.perf_counter()
+    cancel.set()
+    consumer.join(timeout=2)
+    # 等待中的 generator 不必等執行中的項目跑完就結束; 排隊中的項目不會開始
+    assert finished == [[]] and time.perf_counter() - started < 0.4
+    time.sleep(0.6)
+    assert len(agent.started) == 2
+
+
+class FakeRequest:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+def test_messages_keep_their_conversation():
+    class ChatAgent(FakeAgent):
+        def __init__(self):
+            super().__init__()
+            self.chats = []
+
+        def chat(self, messages, callbacks=None):
+            self.chats.append(messages)
+            return f"{len(messages)} messages"
+
+    turns = [{"role": "user", "content": "price of tofu?"}, {"role": "assistant", "content": "23.25"},
+             {"role": "user", "content": "and its supplier?"}]
+    lines = [json.dumps({"id": "m", "messages": turns}), '{"id": "p", "prompt": "plain"}']
+    agent = ChatAgent()
+    by_id = {r["id"]: r for r in iter_batch(iter_batch_items(lines), agent, concurrency=2, chunk_size=4)}
+    # 多輪的項目走 session (chat)，整段對話都送進去; prompt 項目照舊
+    assert by_id["m"]["answer"] == "3 messages" and agent.chats == [turns]
+    assert by_id["p"]["answer"] == "PLAIN"
+    assert agent.prefetched == [["and its supplier?", "plain"]]
+
+
+def test_prefetch_failure_is_counted():
+    class NoPrefetch(FakeAgent):
+        def prefetch(self, questions):
+            raise ConnectionError("ollama down")
+
+    def errors():
+        return REGISTRY.get_sample_value("rag_stage_errors_total", {"stage": "batch_prefetch", "name": ""}) or 0
+
+    before = errors()
+    items = iter_batch_items(f'{{"prompt": "q{i}"}}' for i in range(5))
+    results = list(iter_batch(items, NoPrefetch(), concurrency=2, chunk_size=4))
+    # 預先 embedding 失敗不影響結果，只記在 metrics
+    assert sorted(r["answer"] for r in results) == [f"Q{i}" for i in range(5)]
+    assert errors() - before == 2
+
+
+def test_malformed_line_is_400():
+    bad_lines = [
+        '{"id": "a", "prompt": "ok"}\n{"id": "b", "prompt": ',
+        '{"id": "a", "prompt": "ok"}\n\n{"messages": [{"role": "user"}]}',
+        '["not", "an", "object"]',
+        '{"messages": "hello"}',
+        '{"prompt": 42}',
+    ]
+    for body, lineno in zip(bad_lines, [2, 3, 1, 1, 1]):
+        try:
+            asyncio.run(batch_routes.batch(FakeRequest(body.encode())))
+        except HTTPException as e:
+            assert e.status_code == 400 and e.detail.startswith(f"line {lineno}: "), (body, e.detail)
+        else:
+            raise AssertionError(f"expected 400 for {body!r}")
+
+
+def test_batch_disconnect_midway():
+    body = "\n".join(json.dumps({"id": i, "prompt": f"q{i}"}) for i in range(40)).encode()
+
+    async def main():
+        # 批次項目與一般請求共用 agent pool 的 slot
+        pool = AgentPool(max_concurrency=1, max_queue=4, queue_timeout=1, run_timeout=5)
+        agent = SlowAgent(pool=pool)
+        old = batch_routes.get_agent, batch_routes.agent_pool
+        batch_routes.get_agent, batch_routes.agent_pool = (lambda: agent), pool
+        try:
+            response = await batch_routes.batch(FakeRequest(body))
+            assert response.headers["X-Batch-Size"] == "40"
+            lines = response.body_iterator
+            first = json.loads(await lines.__anext__())
+            # client 在等待下一筆結果時斷線: ASGI server 取消讀取並關閉 body iterator
+            waiting = asyncio.ensure_future(lines.__anext__())
+            await asyncio.sleep(0.02)
+            waiting.cancel()
+            try:
+                await waiting
+            except asyncio.CancelledError:
+                pass
+            await lines.aclose()
+            # 讓已在執行的項目跑完
+            await asyncio.sleep(0.3)
+        finally:
+            batch_routes.get_agent, batch_routes.agent_pool = old
+        return agent, first
+
+    agent, first = asyncio.run(main())
+    assert first["answer"] == f"q{first['id']}"
+    assert set(agent.pool_active) == {1}
+    # 排隊中的項目不再開始
+    assert len(agent.started) <= 4
+
+
+class FakeCollection:
+    def __init__(self):
+        self.requests = []
+
+    def search(self, data, anns_field, param, limit, output_fields, timeout):
+        self.requests.append(len(data))
+        return [
+            [SimpleNamespace(entity={"text": f"doc for {vec[0]:.0f}", "source": "s", "pk": "1"}) for _ in range(limit)]
+            for vec in data
+        ]
+
+
+def test_search_many_uses_one_multi_vector_request():
+    col = FakeCollection()
+    store = SimpleNamespace(
+        col=col, fields=["pk", "text", "vector", "source"], _text_field="text", _vector_field="vector", search_params={},
+        timeout=None, _parse_document=lambda d: Document(page_content=d.pop("text"), metadata=d),
+    )
+    old = (vector_registry.embed_queries, vector_registry.with_vector_store)
+    vector_registry.embed_queries = lambda texts, embed_query=None: [[float(len(t))] for t in texts]
+    vector_registry.with_vector_store = lambda name, fn: fn(store)
+    try:
+        vector_registry.search_cache.clear()
+        queries = ["aa", "bbbb", "aa", "c"]
+        results = vector_registry.search_many("test_collection", queries, k=2)
+        assert col.requests == [3]                        # 重複的問題只搜尋一次
+        assert [r[0].page_content for r in results] == ["doc for 2", "doc for 4", "doc for 2", "doc for 1"]
+        assert results[0][0].metadata == {"source": "s", "pk": "1"}
+        # 第二次全部命中快取
+        vector_registry.search_many("test_collection", queries, k=2)
+        assert col.requests == [3]
+    finally:
+        vector_registry.embed_queries, vector_registry.with_vector_store = old
+        vector_registry.search_cache.clear()
+
+
+if __name__ == "__main__":
+    test_iter_batch()
+    test_iter_batch_cancel_from_another_thread()
+    test_messages_keep_their_conversation()
+    test_prefetch_failure_is_counted()
+    test_malformed_line_is_400()
+    test_batch_disconnect_midway()
+    test_search_many_uses_one_multi_vector_request()
+    print("OK")
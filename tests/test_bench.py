@@ -0,0 +1,80 @@
+# test_bench.py
+# 壓測工具: 假的 Ollama 能被專案實際使用的 client 呼叫、ReAct 腳本、合成 PDF、/metrics 差值與基準比較
+
+import os
+import tempfile
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_ollama import OllamaLLM
+
+from src.bench.fake_ollama import FakeOllama, fake_embedding, scripted_response
+from src.bench.fixtures import make_pdf_corpus
+from src.bench.report import compare_runs, stage_delta, stage_totals
+from src.chains.vector_registry import PooledOllamaEmbeddings
+
+REACT_PROMPT = "Use the following format:\nAction Input: the input\n\nBegin!\n\nQuestion: what dataset?\nThought:"
+
+
+def test_fake_ollama_with_project_clients():
+    with FakeOllama(dim=8, prompt_ms=1, token_ms=0, tokens=5, embed_ms=0) as fake:
+        llm = OllamaLLM(base_url=fake.url, model="m")
+        assert llm.invoke("hello") == "the results show that this"
+        chunks = list(llm.stream("hello"))
+        assert len(chunks) >= 5  # 逐 token 串流
+
+        emb = PooledOllamaEmbeddings(base_url=fake.url, model="fake-embed")
+        vectors = emb.embed_documents(["graph neural network", "graph neural network"])
+        assert len(vectors[0]) == 8 and vectors[0] == vectors[1]
+        assert fake.counts["generate"] == 2 and fake.counts["embedded_texts"] == 2
+
+
+def test_scripted_react_and_embeddings():
+    first = scripted_response(REACT_PROMPT, 3)
+    assert "Action: LabPaperSearch\nAction Input: what dataset?" in first
+    final = scripted_response(REACT_PROMPT + first + "\nObservation: snippets\nThought:", 3)
+    assert final.endswith("Final Answer: the results show")
+    assert scripted_response("plain prompt", 2) == "the results"
+
+    a, b, c = (fake_embedding(t, 64) for t in ("dense retrieval index", "dense retrieval recall", "robot arm"))
+    dot = lambda x, y: sum(i * j for i, j in zip(x, y))
+    assert dot(a, b) > dot(a, c)  # 共用字詞的文字較相近
+
+
+def test_synthetic_pdf_is_parsable():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_pdf_corpus(os.path.join(tmp, "pdf"), files=2, pages=3)
+        docs = PyPDFLoader(paths[0]).load()
+        assert len(paths) == 2 and len(docs) == 3 and len(docs[0].page_content) > 500
+
+
+def test_stage_delta_and_compare():
+    def scrape(count, total):
+        return ("# TYPE rag_stage_seconds histogram\n"
+                f'rag_stage_seconds_count{{stage="llm",name="m"}} {count}\n'
+                f'rag_stage_seconds_sum{{stage="llm",name="m"}} {total}\n'
+                f'rag_stage_seconds_count{{stage="llm",name="other"}} 1\n'
+                f'rag_stage_seconds_sum{{stage="llm",name="other"}} 1\n')
+
+    delta = stage_delta(stage_totals(scrape(2, 1.0)), stage_totals(scrape(6, 3.0)))
+    assert delta == {"llm": {"count": 4, "total_s": 2.0, "mean_ms": 500.0}}
+
+    baseline = {"chat": [{"endpoint": "openai", "concurrency": 4, "throughput_rps": 10.0,
+                          "latency": {"p95_ms": 400.0}, "ttft": None}],
+                "ingest": {"ingest_pdfs.py": {"wall_s": 10.0}}}
+    current = {"chat": [{"endpoint": "openai", "concurrency": 4, "throughput_rps": 9.5,
+                         "latency": {"p95_ms": 600.0}, "ttft": None}],
+               "ingest": {"ingest_pdfs.py": {"wall_s": 9.0}}}
+    rows = {(r["case"], r["metric"]): r["regression"] for r in compare_runs(baseline, current, 0.2)}
+    assert rows == {
+        ("openai@4", "throughput_rps"): False,
+        ("openai@4", "latency.p95_ms"): True,
+        ("ingest_pdfs.py", "wall_s"): False,
+    }
+
+
+if __name__ == "__main__":
+    test_fake_ollama_with_project_clients()
+    test_scripted_react_and_embeddings()
+    test_synthetic_pdf_is_parsable()
+    test_stage_delta_and_compare()
+    print("OK")
@@ -0,0 +1,107 @@
+# test_cache.py
+# LRU/TTL 快取與語意答案快取 (不需要 Ollama / Milvus)
+
+import os
+import tempfile
+import time
+
+from src.chains import cache as cache_mod
+from src.chains.answer_cache import CachedAgent, SemanticAnswerCache, key_terms
+from src.chains.cache import MISSING, TTLCache
+
+
+def test_ttl_cache_lru_and_expiry():
+    c = TTLCache("test", maxsize=2, ttl=0.2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1      # a 變成最近使用
+    c.put("c", 3)               # 淘汰 b
+    assert c.get("b") is MISSING
+    assert c.get("c") == 3
+    time.sleep(0.25)
+    assert c.get("a") is MISSING
+    assert c.stats()["hits"] == 2 and c.stats()["misses"] == 2
+
+
+def test_semantic_answer_cache():
+    versions = {"v": 1}
+    cache = SemanticAnswerCache(maxsize=10, ttl=60, threshold=0.95, versions=lambda: (versions["v"],))
+    cache.store([1.0, 0.0, 0.0], "answer A")
+    assert cache.lookup([0.99, 0.05, 0.0]) == "answer A"
+    assert cache.lookup([0.7, 0.7, 0.0]) is None
+    # 失敗的 agent 輸出不快取
+    cache.store([0.0, 1.0, 0.0], "Final Answer: Sorry, the model format parsing failed. ...")
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    # ingest 更新 collection 後整個快取失效
+    versions["v"] = 2
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_cached_agent_runs_once():
+    calls = []
+
+    class Agent:
+        def run(self, question, callbacks=None):
+            calls.append(question)
+            return f"answer to {question}"
+
+    vectors = {"what is chai": [1.0, 0.0], "what is  chai?": [0.99, 0.01], "who is tofu": [0.0, 1.0]}
+    agent = CachedAgent(Agent(), SemanticAnswerCache(threshold=0.95, versions=lambda: ()), vectors.__getitem__)
+    assert agent.run("what is chai") == "answer to what is chai"
+    assert agent.run("what is  chai?") == "answer to what is chai"
+    assert agent.run("who is tofu") == "answer to who is tofu"
+    assert calls == ["what is chai", "who is tofu"]
+
+
+def test_answer_cache_entity_swap():
+    assert key_terms("What is the unit price of Chai?") == {"chai"}
+    assert key_terms("How many orders did ALFKI place in 1997?") == {"alfki", "1997"}
+    assert key_terms("what is chai") == frozenset()
+
+    calls = []
+
+    class Agent:
+        def run(self, question, callbacks=None):
+            calls.append(question)
+            return f"answer to {question}"
+
+    # 兩個產品名稱不同的問題 embedding 幾乎一樣 (cosine > 0.99)
+    vectors = {
+        "What is the unit price of Chai?": [1.0, 0.0],
+        "What is the unit price of Chang?": [0.995, 0.1],
+        "what's the unit price of Chai": [0.99, 0.05],
+        "Orders in 1997?": [0.0, 1.0],
+        "Orders in 1998?": [0.01, 1.0],
+    }
+    agent = CachedAgent(Agent(), SemanticAnswerCache(threshold=0.95, versions=lambda: ()), vectors.__getitem__)
+    for question in vectors:
+        agent.run(question)
+    assert agent.run("What is the unit price of Chang?") == "answer to What is the unit price of Chang?"
+    # 同一個產品換個說法仍然命中
+    assert calls == ["What is the unit price of Chai?", "What is the unit price of Chang?",
+                     "Orders in 1997?", "Orders in 1998?"]
+
+
+def test_collection_version_bump():
+    with tempfile.TemporaryDirectory() as tmp:
+        old_dir, old_interval = cache_mod.INGEST_STATE_DIR, cache_mod.CACHE_VERSION_CHECK_INTERVAL
+        cache_mod.INGEST_STATE_DIR, cache_mod.CACHE_VERSION_CHECK_INTERVAL = tmp, 0
+        try:
+            assert cache_mod.collection_version("c") is None
+            cache_mod.bump_collection_version("c")
+            first = cache_mod.collection_version("c")
+            assert first is not None and os.path.exists(os.path.join(tmp, "versions", "c.version"))
+            cache_mod.bump_collection_version("c")
+            assert cache_mod.collection_version("c") != first
+        finally:
+            cache_mod.INGEST_STATE_DIR, cache_mod.CACHE_VERSION_CHECK_INTERVAL = old_dir, old_interval
+
+
+if __name__ == "__main__":
+    test_ttl_cache_lru_and_expiry()
+    test_semantic_answer_cache()
+    test_cached_agent_runs_once()
+    test_answer_cache_entity_swap()
+    test_collection_version_bump()
+    print("OK")
@@ -0,0 +1,102 @@
+# test_coalesce.py
+# Single-flight: 相同請求共用一次執行 / 一條串流 (不需要 Ollama)
+
+import asyncio
+
+from fastapi import HTTPException
+
+from src.app.coalesce import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    async def main():
+        flight = SingleFlight(enabled=True)
+        runs = []
+
+        async def compute(tag):
+            runs.append(tag)
+            await asyncio.sleep(0.05)
+            return f"answer {tag}"
+
+        results = await asyncio.gather(
+            *[flight.call("q1", lambda: compute("q1")) for _ in range(5)],
+            flight.call("q2", lambda: compute("q2")),
+        )
+        assert results == ["answer q1"] * 5 + ["answer q2"]
+        assert runs == ["q1", "q2"]
+
+        # 不共用時每個請求各自執行
+        flight = SingleFlight(enabled=False)
+        runs.clear()
+        await asyncio.gather(*[flight.call("q1", lambda: compute("q1")) for _ in range(3)])
+        assert runs == ["q1"] * 3
+
+    asyncio.run(main())
+
+
+def test_stream_late_joiner_gets_replay():
+    async def main():
+        flight = SingleFlight(enabled=True)
+        opened = []
+
+        async def open_events():
+            opened.append(1)
+
+            async def gen():
+                for i in range(4):
+                    await asyncio.sleep(0.02)
+                    yield "token", str(i)
+
+            return gen()
+
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            events = await flight.stream("q", open_events)
+            return [payload async for _, payload in events]
+
+        results = await asyncio.gather(consume(0), consume(0.05))
+        assert results == [["0", "1", "2", "3"]] * 2
+        assert opened == [1]
+
+    asyncio.run(main())
+
+
+def test_stream_cancelled_when_everyone_leaves_and_errors_propagate():
+    async def main():
+        flight = SingleFlight(enabled=True)
+        cancelled = asyncio.Event()
+
+        async def open_events():
+            async def gen():
+                try:
+                    yield "token", "a"
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+
+            return gen()
+
+        events = await flight.stream("q", open_events)
+        assert await events.__anext__() == ("token", "a")
+        await events.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+        async def busy():
+            raise HTTPException(status_code=429, detail="busy")
+
+        for _ in range(2):
+            try:
+                await flight.stream("q2", busy)
+                assert False
+            except HTTPException as e:
+                assert e.status_code == 429
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_run()
+    test_stream_late_joiner_gets_replay()
+    test_stream_cancelled_when_everyone_leaves_and_errors_propagate()
+    print("OK")
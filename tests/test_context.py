@@ -0,0 +1,56 @@
+# test_context.py
+# 檢索內容組裝: 重疊 chunk 合併、近似重複去除、token 預算 (不需要 Ollama / Milvus)
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.chains.context import estimate_tokens, format_context, merge_overlapping, pack_context
+
+
+TEXT = " ".join(f"Sentence {i} describes graph neural network result number {i}." for i in range(60))
+
+
+def split(text, source):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=80)
+    return [Document(page_content=c, metadata={"source": source}) for c in splitter.split_text(text)]
+
+
+def test_overlapping_chunks_are_stitched_back():
+    chunks = split(TEXT, "a.pdf")
+    assert merge_overlapping(chunks[1].page_content, chunks[2].page_content) == TEXT[
+        TEXT.index(chunks[1].page_content):TEXT.index(chunks[2].page_content) + len(chunks[2].page_content)]
+    # 順序相反也能合併；不相鄰的不合併
+    assert merge_overlapping(chunks[2].page_content, chunks[1].page_content) is not None
+    assert merge_overlapping(chunks[1].page_content, chunks[5].page_content) is None
+
+    # 搜尋結果: 第 3、2 塊 (相鄰) + 另一個來源的相同內容
+    hits = [chunks[3], chunks[2], Document(page_content=chunks[3].page_content, metadata={"source": "b.pdf"})]
+    packed = pack_context(hits, budget=1000)
+    assert len(packed) == 1                                   # 合併 + 去重
+    assert chunks[2].page_content in packed[0].page_content
+    assert chunks[3].page_content in packed[0].page_content
+
+
+def test_budget_keeps_rank_order_and_truncates_last():
+    docs = [Document(page_content=f"Topic {t}: " + " ".join(f"word{t}_{i}" for i in range(80)), metadata={"table": "T"})
+            for t in range(5)]
+    packed = pack_context(docs, budget=250)
+    out = format_context(packed)
+    assert estimate_tokens(out) <= 250
+    assert [d.page_content.split(":")[0] for d in packed] == ["Topic 0", "Topic 1"]
+    assert packed[-1].page_content.endswith("...")
+    assert out.startswith("[1] T: Topic 0")
+
+
+def test_near_duplicates_dropped():
+    a = Document(page_content="Product Name: Chai, Unit Price: 18.0, Category: Beverages")
+    b = Document(page_content="Product Name: Chai,  Unit Price: 18.0, Category: Beverages.")
+    c = Document(page_content="Product Name: Chang, Unit Price: 19.0, Category: Beverages")
+    assert [d.page_content for d in pack_context([a, b, c], budget=500)] == [a.page_content, c.page_content]
+
+
+if __name__ == "__main__":
+    test_overlapping_chunks_are_stitched_back()
+    test_budget_keeps_rank_order_and_truncates_last()
+    test_near_duplicates_dropped()
+    print("OK")
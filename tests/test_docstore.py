@@ -0,0 +1,104 @@
+# test_docstore.py
+# 文字 / metadata 與向量分開存放: SQLite docstore、只含 id 與向量的 collection 查詢、欄位配置檢查 (不需要 Milvus)
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+from pymilvus import DataType
+
+from src.chains import vector_registry
+from src.chains.docstore import DocStore
+from src.ingest import milvus_sink
+
+
+def test_docstore_bulk_lookup():
+    with tempfile.TemporaryDirectory() as root:
+        store = DocStore("c", root=root)
+        ids = [f"id{i}" for i in range(2000)]
+        store.upsert(ids, [f"text {i} " * 20 for i in range(2000)], [{"source": "a.pdf", "page": i} for i in range(2000)])
+        store.upsert(["id1"], ["changed"], [{"source": "b.pdf"}])
+        store.delete(["id2"])
+        assert len(store) == 1999
+        # 超過單一 SELECT 的參數上限時分段查詢
+        assert len(store.get_many(ids + ["missing"])) == 1999
+
+        docs = store.documents([["id5", "id2", "id1"], ["id1999"]])
+        assert [d.metadata["pk"] for d in docs[0]] == ["id5", "id1"]  # 已刪除的 id 略過，順序不變
+        assert docs[0][1].page_content == "changed" and docs[0][1].metadata["source"] == "b.pdf"
+        assert docs[1][0].metadata == {"source": "a.pdf", "page": 1999, "pk": "id1999"}
+        # 壓縮後比原文小
+        on_disk = sum(os.path.getsize(store.path + s) for s in ("", "-wal") if os.path.exists(store.path + s))
+        assert on_disk < sum(len(f"text {i} " * 20) for i in range(2000))
+
+        # 另一個 process (ingest) 重建檔案後，讀取端改用新檔
+        DocStore("c", root=root, drop_old=True).upsert(["new"], ["fresh"], [{}])
+        assert list(store.get_many(["id5", "new"])) == ["new"]
+
+
+class FakeCollection:
+    def __init__(self, dtype):
+        self.schema = SimpleNamespace(fields=[
+            SimpleNamespace(name="pk", dtype=DataType.VARCHAR),
+            SimpleNamespace(name="vector", dtype=dtype),
+            SimpleNamespace(name="source", dtype=DataType.VARCHAR),
+        ])
+        self.num_entities = 3
+        self.calls = []
+
+    def search(self, data, anns_field, param, limit, output_fields, timeout):
+        self.calls.append((data, output_fields))
+        return [[SimpleNamespace(id=f"id{i}") for i in range(limit)] for _ in data]
+
+
+def fake_store(dtype=DataType.FLOAT16_VECTOR, fields=("pk", "vector", "source")):
+    return SimpleNamespace(col=FakeCollection(dtype), fields=list(fields), collection_name="c", _text_field="text",
+                           _vector_field="vector", search_params={}, timeout=None)
+
+
+def test_search_resolves_ids_in_docstore():
+    with tempfile.TemporaryDirectory() as root:
+        docstore = DocStore("c", root=root)
+        docstore.upsert(["id0", "id1"], ["first", "second"], [{"source": "a.pdf"}, {"source": "b.pdf"}])
+        store = fake_store()
+        old = vector_registry.get_docstore
+        vector_registry.get_docstore = lambda name: docstore
+        try:
+            results = vector_registry._search_vectors(store, [[0.5, 0.25], [1.0, 0.0]], k=3)
+        finally:
+            vector_registry.get_docstore = old
+        data, output_fields = store.col.calls[0]
+        # Milvus 只回傳 id; float16 collection 以 float16 送出查詢向量
+        assert output_fields == [] and data[0].dtype == np.float16
+        assert [[d.page_content for d in docs] for docs in results] == [["first", "second"]] * 2
+        assert results[0][1].metadata == {"source": "b.pdf", "pk": "id1"}
+
+
+def test_layout_matches_config():
+    old = (milvus_sink.MILVUS_PAYLOAD, milvus_sink.MILVUS_VECTOR_DTYPE, milvus_sink.get_docstore)
+    with tempfile.TemporaryDirectory() as root:
+        docstore = DocStore("c", root=root)
+        milvus_sink.get_docstore = lambda name: docstore
+        try:
+            milvus_sink.MILVUS_PAYLOAD, milvus_sink.MILVUS_VECTOR_DTYPE = "docstore", "float16"
+            inline = fake_store(DataType.FLOAT_VECTOR, fields=("pk", "text", "vector", "source"))
+            assert not milvus_sink.layout_matches(inline)
+            assert not milvus_sink.layout_matches(fake_store(DataType.FLOAT_VECTOR))
+            # collection 有資料但 docstore 是空的 -> 需要重建
+            assert not milvus_sink.layout_matches(fake_store())
+            docstore.upsert(["id0"], ["first"], [{}])
+            assert milvus_sink.layout_matches(fake_store())
+
+            milvus_sink.MILVUS_PAYLOAD = "inline"
+            assert milvus_sink.layout_matches(inline)
+            assert not milvus_sink.layout_matches(fake_store())
+        finally:
+            milvus_sink.MILVUS_PAYLOAD, milvus_sink.MILVUS_VECTOR_DTYPE, milvus_sink.get_docstore = old
+
+
+if __name__ == "__main__":
+    test_docstore_bulk_lookup()
+    test_search_resolves_ids_in_docstore()
+    test_layout_matches_config()
+    print("OK")
@@ -0,0 +1,152 @@
+# test_embedder.py
+# Concurrent embedder: 依延遲調整同時請求數 (AIMD)、暫時失敗重試、從 checkpoint 接續不重算 (不需要 Ollama)
+
+import os
+import tempfile
+import threading
+import time
+
+from src.ingest.embedder import ConcurrentEmbedder, EmbeddingCheckpoint
+from src.ingest.pipeline import Chunk
+
+
+class FakeEmbed:
+    def __init__(self, fail_first: int = 0):
+        self.fail_first = fail_first
+        self.texts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                raise ConnectionError("ollama busy")
+            self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def chunks(n, prefix="c"):
+    return [Chunk(f"{prefix}{i}", f"text {i}", {}) for i in range(n)]
+
+
+class FakeOllama:
+    """One request per text, like OllamaEmbeddings.embed_documents; past `parallel` requests they queue."""
+
+    def __init__(self, parallel: int, seconds: float):
+        self.parallel = parallel
+        self.seconds = seconds
+        self.in_flight = 0
+        self.peak = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        vectors = []
+        for text in texts:
+            with self._lock:
+                self.in_flight += 1
+                self.requests += 1
+                self.peak = max(self.peak, self.in_flight)
+                load = max(1.0, self.in_flight / self.parallel)
+            time.sleep(self.seconds * load)
+            with self._lock:
+                self.in_flight -= 1
+            vectors.append([float(len(text)), 1.0])
+        return vectors
+
+
+def test_aimd_concurrency():
+    embedder = ConcurrentEmbedder(FakeEmbed(), concurrency=4, min_concurrency=2, max_concurrency=6, target_latency=1.0)
+    try:
+        embedder._adapt(0.1)  # 快: 加 1
+        assert embedder.concurrency == 5
+        embedder._adapt(0.7)  # 介於 target/2 與 target 之間: 不變
+        assert embedder.concurrency == 5
+        embedder._adapt(2.0)  # 太慢: 減半
+        assert embedder.concurrency == 2
+        embedder._adapt(None)  # 失敗: 減半，但不低於 min_concurrency
+        assert embedder.concurrency == 2
+        for _ in range(10):
+            embedder._adapt(0.1)
+        assert embedder.concurrency == 6
+    finally:
+        embedder.close()
+
+
+def test_concurrency_follows_backend_load():
+    # 後端很快: 同時請求數增加到上限
+    fast = FakeOllama(parallel=16, seconds=0.001)
+    embedder = ConcurrentEmbedder(fast, concurrency=1, max_concurrency=6, batch_size=2, target_latency=0.5)
+    try:
+        embedder.embed_chunks(chunks(120))
+        assert embedder.concurrency == 6 and fast.requests == 120
+    finally:
+        embedder.close()
+
+    # 後端只能同時處理 2 個請求，之後排隊變慢: 不會一直加到上限
+    slow = FakeOllama(parallel=2, seconds=0.01)
+    embedder = ConcurrentEmbedder(slow, concurrency=1, max_concurrency=16, batch_size=4, target_latency=0.03)
+    try:
+        items = chunks(240)
+        assert embedder.embed_chunks(items) == [[float(len(c.text)), 1.0] for c in items]
+        # 每段文字正好一個請求送到後端，同時進行的請求數受 concurrency 限制
+        assert slow.requests == 240 and embedder.requests == 60
+        assert slow.peak < 16 and 2 <= embedder.concurrency < 16
+    finally:
+        embedder.close()
+
+
+def test_retry_then_give_up():
+    fake = FakeEmbed(fail_first=2)
+    embedder = ConcurrentEmbedder(fake, concurrency=1, max_retries=2, backoff=0.001)
+    try:
+        items = chunks(3)
+        assert embedder.embed_chunks(items) == [[6.0, 1.0]] * 3
+        assert embedder.requests == 3 and embedder.retries == 2
+
+        # 重試用完: 直接拋出最後一次的例外
+        fake.fail_first = 3
+        try:
+            embedder.embed_chunks(items)
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("expected ConnectionError")
+        assert embedder.retries == 4
+    finally:
+        embedder.close()
+
+
+def test_resume_from_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pdf.embed.sqlite")
+        items = chunks(10)
+        fake = FakeEmbed()
+        first = ConcurrentEmbedder(fake, concurrency=3, batch_size=4,
+                                   checkpoint=EmbeddingCheckpoint(path, "model-a"))
+        expected = first.embed_chunks(items)
+        first.close()
+        assert sorted(fake.texts) == sorted(c.text for c in items)
+
+        # 中斷後重跑: 已完成的向量從 checkpoint 讀回，只 embed 新的或內容變更的 chunk
+        fake.texts.clear()
+        second = ConcurrentEmbedder(fake, concurrency=3, checkpoint=EmbeddingCheckpoint(path, "model-a"))
+        changed = items[:9] + [Chunk("c9", "edited", {})] + chunks(2, prefix="new")
+        vectors = second.embed_chunks(changed)
+        second.close()
+        assert vectors[:9] == expected[:9] and second.resumed == 9
+        assert sorted(fake.texts) == ["edited", "text 0", "text 1"]
+
+        # 換了 embedding model 的 checkpoint 不沿用
+        third = ConcurrentEmbedder(fake, checkpoint=EmbeddingCheckpoint(path, "model-b"))
+        third.embed_chunks(items)
+        third.close()
+        assert third.resumed == 0
+
+
+if __name__ == "__main__":
+    test_aimd_concurrency()
+    test_concurrency_follows_backend_load()
+    test_retry_then_give_up()
+    test_resume_from_checkpoint()
+    print("OK")
@@ -0,0 +1,134 @@
+# test_executor.py
+# Agent worker pool: 佇列滿回 429、排隊逾時 503、執行逾時 504、client 斷線 499，以及逾時 / 斷線後取消執行 (不需要 Ollama)
+
+import asyncio
+import threading
+import time
+
+from fastapi import HTTPException
+
+from src.app import executor as executor_mod
+from src.app.executor import AgentPool, RunCancelled
+from src.chains.streaming import TokenStreamHandler
+
+executor_mod.DISCONNECT_POLL_INTERVAL = 0.01
+
+
+def blocking(release: threading.Event, seen: list):
+    """Fake agent run: waits for `release`, checking the cancel handler like an agent does between LLM tokens."""
+    def fn(callbacks):
+        cancel = callbacks[-1]
+        while not release.wait(0.01):
+            try:
+                cancel.on_llm_new_token("x")
+            except RunCancelled:
+                seen.append("cancelled")
+                raise
+        return "done"
+    return fn
+
+
+async def status_of(coro) -> int:
+    try:
+        await coro
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+class FakeRequest:
+    def __init__(self, gone_after: float):
+        self.gone_at = time.monotonic() + gone_after
+
+    async def is_disconnected(self):
+        return time.monotonic() >= self.gone_at
+
+
+def test_full_queue_429_and_queue_timeout_503():
+    async def main():
+        pool = AgentPool(max_concurrency=1, max_queue=1, queue_timeout=0.2, run_timeout=5)
+        release, seen = threading.Event(), []
+        running = asyncio.create_task(pool.run(blocking(release, seen)))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.create_task(status_of(pool.run(lambda cbs: "second")))
+        await asyncio.sleep(0.05)
+        assert pool.active == 1 and pool.waiting == 1
+        # 一個執行中、一個排隊: 第三個直接拒絕
+        assert await status_of(pool.run(lambda cbs: "third")) == 429
+        assert await waiting == 503
+        release.set()
+        assert await running == "done"
+        assert pool.active == 0 and pool.waiting == 0
+
+    asyncio.run(main())
+
+
+def test_run_timeout_504_cancels_the_run():
+    async def main():
+        pool = AgentPool(max_concurrency=1, max_queue=1, queue_timeout=1, run_timeout=0.1)
+        release, seen = threading.Event(), []
+        assert await status_of(pool.run(blocking(release, seen))) == 504
+        # 執行緒結束前不釋放 slot
+        for _ in range(100):
+            if pool.active == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert seen == ["cancelled"] and pool.active == 0
+        assert await pool.run(lambda cbs: "next") == "next"
+
+    asyncio.run(main())
+
+
+def test_client_disconnect_499_and_stream_stop():
+    async def main():
+        pool = AgentPool(max_concurrency=2, max_queue=1, queue_timeout=1, run_timeout=5)
+        release, seen = threading.Event(), []
+        assert await status_of(pool.run(blocking(release, seen), request=FakeRequest(0.05))) == 499
+
+        # 串流: client 斷線後停止輸出並取消執行
+        events = await pool.open_stream(blocking(threading.Event(), seen), TokenStreamHandler,
+                                        request=FakeRequest(0.05))
+        assert [e async for e in events] == []
+        for _ in range(100):
+            if len(seen) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert seen == ["cancelled", "cancelled"]
+
+    asyncio.run(main())
+
+
+def test_background_runs_share_the_pool():
+    async def main():
+        pool = AgentPool(max_concurrency=1, max_queue=1, queue_timeout=0.2, run_timeout=5)
+        release, seen = threading.Event(), []
+        batch_item = asyncio.create_task(pool.run_background(blocking(release, seen), threading.Event()))
+        await asyncio.sleep(0.05)
+        queued_item = asyncio.create_task(pool.run_background(lambda cbs: "queued", threading.Event()))
+        await asyncio.sleep(0.05)
+        # 批次項目佔用 slot 也計入佇列: 一般請求看得到負載
+        assert pool.active == 1 and pool.waiting == 1
+        assert await status_of(pool.run(lambda cbs: "chat")) == 429
+        release.set()
+        assert await batch_item == "done" and await queued_item == "queued"
+
+        # 已取消的批次不再佔用 slot
+        cancel = threading.Event()
+        cancel.set()
+        try:
+            await pool.run_background(lambda cbs: "skipped", cancel)
+        except RunCancelled:
+            pass
+        else:
+            raise AssertionError("expected RunCancelled")
+        assert pool.active == 0 and await pool.run(lambda cbs: "chat") == "chat"
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_full_queue_429_and_queue_timeout_503()
+    test_run_timeout_504_cancels_the_run()
+    test_client_disconnect_499_and_stream_stop()
+    test_background_runs_share_the_pool()
+    print("OK")
@@ -0,0 +1,77 @@
+# test_local_embeddings.py
+# 程序內 embedding: 同時查詢合併成批、維度檢查、快取 (不需要 sentence-transformers / Ollama)
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.chains.cache import TTLCache
+from src.chains.local_embeddings import LocalEmbeddings
+
+
+class FakeModel:
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size, convert_to_numpy):
+        with self._lock:
+            self.batches.append(list(texts))
+        time.sleep(0.02)  # 模擬一次 forward pass
+        if "boom" in texts:
+            raise RuntimeError("encode failed")
+        return np.array([[len(t)] + [0.0] * (self.dim - 1) for t in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_share_batches():
+    model = FakeModel()
+    emb = LocalEmbeddings("fake", dim=4, model=model, max_wait_ms=20, max_batch=8)
+    texts = [f"q{'x' * i}" for i in range(16)]
+    with ThreadPoolExecutor(16) as pool:
+        vectors = list(pool.map(emb.embed_query, texts))
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+    assert sum(len(b) for b in model.batches) == 16
+    assert len(model.batches) <= 4                    # 不是每個查詢一次 forward pass
+    assert max(len(b) for b in model.batches) <= 8
+
+    assert emb.embed_documents(["a", "bb"]) == [[1.0, 0.0, 0.0, 0.0], [2.0, 0.0, 0.0, 0.0]]
+    assert emb.embed_documents([]) == []
+
+
+def test_errors_reach_every_caller_and_batcher_survives():
+    model = FakeModel()
+    emb = LocalEmbeddings("fake", dim=4, model=model, max_wait_ms=1)
+    try:
+        emb.embed_query("boom")
+        assert False, "error swallowed"
+    except RuntimeError:
+        pass
+    assert emb.embed_query("ok")[0] == 2.0
+
+
+def test_dimension_check_and_cache():
+    try:
+        LocalEmbeddings("fake", dim=768, model=FakeModel(dim=384)).embed_query("hi")
+        assert False, "dimension mismatch accepted"
+    except ValueError as e:
+        assert "EMBED_DIM=768" in str(e)
+
+    model = FakeModel()
+    emb = LocalEmbeddings("fake", dim=4, model=model, max_wait_ms=1, cache=TTLCache("test_local_embed", 16, 60))
+    emb.embed_query("Hello  world")
+    emb.embed_query("Hello world ")
+    assert len(model.batches) == 1
+    assert emb.model == "local:fake"
+
+
+if __name__ == "__main__":
+    test_concurrent_queries_share_batches()
+    test_errors_reach_every_caller_and_batcher_survives()
+    test_dimension_check_and_cache()
+    print("OK")
@@ -0,0 +1,81 @@
+# test_local_store.py
+# 本機 memmap 向量後端: 精確 top-k、增量寫入 / 刪除、跨 process 讀取、壓縮 (不需要 Milvus)
+
+import tempfile
+
+import numpy as np
+
+from src.chains import local_store
+from src.chains.local_store import LocalVectorStore
+
+
+def brute_force(data, query, k):
+    data = data / np.linalg.norm(data, axis=1, keepdims=True)
+    scores = data @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+def test_exact_top_k_matches_brute_force():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(300, 16)).astype(np.float32)
+    queries = rng.normal(size=(5, 16)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalVectorStore("c", root=root)
+        ids = [f"id{i}" for i in range(len(data))]
+        # 分批寫入，並讓分塊邊界落在資料中間
+        old_block, local_store._BLOCK_ROWS = local_store._BLOCK_ROWS, 64
+        try:
+            for start in range(0, len(data), 100):
+                end = start + 100
+                store.upsert(ids[start:end], [f"text {i}" for i in range(start, end)], data[start:end].tolist(),
+                             [{"source": "s"}] * (end - start))
+            results = store.search_vectors(queries.tolist(), k=7)
+        finally:
+            local_store._BLOCK_ROWS = old_block
+        for q, docs in zip(queries, results):
+            assert [d.metadata["pk"] for d in docs] == [f"id{i}" for i in brute_force(data, q, 7)]
+        assert results[0][0].metadata["source"] == "s"
+        assert results[0][0].page_content.startswith("text ")
+
+
+def test_append_delete_and_reader_refresh():
+    with tempfile.TemporaryDirectory() as root:
+        writer = LocalVectorStore("c", root=root, dtype="float16")
+        reader = LocalVectorStore("c", root=root)
+        assert not reader.exists()
+        assert reader.similarity_search_by_vector([1, 0, 0], k=3) == []
+
+        writer.upsert(["a", "b", "c"], ["A", "B", "C"], [[1, 0, 0], [0, 1, 0], [0, 0, 1]], [{}, {}, {}])
+        assert [d.page_content for d in reader.similarity_search_by_vector([1, 0.1, 0], k=2)] == ["A", "B"]
+
+        # 同一 id 重新寫入會取代舊列；刪除後不再出現
+        writer.upsert(["a"], ["A2"], [[0, 0, 1]], [{}])
+        writer.delete(["b", "missing"])
+        docs = reader.similarity_search_by_vector([0, 0, 1], k=5)
+        assert [d.page_content for d in docs] == ["C", "A2"] or [d.page_content for d in docs] == ["A2", "C"]
+        assert len(reader) == 2
+        assert reader._vectors.dtype == np.float16
+
+        writer.compact()
+        assert len(reader) == 2
+        assert sorted(d.page_content for d in reader.similarity_search_by_vector([0, 0, 1], k=5)) == ["A2", "C"]
+        try:
+            writer.upsert(["x"], ["X"], [[1, 0]], [{}])
+            assert False, "dimension mismatch accepted"
+        except ValueError:
+            pass
+
+
+def test_drop_old():
+    with tempfile.TemporaryDirectory() as root:
+        LocalVectorStore("c", root=root).upsert(["a"], ["A"], [[1.0, 0.0]], [{}])
+        store = LocalVectorStore("c", root=root, drop_old=True)
+        assert not store.exists()
+        assert store.search_vectors([[1.0, 0.0]], k=1) == [[]]
+
+
+if __name__ == "__main__":
+    test_exact_top_k_matches_brute_force()
+    test_append_delete_and_reader_refresh()
+    test_drop_old()
+    print("OK")
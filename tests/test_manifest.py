@@ -0,0 +1,59 @@
+# test_manifest.py
+# PDF ingest manifest: 未變更的檔案跳過、內容變更才重新匯入、重新載入後可接續 (不需要 Milvus)
+
+import os
+import tempfile
+
+from src.ingest.manifest import Manifest, chunk_ids_for, file_sha256
+
+
+def test_changed_sha256_skips_unchanged_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "a.pdf")
+        with open(pdf, "wb") as f:
+            f.write(b"version 1")
+        manifest = Manifest(os.path.join(tmp, "manifest.json"), "pdf_collection")
+
+        sha = manifest.changed_sha256(pdf)
+        assert sha == file_sha256(pdf)  # 新檔案
+        ids = chunk_ids_for(pdf, sha, 3)
+        assert ids == chunk_ids_for(pdf, sha, 3) and len(set(ids)) == 3
+        manifest.record(pdf, sha, ids)
+        assert manifest.changed_sha256(pdf) is None
+
+        # 只有 mtime 變了: 內容相同仍跳過，並記下新的 mtime
+        os.utime(pdf, (1, 1))
+        assert manifest.changed_sha256(pdf) is None
+        assert manifest.files[pdf]["mtime"] == 1
+
+        with open(pdf, "wb") as f:
+            f.write(b"version 2")
+        new_sha = manifest.changed_sha256(pdf)
+        assert new_sha not in (None, sha)
+        assert not set(chunk_ids_for(pdf, new_sha, 3)) & set(ids)
+
+
+def test_save_load_and_forget():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "a.pdf")
+        with open(pdf, "wb") as f:
+            f.write(b"content")
+        path = os.path.join(tmp, "state", "manifest.json")
+        manifest = Manifest(path, "pdf_collection")
+        manifest.record(pdf, file_sha256(pdf), ["x-00000", "x-00001"])
+        manifest.save()
+
+        # 中斷後重新執行: 從檔案接續
+        resumed = Manifest.load(path, "pdf_collection")
+        assert resumed.changed_sha256(pdf) is None
+        assert resumed.all_chunk_ids() == ["x-00000", "x-00001"]
+        assert resumed.forget(pdf) == ["x-00000", "x-00001"] and resumed.files == {}
+
+        # 屬於其他 collection 的 manifest 不沿用
+        assert Manifest.load(path, "other_collection").files == {}
+
+
+if __name__ == "__main__":
+    test_changed_sha256_skips_unchanged_files()
+    test_save_load_and_forget()
+    print("OK")
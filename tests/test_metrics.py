@@ -0,0 +1,47 @@
+# test_metrics.py
+# RequestMetrics: token 統計與各階段 histogram (不需要 Ollama)
+
+from uuid import uuid4
+
+from langchain_core.outputs import Generation, LLMResult
+
+from src.metrics import AGENT_ITERATIONS, STAGE_SECONDS, RequestMetrics
+
+
+def _count(histogram, **labels):
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and all(sample.labels.get(k) == v for k, v in labels.items()):
+                return sample.value
+    return 0.0
+
+
+def test_usage_and_stages():
+    metrics = RequestMetrics()
+    before_tool = _count(STAGE_SECONDS, stage="tool", name="SQLQuery")
+    before_iter = _count(AGENT_ITERATIONS)
+
+    agent_run = uuid4()
+    metrics.on_chain_start({}, {}, run_id=agent_run)
+    for _ in range(2):
+        llm_run = uuid4()
+        metrics.on_llm_start({}, ["prompt"], run_id=llm_run, parent_run_id=agent_run,
+                             invocation_params={"model": "llama3.1:8b"})
+        info = {"model": "llama3.1:8b", "prompt_eval_count": 100, "eval_count": 20, "eval_duration": 5e8}
+        metrics.on_llm_end(LLMResult(generations=[[Generation(text="x", generation_info=info)]]), run_id=llm_run)
+    metrics.on_agent_action(None)
+    tool_run = uuid4()
+    metrics.on_tool_start({"name": "SQLQuery"}, "SELECT 1", run_id=tool_run, parent_run_id=agent_run)
+    metrics.on_tool_end("1", run_id=tool_run)
+    metrics.on_chain_end({}, run_id=agent_run)
+    metrics.finish()
+
+    assert metrics.usage() == {"prompt_tokens": 200, "completion_tokens": 40, "total_tokens": 240}
+    assert metrics.llm_calls == 2
+    assert _count(STAGE_SECONDS, stage="tool", name="SQLQuery") == before_tool + 1
+    assert _count(AGENT_ITERATIONS) == before_iter + 1
+
+
+if __name__ == "__main__":
+    test_usage_and_stages()
+    print("OK")
@@ -0,0 +1,78 @@
+# test_milvus_index.py
+# 索引 / 查詢參數設定與索引重建 (不需要 Milvus)
+
+from types import SimpleNamespace
+
+from src.chains import milvus_index
+from src.chains.milvus_index import ensure_index, index_matches, index_params, search_params, search_params_for
+
+
+class FakeCollection:
+    def __init__(self, index_param, partition_key="source"):
+        self.index_param = index_param
+        self.calls = []
+        self.schema = SimpleNamespace(fields=[
+            SimpleNamespace(name="source", is_partition_key=partition_key == "source"),
+            SimpleNamespace(name="vector", is_partition_key=False),
+        ])
+
+    def release(self):
+        self.calls.append("release")
+
+    def drop_index(self, index_name):
+        self.calls.append(("drop_index", index_name))
+
+    def create_index(self, field, index_params):
+        self.calls.append(("create_index", field, index_params["index_type"]))
+        self.index_param = index_params
+
+    def load(self):
+        self.calls.append("load")
+
+
+def fake_store(index_param):
+    col = FakeCollection(index_param)
+    return SimpleNamespace(
+        col=col, collection_name=milvus_index.PDF_COLLECTION_NAME, _vector_field="vector", search_params=None,
+        _get_index=lambda: {"index_name": "_default_idx", "index_param": col.index_param} if col.index_param else None,
+    )
+
+
+def test_params_merge_defaults():
+    assert index_params("IVF_FLAT", "IP", {"nlist": 64}) == {"index_type": "IVF_FLAT", "metric_type": "IP", "params": {"nlist": 64}}
+    assert index_params("HNSW", "L2")["params"] == {"M": 16, "efConstruction": 200}
+    assert search_params("HNSW", "L2", {"ef": 128}) == {"metric_type": "L2", "params": {"ef": 128}}
+    try:
+        index_params("DISKANN")
+        assert False, "unsupported index type accepted"
+    except ValueError:
+        pass
+
+
+def test_index_matches_string_params():
+    wanted = index_params("HNSW", "L2")
+    # Milvus 回傳的參數值為字串
+    assert index_matches({"index_type": "HNSW", "metric_type": "L2", "params": {"M": "16", "efConstruction": "200"}}, wanted)
+    assert not index_matches({"index_type": "HNSW", "metric_type": "L2", "params": {"M": 8, "efConstruction": 64}}, wanted)
+    assert not index_matches(None, wanted)
+
+
+def test_ensure_index_rebuilds_only_on_change():
+    wanted = index_params("IVF_FLAT", "L2")
+    configured = search_params("IVF_FLAT", "L2")
+    store = fake_store({"index_type": "HNSW", "metric_type": "L2", "params": {"M": 8, "efConstruction": 64}})
+    # 索引尚未重建: 查詢端沿用現有索引的 metric
+    assert search_params_for(store, wanted, configured) == search_params("HNSW", "L2")
+
+    assert ensure_index(store, wanted, configured)
+    assert store.col.calls == ["release", ("drop_index", "_default_idx"), ("create_index", "vector", "IVF_FLAT"), "load"]
+    assert store.search_params == configured
+    assert not ensure_index(store, wanted, configured)
+    assert search_params_for(store, wanted, configured) == configured
+
+
+if __name__ == "__main__":
+    test_params_merge_defaults()
+    test_index_matches_string_params()
+    test_ensure_index_rebuilds_only_on_change()
+    print("OK")
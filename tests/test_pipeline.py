@@ -0,0 +1,76 @@
+# test_pipeline.py
+# Staged ingest pipeline: Commit 只在之前的 chunk 都寫入後才執行、任一階段失敗時整條 pipeline 停止並回報 (不需要 Milvus)
+
+import itertools
+import threading
+
+from src.ingest.pipeline import Chunk, Commit, PipelineError, run_pipeline
+
+
+def fake_embed(chunks):
+    return [[float(len(c.text))] for c in chunks]
+
+
+def chunk(i):
+    return Chunk(f"id{i}", f"text {i}", {"n": i})
+
+
+def test_commit_runs_after_its_chunks_are_inserted():
+    inserted, committed = [], []
+
+    def source():
+        for unit in range(3):
+            for i in range(unit * 5, unit * 5 + 5):
+                yield chunk(i)
+            yield Commit(lambda unit=unit: committed.append((unit, list(inserted))))
+
+    # embed batch 大於單一檔案: Commit 不會強迫 embed 提早送出，但 insert 端仍要先寫完
+    stats = run_pipeline(source(), fake_embed, lambda batch: inserted.extend(batch.ids),
+                         embed_batch=8, insert_batch=3, queue_size=2)
+    assert inserted == [f"id{i}" for i in range(15)]
+    assert [(unit, len(seen)) for unit, seen in committed] == [(0, 5), (1, 10), (2, 15)]
+    assert [s.items for s in stats] == [15, 15, 15]
+
+
+def test_failing_stage_stops_the_pipeline():
+    closed = threading.Event()
+    committed = []
+
+    def endless():
+        try:
+            for i in itertools.count():
+                yield chunk(i)
+                if i % 4 == 3:
+                    yield Commit(lambda i=i: committed.append(i))
+        finally:
+            closed.set()
+
+    def failing_insert(batch):
+        if batch.ids[0] != "id0":
+            raise RuntimeError("milvus down")
+
+    # 無限的 source 也不能卡住: insert 失敗後 source 停止並被關閉
+    try:
+        run_pipeline(endless(), fake_embed, failing_insert, embed_batch=4, insert_batch=4, queue_size=2)
+    except PipelineError as e:
+        assert "milvus down" in str(e)
+    else:
+        raise AssertionError("expected PipelineError")
+    assert closed.is_set() and committed == [3]
+
+    def broken_source():
+        yield chunk(0)
+        raise ValueError("bad pdf")
+
+    try:
+        run_pipeline(broken_source(), fake_embed, lambda batch: None, embed_batch=4, insert_batch=4, queue_size=2)
+    except PipelineError as e:
+        assert isinstance(e.__cause__, ValueError)
+    else:
+        raise AssertionError("expected PipelineError")
+
+
+if __name__ == "__main__":
+    test_commit_runs_after_its_chunks_are_inserted()
+    test_failing_stage_stops_the_pipeline()
+    print("OK")
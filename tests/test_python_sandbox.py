@@ -0,0 +1,46 @@
+# test_python_sandbox.py
+# Python_REPL 的 worker process pool: 逾時、記憶體上限、輸出截斷、worker 換新 (不需要外部服務)
+
+import threading
+import time
+
+from src.chains.python_sandbox import PythonPool
+
+
+def test_python_pool_limits_and_recycling():
+    pool = PythonPool(size=2, timeout=2, memory_mb=512, max_output=100, max_runs=3)
+    try:
+        assert pool.run("```python\nprint(6 * 7)\n```") == "42\n"
+        # 每次執行使用新的 namespace
+        pool.run("x = 1")
+        assert "NameError" in pool.run("print(x)")
+        assert pool.run("raise ValueError('bad')") == "ValueError('bad')"
+
+        out = pool.run("for i in range(1000): print('line', i)")
+        assert out.startswith("line 0\n") and "...[truncated" in out and len(out) < 200
+
+        assert "MemoryError" in pool.run("b = bytearray(2 * 1024 ** 3)")
+
+        # 無窮迴圈會逾時，期間 API 的其他執行緒不受影響
+        ticks = []
+        ticker = threading.Thread(target=lambda: [ticks.append(time.sleep(0.05)) for _ in range(20)])
+        ticker.start()
+        started = time.perf_counter()
+        assert pool.run("while True: pass").startswith("TimeoutError")
+        assert 1.9 < time.perf_counter() - started < 5
+        ticker.join()
+        assert len(ticks) == 20
+        assert pool.run("print('alive')") == "alive\n"
+
+        # 執行 max_runs 次後換新 worker
+        pids = set()
+        for _ in range(8):
+            pids.add(pool.run("import os; print(os.getpid())").strip())
+        assert len(pids) >= 3
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    test_python_pool_limits_and_recycling()
+    print("OK")
@@ -0,0 +1,61 @@
+# test_retrieval.py
+# 多查詢 / 多 collection 檢索與 SearchAll 合併去重 (不需要 Ollama / Milvus)
+
+import threading
+import time
+
+from langchain_core.documents import Document
+
+from src.chains import retrieval
+
+
+def fake_backend():
+    calls = {"embed": [], "search": [], "threads": set()}
+
+    def embed_queries(texts, embed_query=None):
+        calls["embed"].append(list(texts))
+        return [[0.0] for _ in texts]
+
+    def search_many(name, queries, k):
+        calls["search"].append((name, list(queries)))
+        calls["threads"].add(threading.current_thread().name)
+        time.sleep(0.05)
+        if name == retrieval.PDF_COLLECTION_NAME:
+            return [[Document(page_content=f"paper about {q} #{i}", metadata={"source": "a.pdf"}) for i in range(k)]
+                    for q in queries]
+        # 兩個查詢都命中同一列 -> 應去重
+        return [[Document(page_content="Product Name: Chai", metadata={"table": "Products"})] for _ in queries]
+
+    return calls, embed_queries, search_many
+
+
+def test_retrieve_embeds_once_and_searches_collections_in_parallel():
+    calls, embed, search = fake_backend()
+    old = (retrieval.embed_queries, retrieval.search_many)
+    retrieval.embed_queries, retrieval.search_many = embed, search
+    try:
+        started = time.perf_counter()
+        results = retrieval.retrieve(["gnn", "chai price"], k=2)
+        assert time.perf_counter() - started < 0.09          # 兩個 collection 同時搜尋
+        assert calls["embed"] == [["gnn", "chai price"]]
+        assert sorted(name for name, _ in calls["search"]) == sorted(retrieval.DEFAULT_COLLECTIONS)
+        assert len(results[retrieval.PDF_COLLECTION_NAME]) == 2
+
+        out = retrieval.search_everything_fn("gnn; chai price")
+        lines = out.splitlines()
+        assert lines[0] == "[1] a.pdf: paper about gnn #0"
+        assert sum("Chai" in line for line in lines) == 1
+        assert len(lines) == 2 * retrieval.CONTEXT_TOOL_K + 1  # 全部放得進 token 預算
+    finally:
+        retrieval.embed_queries, retrieval.search_many = old
+
+
+def test_merge_results_limit():
+    docs = {"c": [[Document(page_content=f"d{i}") for i in range(5)], [Document(page_content="x")]]}
+    assert [d.page_content for d in retrieval.merge_results(docs, limit=3)] == ["d0", "x", "d1"]
+
+
+if __name__ == "__main__":
+    test_retrieve_embeds_once_and_searches_collections_in_parallel()
+    test_merge_results_limit()
+    print("OK")
@@ -0,0 +1,89 @@
+# test_router.py
+# 查詢路由測試: 以假的 embedding / LLM / agent 驗證分流與計量 (不需要 Ollama / Milvus)
+
+import hashlib
+
+from langchain_core.documents import Document
+
+from src.chains import router as router_mod
+from src.chains.router import IntentClassifier, RouteStats, RoutedAgent
+
+INTENTS = {
+    "direct": ["hello who are you", "explain what a vector database is"],
+    "pdf_rag": ["what dataset did the paper use", "what method does the paper propose"],
+    "sql_rag": ["what is the unit price of chai", "which supplier provides tofu"],
+    "agent": ["total sales by category", "top customers by revenue"],
+}
+
+
+class FakeEmbeddings:
+    """Bag of hashed words, so questions sharing words with an example land near it."""
+
+    def embed_query(self, text):
+        vec = [0.0] * 64
+        for word in text.lower().replace("?", "").split():
+            vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+        return vec
+
+
+class FakeLLM:
+    calls = []
+
+    def invoke(self, prompt, config=None):
+        FakeLLM.calls.append(prompt)
+        for cb in config["callbacks"]:
+            cb.on_llm_start({}, [prompt], tags=config.get("tags"))
+        return "llm:" + prompt.splitlines()[0]
+
+
+class FakeAgent:
+    def run(self, question, callbacks=None):
+        for _ in range(3):
+            for cb in callbacks:
+                cb.on_llm_start({}, [question])
+        return "agent:" + question
+
+
+def make_router(docs=None):
+    router_mod.search = lambda name, query, k: docs.get(name, []) if docs else []
+    emb = FakeEmbeddings()
+    classifier = IntentClassifier(emb.embed_query, INTENTS, min_score=0.5, min_margin=0.05)
+    return RoutedAgent(FakeAgent(), classifier, emb, stats=RouteStats(), llm_factory=FakeLLM)
+
+
+def test_routes():
+    routed = make_router()
+    assert routed.route("hello, who are you?")[0] == "direct"
+    assert routed.route("what is the unit price of tofu?")[0] == "sql_rag"
+    assert routed.route("what dataset did the paper use?")[0] == "pdf_rag"
+    assert routed.route("total sales by category")[0] == "agent"
+    # 沒有相近的範例 -> agent
+    assert routed.route("zebra quantum lasagna")[0] == "agent"
+
+
+def test_fast_paths_and_stats():
+    docs = {router_mod.SQL_COLLECTION_NAME: [Document(page_content="Product Name: Tofu\nUnit Price: 23.25", metadata={"table": "Products"})]}
+    routed = make_router(docs)
+    FakeLLM.calls = []
+
+    assert routed.run("hello who are you") == "llm:hello who are you"
+    answer = routed.run("what is the unit price of tofu")
+    assert answer.startswith("llm:Answer the question")
+    assert "[1] Products: Product Name: Tofu Unit Price: 23.25" in FakeLLM.calls[-1]
+    # PDF 檢索沒有結果時退回 agent
+    assert routed.run("what method does the paper propose") == "agent:what method does the paper propose"
+    assert routed.run("total sales by category") == "agent:total sales by category"
+
+    snap = routed.stats.snapshot()
+    assert snap["routes"]["direct"]["requests"] == 1
+    assert snap["routes"]["sql_rag"]["llm_calls"] == 1
+    assert snap["routes"]["agent"]["requests"] == 2
+    assert snap["routes"]["agent"]["avg_llm_calls"] == 3
+    assert snap["estimated_saved_llm_calls"] == 4
+    assert snap["classify"]["requests"] == 4
+
+
+if __name__ == "__main__":
+    test_routes()
+    test_fast_paths_and_stats()
+    print("OK")
@@ -0,0 +1,76 @@
+# test_runtime.py
+# 共用 agent 只建立一次、warmup 與 /healthz /readyz (不需要 Ollama / Milvus)
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from src.app import runtime as runtime_mod
+from src.app.main import app
+
+
+class FakeAgent:
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch(self, questions):
+        self.prefetched.append(questions)
+
+    def run(self, question, callbacks=None):
+        return f"answer to {question}"
+
+
+def test_agent_built_once_and_warmup():
+    built = []
+    lock = threading.Lock()
+
+    def fake_build():
+        with lock:
+            built.append(1)
+        return FakeAgent()
+
+    rt = runtime_mod.AgentRuntime()
+    old = (runtime_mod.init_agent, runtime_mod.with_router, runtime_mod.with_answer_cache)
+    runtime_mod.init_agent, runtime_mod.with_router, runtime_mod.with_answer_cache = fake_build, lambda a: a, lambda a: a
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            agents = list(pool.map(lambda _: rt.agent(), range(8)))
+        assert len(built) == 1 and all(a is agents[0] for a in agents)
+
+        rt._load_llm = lambda: (_ for _ in ()).throw(ConnectionError("ollama down"))
+        rt._load_embeddings = lambda: None
+        assert not rt.warmup()
+        assert rt.snapshot()["checks"]["llm"] == "ConnectionError: ollama down"
+        assert not rt.ready
+
+        rt._load_llm = lambda: None
+        assert rt.warmup()
+        assert rt.snapshot()["ready"] and set(rt.snapshot()["checks"].values()) == {"ok"}
+    finally:
+        runtime_mod.init_agent, runtime_mod.with_router, runtime_mod.with_answer_cache = old
+
+
+def test_probes_and_shared_agent():
+    rt = runtime_mod.runtime
+    old_agent, old_ready = rt._agent, rt.ready_at
+    rt._agent = runtime_mod.with_sessions(FakeAgent())
+    try:
+        client = TestClient(app)  # 不觸發 lifespan，避免背景 warmup 連到 Ollama
+        assert client.get("/healthz").json() == {"status": "ok"}
+        rt.ready_at = None
+        assert client.get("/readyz").status_code == 503
+        rt.ready_at = rt._started + 1.5
+        res = client.get("/readyz")
+        assert res.status_code == 200 and res.json()["warmup_seconds"] == 1.5
+
+        body = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+        assert client.post("/api/chat", json=body).json()["message"]["content"] == "answer to hi"
+    finally:
+        rt._agent, rt.ready_at = old_agent, old_ready
+
+
+if __name__ == "__main__":
+    test_agent_built_once_and_warmup()
+    test_probes_and_shared_agent()
+    print("OK")
@@ -0,0 +1,178 @@
+# test_sessions.py
+# 多輪對話: 歷史視窗、依對話歷史找回狀態、追問不走答案快取、對話內重用檢索結果、直接回答沿用 Ollama context
+# (以假的 agent / LLM / 向量庫驗證，不需要 Ollama / Milvus)
+
+import hashlib
+
+from langchain_core.documents import Document
+from langchain_core.outputs import Generation, LLMResult
+
+from src.chains import vector_registry
+from src.chains.answer_cache import CachedAgent, SemanticAnswerCache
+from src.chains.cache import TTLCache
+from src.chains.router import IntentClassifier, RouteStats, RoutedAgent
+from src.chains.sessions import (
+    RetrievalMemory, SessionAgent, current_turn, history_block, render_prompt,
+    retrieval_query, window_start,
+)
+
+
+def embed(text):
+    vec = [0.0] * 64
+    for word in text.lower().replace("?", "").split():
+        vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+    return vec
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.seen = []
+
+    def run(self, question, callbacks=None):
+        self.seen.append((question, history_block(), retrieval_query(question)))
+        return f"answer {len(self.seen)}"
+
+
+def conversation(*contents):
+    roles = ("user", "assistant")
+    return [{"role": roles[i % 2], "content": c} for i, c in enumerate(contents)]
+
+
+def test_window_moves_in_jumps():
+    history = [("user", "w " * 40)] * 10  # 每則約 12 tokens
+    assert window_start(history[:3], 100) == 0
+    start = window_start(history, 100)
+    assert start > 0 and sum(12 for _ in history[start:]) <= 50
+    # 再多一輪仍在預算內 -> 視窗起點不動，prompt 前綴維持一致
+    assert window_start(history + history[:1], 100, start) == start
+
+    prompt = render_prompt([("system", "be nice")] + history + [("user", "last?")], budget=100)
+    assert prompt.startswith("Conversation so far:") and prompt.endswith("Current question: last?")
+    assert "be nice" not in prompt
+
+
+def test_chat_finds_state_by_history():
+    agent = RecordingAgent()
+    session = SessionAgent(agent, store=TTLCache("test_session", 10, 60))
+
+    assert session.chat(conversation("what is the unit price of tofu?")) == "answer 1"
+    assert agent.seen[0][1] == ""  # 第一輪沒有歷史
+    session.chat(conversation("what is the unit price of tofu?", "answer 1", "and its supplier?"))
+    question, history, query = agent.seen[1]
+    assert question == "and its supplier?"
+    assert "User: what is the unit price of tofu?\nAssistant: answer 1" in history
+    assert query == "what is the unit price of tofu? and its supplier?"
+
+    # 狀態存在新的歷史之下，下一輪找得到; 在 chat 之外沒有 turn
+    assert session.store.stats()["size"] == 2 and current_turn.get() is None
+
+    disabled = SessionAgent(RecordingAgent(), store=TTLCache("test_session_off", 10, 60), enabled=False)
+    disabled.chat(conversation("first", "answer 1", "second"))
+    assert disabled.agent.seen == [("second", "", "second")]
+
+
+def test_followup_skips_answer_cache():
+    class Inner:
+        calls = 0
+
+        def run(self, question, callbacks=None):
+            Inner.calls += 1
+            return f"answer {Inner.calls}"
+
+    cached = CachedAgent(Inner(), SemanticAnswerCache(versions=lambda: ()), embed_query=embed)
+    session = SessionAgent(cached, store=TTLCache("test_session", 10, 60))
+    assert session.chat(conversation("how much is tofu?")) == "answer 1"
+    assert session.chat(conversation("how much is tofu?")) == "answer 1"  # 新對話的相同問題 -> 快取
+    # 追問的答案取決於前文，不能給別的對話用
+    assert session.chat(conversation("what about chai?", "answer 1", "how much is tofu?")) == "answer 2"
+    assert Inner.calls == 2
+
+
+def test_retrieval_reused_within_conversation():
+    memory = RetrievalMemory(maxsize=2, threshold=0.8)
+    docs = [Document(page_content="Tofu 23.25"), Document(page_content="Chai 18")]
+    memory.remember("c", "v1", "price of tofu", embed("price of tofu"), 2, docs)
+    assert memory.lookup("c", "v1", embed("price of tofu?"), 1) == docs[:1]
+    assert memory.lookup("c", "v2", embed("price of tofu"), 1) is None  # 重新匯入後不重用
+    assert memory.lookup("c", "v1", embed("robot arm"), 1) is None
+
+    searched = []
+    old = (vector_registry.get_embeddings, vector_registry.with_vector_store, vector_registry.collection_version)
+
+    class Store:
+        def similarity_search_by_vector(self, vector, k):
+            searched.append(vector)
+            return docs[:k]
+
+    vector_registry.get_embeddings = lambda: type("E", (), {"embed_query": staticmethod(embed)})()
+    vector_registry.with_vector_store = lambda name, fn: fn(Store())
+    vector_registry.collection_version = lambda name: "v1"
+    vector_registry.search_cache.clear()
+
+    class Searching:
+        def run(self, question, callbacks=None):
+            return vector_registry.search("c", retrieval_query(question), 2)[0].page_content
+
+    try:
+        session = SessionAgent(Searching(), store=TTLCache("test_session", 10, 60))
+        session.chat(conversation("unit price tofu"))
+        session.chat(conversation("unit price tofu", "Tofu 23.25", "unit price tofu please"))
+        assert len(searched) == 1
+    finally:
+        vector_registry.get_embeddings, vector_registry.with_vector_store, vector_registry.collection_version = old
+        vector_registry.search_cache.clear()
+
+
+def test_direct_route_continues_ollama_context():
+    class FakeLLM:
+        calls = []
+
+        def generate(self, prompts, callbacks=None, tags=None, **kwargs):
+            FakeLLM.calls.append((prompts[0], kwargs.get("context")))
+            context = (kwargs.get("context") or []) + [len(FakeLLM.calls)] * 3
+            return LLMResult(generations=[[Generation(text=f"reply {len(FakeLLM.calls)}",
+                                                      generation_info={"context": context})]])
+
+    intents = {"direct": ["hello who are you"], "agent": ["total sales by category"]}
+    classifier = IntentClassifier(embed, intents, min_score=0.5, min_margin=0.05)
+    routed = RoutedAgent(None, classifier, type("E", (), {"embed_query": staticmethod(embed)})(),
+                         stats=RouteStats(), llm_factory=FakeLLM)
+    session = SessionAgent(routed, store=TTLCache("test_session", 10, 60))
+
+    assert session.chat(conversation("hello who are you")) == "reply 1"
+    assert session.chat(conversation("hello who are you", "reply 1", "hello again who are you")) == "reply 2"
+    # 第二輪只送新問題，前文由 context 帶入
+    assert FakeLLM.calls[1] == ("hello again who are you", [1, 1, 1])
+
+    # 重新產生第二輪的答案: 從第一輪之後存下的狀態開始，帶的仍是第一輪的 context
+    session.chat(conversation("hello who are you", "reply 1", "hello again who are you"))
+    assert FakeLLM.calls[2][1] == [1, 1, 1]
+
+
+def test_summary_stays_out_of_the_request_callbacks():
+    class FakeLLM:
+        calls = []
+
+        def invoke(self, prompt, config=None, **kwargs):
+            FakeLLM.calls.append(config)
+            return " the user asked about tofu "
+
+    agent = RecordingAgent()
+    session = SessionAgent(agent, llm_factory=FakeLLM, store=TTLCache("test_session", 10, 60),
+                           history_tokens=30, summarize=True)
+    stream_handler = object()
+    long_history = conversation(*[f"question {i} " + "w " * 40 for i in range(6)], "and now?")
+    session.chat(long_history, callbacks=[stream_handler])
+    # 摘要呼叫不帶請求的 callbacks (串流 / 取消 / 計量)，只有回答用
+    assert FakeLLM.calls == [None]
+    assert "(Earlier turns, summarized) the user asked about tofu" in agent.seen[0][1]
+
+
+if __name__ == "__main__":
+    test_window_moves_in_jumps()
+    test_chat_finds_state_by_history()
+    test_followup_skips_answer_cache()
+    test_retrieval_reused_within_conversation()
+    test_direct_route_continues_ollama_context()
+    test_summary_stays_out_of_the_request_callbacks()
+    print("OK")
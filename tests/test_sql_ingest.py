@@ -0,0 +1,143 @@
+# test_sql_ingest.py
+# 用 SQLite 代替 MSSQL 測試 table-driven SQL ingest (不需要 Milvus / Ollama)
+
+import os
+import sqlite3
+import tempfile
+
+from src.ingest.pipeline import Commit, run_pipeline
+from src.ingest.sql import SqlIngestState, TableSpec, iter_sql_items, iter_table_items
+
+PRODUCTS = TableSpec(
+    name="Products",
+    key="ProductID",
+    columns=["ProductID", "ProductName", "UnitPrice"],
+    template="Product Name: {ProductName}\nUnit Price: {UnitPrice}",
+)
+ORDERS = TableSpec(
+    name="Orders",
+    key="OrderID",
+    columns=["OrderID", "ShipCity"],
+    template="Order {OrderID} ships to {ShipCity}",
+    watermark="RowVer",
+)
+
+
+def make_db():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE Products (ProductID INTEGER PRIMARY KEY, ProductName TEXT, UnitPrice REAL)")
+    conn.execute("CREATE TABLE Orders (OrderID INTEGER PRIMARY KEY, ShipCity TEXT, RowVer INTEGER)")
+    conn.executemany("INSERT INTO Products VALUES (?, ?, ?)", [(i, f"Product {i}", i * 1.5) for i in range(1, 26)])
+    conn.executemany("INSERT INTO Orders VALUES (?, ?, ?)", [(i, "Taipei", i) for i in range(1, 11)])
+    conn.commit()
+    return conn
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.embedded = 0
+
+    def embed(self, chunks):
+        self.embedded += len(chunks)
+        return [[float(len(c.text))] for c in chunks]
+
+    def insert(self, batch):
+        for cid, text in zip(batch.ids, batch.texts):
+            self.rows[cid] = text
+
+    def delete(self, ids):
+        for cid in ids:
+            self.rows.pop(cid, None)
+
+
+def ingest(conn, state, sink, fetch_size=7):
+    items = iter_sql_items(conn, [PRODUCTS, ORDERS], state, sink.delete, fetch_size)
+    return run_pipeline(items, sink.embed, sink.insert, embed_batch=4, insert_batch=5, queue_size=8)
+
+
+def test_full_then_incremental():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db()
+        sink = FakeCollection()
+        state_path = os.path.join(tmp, "state.json")
+
+        ingest(conn, SqlIngestState.load(state_path, "sql"), sink)
+        assert len(sink.rows) == 35
+        assert sink.rows["Products:3"] == "Product Name: Product 3\nUnit Price: 4.5"
+
+        # 沒有任何變更: 不應重新 embedding
+        sink.embedded = 0
+        ingest(conn, SqlIngestState.load(state_path, "sql"), sink)
+        assert sink.embedded == 0
+
+        # 變更 / 刪除 / 新增
+        conn.execute("UPDATE Products SET UnitPrice = 99 WHERE ProductID = 3")
+        conn.execute("DELETE FROM Products WHERE ProductID = 4")
+        conn.execute("UPDATE Orders SET ShipCity = 'Tainan', RowVer = 11 WHERE OrderID = 2")
+        conn.execute("INSERT INTO Orders VALUES (11, 'Hsinchu', 12)")
+        conn.commit()
+        ingest(conn, SqlIngestState.load(state_path, "sql"), sink)
+        assert sink.embedded == 3
+        assert "Products:4" not in sink.rows
+        assert sink.rows["Products:3"].endswith("99.0")
+        assert sink.rows["Orders:2"] == "Order 2 ships to Tainan"
+        assert sink.rows["Orders:11"] == "Order 11 ships to Hsinchu"
+        assert SqlIngestState.load(state_path, "sql").watermark("Orders") == 12
+
+
+def test_failed_insert_does_not_advance_watermark():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db()
+        state_path = os.path.join(tmp, "state.json")
+
+        class Broken(FakeCollection):
+            def insert(self, batch):
+                raise RuntimeError("milvus down")
+
+        try:
+            ingest(conn, SqlIngestState.load(state_path, "sql"), Broken())
+        except Exception:
+            pass
+        assert SqlIngestState.load(state_path, "sql").watermark("Orders") is None
+
+        sink = FakeCollection()
+        ingest(conn, SqlIngestState.load(state_path, "sql"), sink)
+        assert len(sink.rows) == 35
+
+
+def test_duplicate_watermarks_across_fetch_boundary():
+    events = TableSpec(name="Events", key="EventID", columns=["EventID", "Note"],
+                       template="{Note}", watermark="Modified")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Events (EventID INTEGER PRIMARY KEY, Note TEXT, Modified TEXT)")
+    stamps = ["2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02", "2024-01-02", "2024-01-02",
+              "2024-01-03", "2024-01-03"]
+    conn.executemany("INSERT INTO Events VALUES (?, ?, ?)", [(i, f"event {i}", s) for i, s in enumerate(stamps, 1)])
+    conn.commit()
+
+    def run(state, stop_after_commits=None):
+        keys, commits = [], 0
+        for item in iter_table_items(conn, events, state, lambda ids: None, fetch_size=3):
+            if isinstance(item, Commit):
+                item.callback()
+                commits += 1
+                if commits == stop_after_commits:
+                    break
+            else:
+                keys.append(item.metadata["key"])
+        return keys
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, "state.json")
+        # 第一批在 2024-01-02 這組相同時間中間結束，之後中斷
+        assert run(SqlIngestState.load(state_path, "sql"), stop_after_commits=1) == ["1", "2", "3"]
+        assert run(SqlIngestState.load(state_path, "sql")) == ["4", "5", "6", "7", "8"]
+        assert run(SqlIngestState.load(state_path, "sql")) == []
+
+
+if __name__ == "__main__":
+    test_full_then_incremental()
+    test_failed_insert_does_not_advance_watermark()
+    test_duplicate_watermarks_across_fetch_boundary()
+    print("OK")
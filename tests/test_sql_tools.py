@@ -0,0 +1,74 @@
+# test_sql_tools.py
+# 用 SQLite 測試 SQLSchema / SQLQuery 工具 (不需要 MSSQL)
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from src.chains import sql_tools
+
+
+def make_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE Categories (CategoryID INTEGER PRIMARY KEY, CategoryName TEXT)")
+        conn.exec_driver_sql(
+            "CREATE TABLE Products (ProductID INTEGER PRIMARY KEY, ProductName TEXT, UnitPrice REAL, "
+            "CategoryID INTEGER REFERENCES Categories(CategoryID))"
+        )
+        conn.exec_driver_sql("INSERT INTO Categories VALUES (1, 'Beverages'), (2, 'Seafood')")
+        for i in range(1, 101):
+            conn.exec_driver_sql(f"INSERT INTO Products VALUES ({i}, 'Product {i}', {i}.5, {1 + i % 2})")
+    sql_tools.use_engine(engine)
+    return engine
+
+
+def test_schema_is_compact_and_cached():
+    make_engine()
+    schema = sql_tools.sql_schema_fn("")
+    assert "Products(ProductID integer PK, ProductName text, UnitPrice real, CategoryID integer -> Categories.CategoryID)" in schema
+    assert sql_tools.sql_schema_fn("Categories") == "Categories(CategoryID integer PK, CategoryName text)"
+    assert sql_tools.load_schema() is sql_tools.load_schema()
+
+
+def test_aggregate_in_one_round_trip():
+    make_engine()
+    out = sql_tools.sql_query_fn(
+        "```sql\nSELECT c.CategoryName, COUNT(*) AS n FROM Products p "
+        "JOIN Categories c ON c.CategoryID = p.CategoryID GROUP BY c.CategoryName ORDER BY 1;\n```"
+    )
+    assert out == "CategoryName | n\nBeverages | 50\nSeafood | 50"
+
+
+def test_read_only_guard():
+    engine = make_engine()
+    for sql in [
+        "DELETE FROM Products",
+        "SELECT 1; DROP TABLE Products",
+        "SELECT * INTO Copy FROM Products",
+        "UPDATE Products SET UnitPrice = 0",
+        "EXEC sp_who",
+    ]:
+        assert sql_tools.sql_query_fn(sql).startswith("SQL_ERROR:"), sql
+    # 字串常值中的關鍵字 / 分號不應被擋下
+    assert sql_tools.sql_query_fn("SELECT 'drop; table' AS s") == "s\ndrop; table"
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM Products").scalar() == 100
+
+
+def test_row_and_byte_caps():
+    make_engine()
+    out = sql_tools.sql_query_fn("SELECT * FROM Products")
+    lines = out.splitlines()
+    assert len(lines) == sql_tools.SQL_MAX_ROWS + 2
+    assert lines[-1].startswith("... (truncated")
+    assert len(out) <= sql_tools.SQL_MAX_RESULT_BYTES + 100
+    assert sql_tools.sql_query_fn("SELECT * FROM Missing").startswith("SQL_ERROR:")
+    assert sql_tools.sql_query_fn("SELECT * FROM Products WHERE 1 = 0") == "NO_ROWS"
+
+
+if __name__ == "__main__":
+    test_schema_is_compact_and_cached()
+    test_aggregate_in_one_round_trip()
+    test_read_only_guard()
+    test_row_and_byte_caps()
+    print("OK")
@@ -0,0 +1,39 @@
+# test_streaming.py
+# 串流只送出 "Final Answer:" 之後的 token (標記被切成多個 token 時也要認得)，推理過程不外流
+
+from src.chains.streaming import DIRECT_ANSWER_TAG, FinalAnswerStreamHandler
+
+
+def feed(handler, tokens, tags=None):
+    handler.on_llm_start({}, ["prompt"], tags=tags)
+    for token in tokens:
+        handler.on_llm_new_token(token)
+
+
+def test_final_answer_marker_split_across_tokens():
+    events = []
+    handler = FinalAnswerStreamHandler(events.append)
+    # 第一次 LLM 呼叫只有推理與工具呼叫，不應送出任何 token
+    feed(handler, ["Thought", ": I should", " search\nAction: LabPaperSearch\nAction Input: x"])
+    assert events == []
+
+    feed(handler, [" I now know", " the answer\n", "Final", " Answer", ":", " ", " Paris", " is", " it"])
+    assert events == [("token", "Paris"), ("token", " is"), ("token", " it")]
+
+    # 標記與答案在同一個 token 裡
+    events.clear()
+    feed(handler, ["Thought: done\nFinal Answer: 42", " items"])
+    assert events == [("token", "42"), ("token", " items")]
+
+
+def test_direct_answer_streams_every_token():
+    events = []
+    handler = FinalAnswerStreamHandler(events.append)
+    feed(handler, ["\n", "Hello", " there"], tags=[DIRECT_ANSWER_TAG])
+    assert events == [("token", "Hello"), ("token", " there")]
+
+
+if __name__ == "__main__":
+    test_final_answer_marker_split_across_tokens()
+    test_direct_answer_streams_every_token()
+    print("OK")
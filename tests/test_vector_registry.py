@@ -0,0 +1,120 @@
+# test_vector_registry.py
+# Vector store 快取: 健康檢查間隔、連線失效時重建、Milvus 錯誤時重新連線並只重試一次 (不需要 Milvus)
+
+from types import SimpleNamespace
+
+import grpc
+from pymilvus import MilvusException
+
+from src.chains import vector_registry
+
+
+class FakeMilvus:
+    def __init__(self, calls):
+        self.calls = calls
+        self.healthy = True
+        self.collections = set()
+
+    def get_server_version(self, using):
+        self.calls.append(("version", using))
+        if not self.healthy:
+            raise MilvusException(message="channel closed")
+        return "v2.5"
+
+    def has_collection(self, name, using):
+        return name in self.collections
+
+
+def patched(fn):
+    """Run fn(milvus, connects, disconnects) against fake pymilvus / store factories."""
+    def test():
+        calls, connects, disconnects = [], [], []
+        milvus = FakeMilvus(calls)
+
+        def connect(name):
+            store = SimpleNamespace(collection_name=name, alias="default", col=object(), n=len(connects))
+            connects.append(name)
+            return store
+
+        names = ("_connect", "utility", "connections", "uses_local_backend", "MILVUS_HEALTHCHECK_INTERVAL", "_stores")
+        old = {name: getattr(vector_registry, name) for name in names}
+        vector_registry._connect = connect
+        vector_registry.utility = milvus
+        vector_registry.connections = SimpleNamespace(disconnect=disconnects.append)
+        vector_registry.uses_local_backend = lambda name: False
+        vector_registry.MILVUS_HEALTHCHECK_INTERVAL = 60
+        vector_registry._stores = {}
+        try:
+            fn(milvus, connects, disconnects)
+        finally:
+            for name, value in old.items():
+                setattr(vector_registry, name, value)
+    test.__name__ = fn.__name__
+    return test
+
+
+@patched
+def test_healthcheck_and_reconnect(milvus, connects, disconnects):
+    first = vector_registry.get_vector_store("pdf")
+    # 間隔內直接重用，不做健康檢查
+    assert vector_registry.get_vector_store("pdf") is first and milvus.calls == []
+
+    vector_registry.MILVUS_HEALTHCHECK_INTERVAL = 0
+    assert vector_registry.get_vector_store("pdf") is first and milvus.calls == [("version", "default")]
+
+    # 連線失效: 同一個 alias 上的 store 都丟掉，斷開連線後重建
+    vector_registry.get_vector_store("sql")
+    milvus.healthy = False
+    second = vector_registry.get_vector_store("pdf")
+    assert second is not first and disconnects == ["default"]
+    assert set(vector_registry._stores) == {"pdf"} and connects == ["pdf", "sql", "pdf"]
+
+    # ingest 之後才建立的 collection: 重新開啟才看得到
+    milvus.healthy = True
+    second.col = None
+    milvus.collections.add("pdf")
+    assert vector_registry.get_vector_store("pdf") is not second
+
+
+@patched
+def test_with_vector_store_retries_once(milvus, connects, disconnects):
+    seen = []
+
+    def flaky(store):
+        seen.append(store.n)
+        if len(seen) == 1:
+            raise grpc.RpcError()
+        return "ok"
+
+    assert vector_registry.with_vector_store("pdf", flaky) == "ok"
+    assert seen == [0, 1] and disconnects == ["default"]
+
+    def broken(store):
+        seen.append(store.n)
+        raise MilvusException(message="unavailable")
+
+    seen.clear()
+    try:
+        vector_registry.with_vector_store("pdf", broken)
+    except MilvusException:
+        pass
+    else:
+        raise AssertionError("expected MilvusException")
+    # 重新連線後再失敗一次就拋出，不會無限重試
+    assert seen == [1, 2] and disconnects == ["default", "default"]
+
+    # 不是連線錯誤: 不重新連線
+    def bad_query(store):
+        raise ValueError("bad expr")
+
+    try:
+        vector_registry.with_vector_store("pdf", bad_query)
+    except ValueError:
+        pass
+    assert len(connects) == 3 and len(disconnects) == 2
+
+
+if __name__ == "__main__":
+    test_healthcheck_and_reconnect()
+    test_with_vector_store_retries_once()
+    print("OK")